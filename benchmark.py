@@ -0,0 +1,165 @@
+"""
+Throughput and latency benchmark for the inspection chain.
+
+Runs capture preprocessing and every check over a corpus of recorded frames
+and reports per-stage p50/p95/p99 latency, frames per second and peak memory.
+
+Usage:
+    uv run benchmark.py
+    uv run benchmark.py --images images/burnedStates --repeat 200 --output bench.json
+    uv run benchmark.py --compare bench.json     # show the change against an earlier run
+    uv run benchmark.py --cascade                # time the early-exit cascade instead of every check
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+
+from utils import checkObject
+from utils.captureImages import preprocess_frame
+from utils.checkObject import idObjectPresent
+from utils.checkAreaAndAngle import isAreaAndAngleGood
+from utils.checkDefects import isDefectFree
+from utils.getBurnedState import check_burned_state
+from utils.simulator import load_replay_images
+
+# Stage name -> function taking the previous stage's input (raw image or Frame)
+STAGES = {
+    "preprocess": preprocess_frame,
+    "detect": idObjectPresent,
+    "geometry": isAreaAndAngleGood,
+    "color": lambda frame: check_burned_state(frame=frame),
+    "defects": isDefectFree,
+}
+
+def load_corpus(image_dirs):
+    corpus = []
+    for image_dir in image_dirs:
+        corpus.extend(load_replay_images(image_dir))
+    return corpus
+
+def run_once(img, timings):
+    """Runs every stage on one raw image, appending each stage's latency (seconds)."""
+    start = time.perf_counter()
+    frame = STAGES["preprocess"](img)
+    timings["preprocess"].append(time.perf_counter() - start)
+
+    for name in STAGES:
+        if name == "preprocess":
+            continue
+        start = time.perf_counter()
+        STAGES[name](frame)
+        timings[name].append(time.perf_counter() - start)
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "count": int(ms.size),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark(corpus, repeat, warmup):
+    timings = {name: [] for name in STAGES}
+
+    # The checks print their progress; keep that out of the terminal (and mostly out of the timings)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _, img in corpus[:warmup]:
+            run_once(img, {name: [] for name in STAGES})
+
+        chain_start = time.perf_counter()
+        for _ in range(repeat):
+            for _, img in corpus:
+                run_once(img, timings)
+        chain_elapsed = time.perf_counter() - chain_start
+
+        # Separate pass for memory so tracemalloc overhead does not skew the latencies
+        tracemalloc.start()
+        for _, img in corpus:
+            run_once(img, {name: [] for name in STAGES})
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    frames = repeat * len(corpus)
+    stages = {name: percentiles(samples) for name, samples in timings.items()}
+    chain = [sum(t) for t in zip(*timings.values())]
+    stages["total"] = percentiles(chain)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "frames": frames,
+        "corpus_size": len(corpus),
+        "fps": frames / chain_elapsed if chain_elapsed > 0 else 0.0,
+        "peak_traced_mb": peak_traced / 1e6,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "stages": stages,
+    }
+
+def print_report(results, baseline=None):
+    print(f"\n=== Inspection Benchmark ({results['frames']} frames, corpus of {results['corpus_size']}) ===")
+    print(f"{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, s in results["stages"].items():
+        line = f"{name:<12}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['mean_ms']:>10.3f}"
+        if baseline and name in baseline["stages"]:
+            old = baseline["stages"][name]["p50_ms"]
+            if old > 0:
+                line += f"   p50 {100.0 * (s['p50_ms'] - old) / old:+.1f}%"
+        print(line)
+    print(f"\nThroughput: {results['fps']:.1f} frames/s")
+    print(f"Peak traced memory: {results['peak_traced_mb']:.2f} MB, max RSS: {results['max_rss_mb']:.1f} MB")
+    if baseline:
+        print(f"Compared with {baseline.get('commit')} ({baseline['fps']:.1f} frames/s): "
+              f"{100.0 * (results['fps'] - baseline['fps']) / baseline['fps']:+.1f}% throughput")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inspection chain on recorded frames.")
+    parser.add_argument("--images", nargs="+", default=["./images/"],
+                        help="Image directories to use as the corpus (searched recursively).")
+    parser.add_argument("--repeat", type=int, default=50, help="Passes over the corpus.")
+    parser.add_argument("--warmup", type=int, default=5, help="Frames run before timing starts.")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file.")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against.")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Time the early-exit cascade (utils/cascade.py) as one stage instead of every check.")
+    args = parser.parse_args()
+    # Recorded frames must not teach (and save over) the live line's background model
+    checkObject.ADAPTIVE_BACKGROUND = False
+
+    if args.cascade:
+        from utils.cascade import InspectionCascade
+        cascade = InspectionCascade()
+        STAGES.clear()
+        STAGES.update({"preprocess": preprocess_frame, "cascade": cascade.run})
+
+    corpus = load_corpus(args.images)
+    results = benchmark(corpus, args.repeat, args.warmup)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,266 @@
+import argparse
+import sys
+import time
 
-from utils.captureImages import processImagesAndSave
-from utils.checkAreaAndAngle import isAreaAndAngleGood
-from utils.checkObject import idObjectPresent
-from utils.pickBadAndPlace import pickBadAndPlace
-from utils.getBurnedState import check_burned_state
+# Startup is measured from here, before the OpenCV/NumPy imports
+processStart = time.perf_counter()
 
-import serial
-import time
+from utils.captureImages import processImages, saveFrame
+from utils.devices import openDevices, CONVEYOR_ADDRESS
+from utils.pickBadAndPlace import pickBadAndPlace, moveConveyor, pickAndPlace, connectDevices
+from utils.cascade import InspectionCascade
+from utils.colorClassifier import RGB_MAP_PATH
+from utils.inspectionConfig import watch
+from utils.scheduler import InspectionScheduler
+from utils import checkObject, metrics
 
-def main():
+# Write the captured frame to ./images/ every iteration (debug only;
+# the checks work on the in-memory frame)
+SAVE_DEBUG_IMAGES = False
 
-    tryNO=20
-    i=1
+# Background archive of every inspected frame and verdict (set by --archive)
+archive = None
+
+# Seconds from process start until the devices are connected and the loop can
+# start; restarts after a fault should stay well inside this
+STARTUP_BUDGET = 3.0
+
+# Watches the "inspection" section of rgbMap.json (set in main())
+configWatcher = None
+
+# Continuous-capture trigger that picks the settled, centred frame (set by --trigger)
+trigger = None
+
+# Early-exit chain of checks (prefilter, presence, geometry, colour, defects); see utils/cascade.py
+cascade = InspectionCascade()
+
+# Overlap inspection of the next biscuit with the conveyor move and arm cycle of
+# the previous one. Set to False for the original strictly sequential loop.
+PIPELINED = True
+
+def inspectFrame(frame):
+    """
+    Runs the inspection cascade (prefilter, detection, geometry, colour, defects) on one frame.
+
+    Returns:
+        tuple: (bool) True if the biscuit must be rejected,
+               (str) Short reason for the verdict.
+    """
+    if SAVE_DEBUG_IMAGES:
+        saveFrame(frame)
+
+    bad, reason = gradeFrame(frame)
+    if archive is not None:
+        # Index the values the verdict was based on, not a later re-measurement
+        archive.submit(frame, bad, reason, cascade.measured)
+    return bad, reason
+
+def gradeFrame(frame):
+    bad, reason = cascade.run(frame)
+    if reason == "empty":
+        metrics.increment("items", "empty")
+    elif bad:
+        metrics.increment("items", "bad")
+        for part in reason.split("/"):
+            metrics.increment("reject_reason", part)
+    else:
+        metrics.increment("items", "good")
+    return bad, reason
+
+def captureFrame(camera, newer_than=None, beltMove=None):
+    # Swap in a changed config between items, before the crop is taken
+    if configWatcher is not None:
+        configWatcher.apply()
+    if trigger is not None:
+        # newer_than None: the belt move was only queued, wait for it to happen and settle
+        frame = trigger.capture(newer_than, expect_motion=newer_than is None, belt_move=beltMove)
+        if frame is None:
+            # One more look in case the motion was missed; the belt has stopped by now
+            frame = trigger.capture()
+        return frame
+    with metrics.timer("camera"):
+        return processImages(camera, newer_than=newer_than)
+
+def runPipelined(camera, tryNO):
+    """Inspects biscuit N+1 while the conveyor and arm handle biscuit N."""
+    startTime = time.time()
+    scheduler = InspectionScheduler(
+        capture=lambda newer_than, beltMove=None: captureFrame(camera, newer_than, beltMove),
+        inspect=inspectFrame,
+        advance=moveConveyor,
+        # Queue the reject cycle and carry on; the next conveyor move waits behind it on the serial link
+        pick=lambda: pickAndPlace(wait=False),
+        # The trigger watches the belt bring the next biscuit instead of waiting for the stop
+        capture_early=trigger is not None,
+        # A biscuit the trigger never saw settle is rejected rather than passed unchecked
+        reject_missing=trigger is not None,
+    )
+    picked = scheduler.run(tryNO)
+    print(f"{tryNO} items processed in {time.time() - startTime:.2f} seconds, "
+          f"{len(picked)} rejected: {picked}")
 
-    serial_port = serial.Serial("/dev/ttyUSB0", 115200, timeout=1)
+def runSequential(camera, tryNO):
+    """Original loop: capture, inspect, then move/pick, one biscuit at a time."""
+    i=1
+    beltStoppedAt = None
 
     while i<=tryNO:
 
         print(f"\n--- Iteration {i} ---")
         startTime = time.time()
 
-        processImagesAndSave()
-        objectDetected = idObjectPresent()
-        if not objectDetected:
-            badFound = False
-        if objectDetected:
-            areaAngleGood = isAreaAndAngleGood()
-            if not areaAngleGood:
-                badFound = True
-            else:
-                goodBurnedState = check_burned_state()
-                if not goodBurnedState:
-                    badFound = True
-                else:
-                    badFound = False
-                                
+        frame = captureFrame(camera, newer_than=beltStoppedAt)
+        if frame is None:
+            print("No frame captured, skipping inspection.")
+            # Without a trigger this is the original behaviour; a trigger timeout rejects the biscuit
+            badFound = trigger is not None
+        else:
+            badFound, _ = inspectFrame(frame)
+
         badFound = pickBadAndPlace(badFound)
+        metrics.observe("iteration", time.time() - startTime)
+        metrics.write_textfile()
         print(f"Iteration {i} completed in {time.time() - startTime:.2f} seconds.")
         i+=1
-        time.sleep(0.5)
+        if trigger is None:
+            time.sleep(0.5)
+        beltStoppedAt = time.time()
+
+def runContinuous(devices, tryNO, beltFeed):
+    """Keeps the belt running; biscuits are tracked and bad ones picked on the fly."""
+    from utils.tracking import ContinuousLine
+
+    startTime = time.time()
+    line = ContinuousLine(devices, inspect=inspectFrame, belt_feed=beltFeed)
+    picked = line.run(tryNO)
+    print(f"{tryNO} items processed in {time.time() - startTime:.2f} seconds, "
+          f"{len(picked)} rejected: {picked}")
+    print(line.report())
+
+def checkStartup(budget=STARTUP_BUDGET):
+    """
+    Reports how long the process took to get ready (imports plus device connection).
+
+    Returns:
+        bool: True if startup stayed within `budget` seconds.
+    """
+    startupSeconds = time.perf_counter() - processStart
+    metrics.observe("startup", startupSeconds)
+    print(f"Startup took {startupSeconds:.2f} seconds (budget {budget:.1f} seconds).")
+    if startupSeconds > budget:
+        print("Warning: Startup exceeded its budget; look for slow imports (python -X importtime main.py) "
+              "or slow device connections.")
+        return False
+    return True
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Biscuit inspection and sorting loop.")
+    parser.add_argument("--iterations", type=int, default=20, help="Number of conveyor pitches to process.")
+    parser.add_argument("--sim", action="store_true", help="Run against the simulated arm, conveyor and camera.")
+    parser.add_argument("--images", default="./images/", help="Image directory replayed by the simulated camera.")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Simulated move latency multiplier (e.g. 0.01 for 100x faster runs).")
+    parser.add_argument("--metrics-file", help="Keep per-stage timings and counters in this Prometheus text file.")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this local port.")
+    parser.add_argument("--workers", type=int,
+                        help="Inspect frames in this many vision worker processes (see utils/visionPool.py).")
+    parser.add_argument("--check-startup", action="store_true",
+                        help="Only connect the devices, report the startup time and exit non-zero if over budget.")
+    parser.add_argument("--config", default=RGB_MAP_PATH,
+                        help="Inspection config, reloaded when it changes (see utils/inspectionConfig.py).")
+    parser.add_argument("--archive", metavar="DIR",
+                        help="Archive every inspected frame and verdict under DIR (see utils/archive.py).")
+    parser.add_argument("--trigger", action="store_true",
+                        help="Capture continuously and inspect the frame where the biscuit is still and centred "
+                             "(see utils/trigger.py).")
+    parser.add_argument("--continuous", action="store_true",
+                        help="Run the belt continuously and pick tracked bad biscuits on the fly "
+                             "(see utils/tracking.py; the conveyor needs its own controller).")
+    parser.add_argument("--belt-feed", type=float, default=None,
+                        help="Belt speed in mm/min for --continuous (default tracking.BELT_FEED).")
+    parser.add_argument("--conveyor-address", type=int, default=None,
+                        help="RS485 address of the conveyor's controller, -1 for the arm controller's 7th axis "
+                             "(default devices.CONVEYOR_ADDRESS; 1 for --sim --continuous).")
+    args = parser.parse_args()
+    # Vision workers grade whole snapshots with utils.batchInspect in their own processes,
+    # so the in-process cascade, archive and frame trigger never see the frames
+    if args.workers:
+        unsupported = [flag for flag, used in (("--archive", args.archive), ("--trigger", args.trigger),
+                                               ("--continuous", args.continuous)) if used]
+        if unsupported:
+            parser.error(f"--workers cannot be combined with {', '.join(unsupported)}.")
+    return args
+
+def main():
+    global archive, configWatcher, trigger
+
+    args = parseArgs()
+    tryNO = args.iterations
+    if args.metrics_file or args.metrics_port:
+        metrics.enable(textfile=args.metrics_file, port=args.metrics_port)
+    frameSize = None   # The camera config (cameraService.FRAME_WIDTH/HEIGHT)
+    if args.sim:
+        from utils.simulator import FRAME_WIDTH, FRAME_HEIGHT
+        frameSize = (FRAME_WIDTH, FRAME_HEIGHT)
+        # Simulated frames must not teach (and save over) the live line's background model
+        checkObject.ADAPTIVE_BACKGROUND = False
+    # The crop is checked against the resolution of the camera the line opens
+    configWatcher = watch(args.config, frame_size=frameSize)
+
+    # Opens the serial link, arm/conveyor controllers and camera (kept open for the whole run)
+    conveyorAddress = args.conveyor_address
+    if conveyorAddress is None:
+        # The simulated belt gets its own controller so it can run while the arm moves
+        conveyorAddress = 1 if args.sim and args.continuous else CONVEYOR_ADDRESS
+    if args.sim:
+        devices = openDevices("sim", image_dir=args.images, time_scale=args.time_scale,
+                              belt=args.trigger or args.continuous, conveyor_address=conveyorAddress)
+    else:
+        devices = openDevices("hardware", conveyor_address=conveyorAddress)
+    connectDevices(devices)
+    camera = devices.camera
+    startupOk = checkStartup()
+    if args.check_startup:
+        devices.close()
+        sys.exit(0 if startupOk else 1)
+    if args.archive:
+        from utils.archive import ArchiveWriter
+        archive = ArchiveWriter(args.archive).start()
+    if args.trigger:
+        from utils.trigger import FrameTrigger
+        trigger = FrameTrigger(camera)
+
+    if args.workers:
+        from utils.visionPool import runStations
+        startTime = time.time()
+        picked = runStations([("main", devices, None)], tryNO, args.workers, args.config)["main"]
+        print(f"{tryNO} items processed in {time.time() - startTime:.2f} seconds, "
+              f"{len(picked)} rejected: {picked}")
+    elif args.continuous:
+        from utils.tracking import BELT_FEED
+        runContinuous(devices, tryNO, args.belt_feed or BELT_FEED)
+    elif PIPELINED:
+        runPipelined(camera, tryNO)
+    else:
+        runSequential(camera, tryNO)
+
+    devices.close()
+    # Keep the updates since the last periodic save
+    checkObject.save_background_models()
+    configWatcher.stop()
+    if archive is not None:
+        archive.close()
+
+    if not args.workers:
+        print("\n--- Inspection Cascade ---")
+        print(cascade.report())
+    if trigger is not None:
+        print(f"Trigger: {trigger.report()}")
 
-    serial_port.close()
-    print("Serial connection closed.")
+    if metrics.ENABLED:
+        print("\n--- Stage Timings ---")
+        print(metrics.summary())
+        metrics.write_textfile(force=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,296 @@
+"""
+Inspection archive: every inspected frame and its verdict, written off the hot path.
+
+Records are grouped per shift into compressed NumPy chunk files plus one SQLite
+index, so archiving costs the line one crop copy and a queue put, and later
+queries ("all rejects between 14:00 and 15:00") only touch the index and the
+chunks they need.
+
+    archive/
+      20261018_1/               # date + shift number
+        index.sqlite            # timestamp -> verdict, reason, area, angles, mean RGB, chunk, offset
+        chunk_000000.npz        # crops f0, f1, ... (compressed)
+        chunk_000001.npz
+
+Usage:
+    python -m utils.archive archive/20261018_1 --bad
+    python -m utils.archive archive/20261018_1 --from "2026-10-18 14:00" --to "2026-10-18 15:00"
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from utils import metrics
+
+ARCHIVE_DIR = "./archive/"
+QUEUE_SIZE = 256          # Frames waiting to be archived; newer frames are dropped when full
+CHUNK_FRAMES = 64         # Frames per chunk file
+CHUNK_SECONDS = 30.0      # ... or fewer, once the oldest frame in the chunk is this old
+SHIFT_HOURS = 8           # Shift length; shift 0 starts at midnight
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    timestamp REAL NOT NULL,
+    bad INTEGER NOT NULL,
+    reason TEXT,
+    area INTEGER,
+    angles TEXT,
+    r REAL, g REAL, b REAL,
+    roi TEXT,
+    chunk TEXT NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_timestamp ON records (timestamp);
+"""
+
+@dataclass
+class ArchiveRecord:
+    """One inspected frame waiting in the archive queue."""
+    timestamp: float
+    bad: bool
+    reason: str
+    crop: np.ndarray
+    roi: tuple
+    area: int = None               # As measured by the grading that gave the verdict (None if it did not)
+    angles: list = None
+    rgb: tuple = None
+
+def shift_name(timestamp, shift_hours=SHIFT_HOURS):
+    """Folder name of the shift a timestamp belongs to, e.g. "20261018_1"."""
+    local = time.localtime(timestamp)
+    return f"{time.strftime('%Y%m%d', local)}_{local.tm_hour // shift_hours}"
+
+class ArchiveWriter:
+    """
+    Background writer for the inspection archive.
+
+    submit() copies the frame's crop into a bounded queue and returns at once;
+    if the writer falls behind, new frames are dropped (and counted) instead of
+    stalling the line. The writer thread collects the crops into chunks and
+    writes each chunk as one compressed .npz plus one SQLite transaction for
+    its index rows. The index holds the measurements the verdict was based on,
+    as passed to submit(), so it never disagrees with the stored verdict.
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, queue_size=QUEUE_SIZE,
+                 chunk_frames=CHUNK_FRAMES, chunk_seconds=CHUNK_SECONDS):
+        self.archive_dir = archive_dir
+        self.chunk_frames = chunk_frames
+        self.chunk_seconds = chunk_seconds
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._shift = None
+        self._index = None
+        self._chunk_number = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ArchiveWriter", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, frame, bad, reason="", measured=None):
+        """
+        Queues a frame and its verdict for archiving without blocking.
+
+        Args:
+            frame (Frame): The inspected frame.
+            bad (bool): Verdict.
+            reason (str): Short reason for the verdict.
+            measured (dict, optional): What the grading measured on the frame
+                (InspectionCascade.measured): "geometry" (GeometryResult) and "rgb".
+                Values the grading did not measure stay empty in the index.
+
+        Returns:
+            bool: False if the queue was full and the frame was dropped.
+        """
+        measured = measured or {}
+        geometry = measured.get("geometry")
+        rgb = measured.get("rgb")
+        # The crop is a view into the camera's ring buffer, so it has to be copied
+        record = ArchiveRecord(frame.timestamp, bool(bad), reason, frame.cropped.copy(), tuple(frame.roi),
+                               geometry.area if geometry is not None else None,
+                               [round(a, 2) for a in geometry.angles] if geometry is not None else None,
+                               tuple(float(c) for c in rgb) if rgb is not None else None)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.increment("archive", "dropped")
+            return False
+        return True
+
+    def close(self):
+        """Writes everything still queued, then stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self.dropped:
+            print(f"Archive: {self.dropped} frames dropped because the writer fell behind.")
+
+    # --- Writer thread ---
+    def _run(self):
+        pending = []
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, pending[0].timestamp + self.chunk_seconds - time.time())
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = False   # Chunk timed out
+
+            if record is None or record is False:
+                self._flush(pending)
+                pending = []
+                if record is None:
+                    break
+                continue
+
+            if pending and shift_name(record.timestamp) != shift_name(pending[0].timestamp):
+                self._flush(pending)
+                pending = []
+            pending.append(record)
+            if len(pending) >= self.chunk_frames:
+                self._flush(pending)
+                pending = []
+
+        if self._index is not None:
+            self._index.close()
+
+    def _open_shift(self, name):
+        if self._shift == name:
+            return
+        if self._index is not None:
+            self._index.close()
+        folder = os.path.join(self.archive_dir, name)
+        os.makedirs(folder, exist_ok=True)
+        self._index = sqlite3.connect(os.path.join(folder, "index.sqlite"))
+        self._index.executescript(INDEX_SCHEMA)
+        stems = [f.removeprefix("chunk_").removesuffix(".npz") for f in os.listdir(folder)
+                 if f.startswith("chunk_") and f.endswith(".npz")]
+        existing = [int(stem) for stem in stems if stem.isdigit()]
+        # Continue after the highest number, so a gap in the numbering never overwrites a chunk
+        self._chunk_number = max(existing) + 1 if existing else 0
+        self._shift = name
+
+    def _flush(self, records):
+        if not records:
+            return
+        try:
+            with metrics.timer("archive_chunk"):
+                self._write_chunk(records)
+            self.written += len(records)
+        except Exception as e:
+            # Archiving must never take the line down; the frames are lost
+            print(f"Archive: could not write {len(records)} frames: {e}")
+            metrics.increment("archive", "failed")
+
+    def _write_chunk(self, records):
+        self._open_shift(shift_name(records[0].timestamp))
+        folder = os.path.join(self.archive_dir, self._shift)
+        chunk = f"chunk_{self._chunk_number:06d}.npz"
+        self._chunk_number += 1
+
+        tmp_path = os.path.join(folder, chunk + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **{f"f{i}": record.crop for i, record in enumerate(records)})
+        os.replace(tmp_path, os.path.join(folder, chunk))
+
+        rows = []
+        for offset, record in enumerate(records):
+            r, g, b = record.rgb if record.rgb is not None else (None, None, None)
+            angles = json.dumps(record.angles) if record.angles is not None else None
+            rows.append((record.timestamp, int(record.bad), record.reason, record.area, angles,
+                         r, g, b, json.dumps(record.roi), chunk, offset))
+        with self._index:
+            self._index.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ArchiveReader:
+    """Queries one shift folder of the archive."""
+
+    def __init__(self, shift_dir):
+        self.shift_dir = shift_dir
+        self._index = sqlite3.connect(os.path.join(shift_dir, "index.sqlite"))
+        self._index.row_factory = sqlite3.Row
+        self._chunks = {}
+
+    def query(self, start=None, end=None, bad=None, reason=None):
+        """
+        Returns the index rows (sqlite3.Row) matching the filters, ordered by time.
+
+        Args:
+            start, end (float, optional): time.time() range.
+            bad (bool, optional): Only rejects (True) or only passes (False).
+            reason (str, optional): Substring of the reject reason.
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        if bad is not None:
+            clauses.append("bad = ?")
+            params.append(int(bad))
+        if reason is not None:
+            clauses.append("reason LIKE ?")
+            params.append(f"%{reason}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._index.execute(f"SELECT * FROM records {where} ORDER BY timestamp", params).fetchall()
+
+    def load_crop(self, row):
+        """Loads the archived BGR crop of an index row (only its chunk member is decompressed)."""
+        chunk = self._chunks.get(row["chunk"])
+        if chunk is None:
+            chunk = self._chunks[row["chunk"]] = np.load(os.path.join(self.shift_dir, row["chunk"]))
+        return chunk[f"f{row['offset']}"]
+
+    def close(self):
+        for chunk in self._chunks.values():
+            chunk.close()
+        self._index.close()
+
+def _parse_time(text):
+    return time.mktime(time.strptime(text, "%Y-%m-%d %H:%M"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query an inspection archive shift folder.")
+    parser.add_argument("shift_dir", help="Shift folder, e.g. archive/20261018_1")
+    parser.add_argument("--from", dest="start", type=_parse_time, help='Start time "YYYY-MM-DD HH:MM".')
+    parser.add_argument("--to", dest="end", type=_parse_time, help='End time "YYYY-MM-DD HH:MM".')
+    parser.add_argument("--bad", action="store_true", help="Only rejected items.")
+    parser.add_argument("--reason", help="Only rows whose reason contains this text.")
+    parser.add_argument("--export", help="Write the matching crops as PNGs into this folder.")
+    args = parser.parse_args()
+
+    reader = ArchiveReader(args.shift_dir)
+    rows = reader.query(args.start, args.end, True if args.bad else None, args.reason)
+    for row in rows:
+        stamp = time.strftime("%H:%M:%S", time.localtime(row["timestamp"]))
+        rgb = f"({row['r']:.0f}, {row['g']:.0f}, {row['b']:.0f})" if row["r"] is not None else "-"
+        print(f"{stamp} {'BAD' if row['bad'] else 'ok '} {row['reason']:<20} area={row['area']} "
+              f"rgb={rgb} angles={row['angles']}")
+        if args.export:
+            os.makedirs(args.export, exist_ok=True)
+            cv2.imwrite(os.path.join(args.export, f"{row['timestamp']:.3f}.png"), reader.load_crop(row))
+    print(f"{len(rows)} records.")
+    reader.close()
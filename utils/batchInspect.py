@@ -0,0 +1,142 @@
+"""
+Multi-lane inspection: grade every biscuit in one snapshot as a batch.
+
+Usage:
+    python -m utils.batchInspect images/pra.png          # configured CROP_BOXES
+    python -m utils.batchInspect images/pra.png --auto   # segment every biscuit
+"""
+import argparse
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+from utils.captureImages import preprocess_rois
+from utils.cascade import reject_reason
+from utils.checkAreaAndAngle import analyze_geometry
+from utils.checkDefects import analyze_defects
+from utils.checkObject import get_detector
+from utils import getBurnedState
+from utils.getBurnedState import STATES, classify_mean_colors, predict_state
+
+@dataclass
+class BiscuitVerdict:
+    """Inspection result for one biscuit position in a snapshot."""
+    index: int
+    roi: tuple                   # (x, y, width, height) in the full image
+    center: tuple                # (x, y) centroid of the biscuit mask in the full image
+    present: bool
+    area: int = 0
+    angles: list = field(default_factory=list)
+    state: str = None
+    bad: bool = False
+    reason: str = ""
+
+def _stack_or_none(arrays):
+    """Stacks equally-shaped arrays into one batch array, or returns None if shapes differ."""
+    if len({a.shape for a in arrays}) == 1:
+        return np.stack(arrays)
+    return None
+
+def inspectBatch(frames, assume_present=False, detector=None):
+    """
+    Runs presence, area/angle, burned-state and defect checks on several biscuit crops at once.
+
+    With the "rules" classifier, mean colors and color classes are computed for
+    the whole batch in single NumPy passes; the "lut" and "histogram"
+    classifiers (getBurnedState.CLASSIFIER) run per crop. Geometry (one moments + contour pass) and defects (one
+    contour + Sobel pass) run per crop. The reject reason is the one the in-process cascade
+    gives: the first failing stage in the configured order.
+
+    Args:
+        frames (list): Frames from preprocess_rois(), one per biscuit position.
+        assume_present (bool): Skip presence detection (e.g. for segmented boxes,
+            which only exist where a biscuit was found).
+        detector (ObjectDetector, optional): Background detector; defaults to the shared one.
+            The belt is assumed to look the same in every lane, so one background serves all ROIs.
+
+    Returns:
+        list: A BiscuitVerdict per frame, in the same order.
+    """
+    if not frames:
+        return []
+    if detector is None and not assume_present:
+        detector = get_detector()
+
+    crops = [frame.cropped for frame in frames]
+
+    # --- Presence ---
+    if assume_present:
+        present = np.ones(len(frames), dtype=bool)
+    else:
+        # The downsampled prefilter settles empty lanes without the full detection
+        present = np.array([detector.might_contain_object(frame.gray) and detector.detect(frame.gray)[0]
+                            for frame in frames])
+
+    # --- Burned state: mean color and rule class for the whole batch, other classifiers per crop ---
+    if getBurnedState.CLASSIFIER == "rules":
+        stacked = _stack_or_none(crops)
+        if stacked is not None:
+            mean_bgr = stacked.mean(axis=(1, 2))
+        else:
+            mean_bgr = np.array([cv2.mean(c)[:3] for c in crops])
+        state_index, _, _ = classify_mean_colors(mean_bgr[:, ::-1])
+        states = [(STATES[i], STATES[i] == "good") for i in state_index]
+    else:
+        states = [predict_state(frame.cropped, frame.binary) if present[i] else (None, True)
+                  for i, frame in enumerate(frames)]
+
+    verdicts = []
+    for i, frame in enumerate(frames):
+        x, y, w, h = frame.roi
+        geometry = analyze_geometry(frame.binary)
+        if geometry.centroid is not None:
+            center = (x + geometry.centroid[0], y + geometry.centroid[1])
+        else:
+            center = (x + w / 2.0, y + h / 2.0)
+
+        verdict = BiscuitVerdict(i, frame.roi, center, bool(present[i]))
+        if not verdict.present:
+            verdict.reason = "empty"
+            verdicts.append(verdict)
+            continue
+
+        verdict.area = geometry.area
+        verdict.angles = geometry.angles
+        verdict.state, color_good = states[i]
+
+        reason = reject_reason({"geometry": geometry.reasons,
+                                "color": [] if color_good else ["burned state"],
+                                "defects": analyze_defects(frame.binary, frame.gray, geometry).reasons})
+        verdict.bad = reason is not None
+        verdict.reason = reason or "good"
+        verdicts.append(verdict)
+    return verdicts
+
+def inspectSnapshot(img, boxes=None, timestamp=None, detector=None):
+    """
+    Inspects every biscuit position of a full snapshot.
+
+    Args:
+        img (numpy.ndarray): Full BGR snapshot.
+        boxes (list or str, optional): Crop boxes, or "auto" to segment each biscuit.
+        detector (ObjectDetector, optional): Background detector for this camera.
+
+    Returns:
+        list: A BiscuitVerdict per biscuit position.
+    """
+    frames = preprocess_rois(img, boxes, timestamp)
+    return inspectBatch(frames, assume_present=(boxes == "auto"), detector=detector)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect every biscuit in a snapshot.")
+    parser.add_argument("image", help="Full camera snapshot (e.g. images/pra.png).")
+    parser.add_argument("--auto", action="store_true", help="Segment biscuits instead of using CROP_BOXES.")
+    args = parser.parse_args()
+
+    img = cv2.imread(args.image)
+    if img is None:
+        raise FileNotFoundError(f"Image '{args.image}' not found or could not be opened.")
+    for v in inspectSnapshot(img, "auto" if args.auto else None):
+        print(f"#{v.index} at ({v.center[0]:.0f}, {v.center[1]:.0f}) roi={v.roi}: "
+              f"{'BAD' if v.bad else 'ok'} [{v.reason}] area={v.area} state={v.state}")
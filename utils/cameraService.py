@@ -0,0 +1,177 @@
+import cv2
+import threading
+import time
+
+from utils.frameRing import FrameRing
+
+# Default camera settings (adjust as needed)
+CAMERA_INDEX = 2
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+FRAME_FPS = 30
+BUFFER_SIZE = 4          # Number of preallocated frames in the ring buffer
+RECONNECT_DELAY = 1.0    # Seconds to wait before reopening a failed camera
+MAX_FAILED_READS = 10    # Consecutive failed grabs before the camera is reopened
+SLOT_WAIT = 0.1          # Seconds the grab thread waits for a free ring slot before dropping a frame
+
+class CameraService:
+    """
+    Keeps the webcam open and grabs frames continuously on a background thread.
+
+    Frames are grabbed straight into a FrameRing of preallocated slots, so
+    read() hands the freshest one to the caller as a view, without opening
+    the device, flushing stale buffers or allocating an image per grab. The
+    returned image stays valid until the next read(). If the camera stops
+    delivering frames it is released and reopened. If readers hold every
+    slot, frames are dropped until one is released.
+
+    With shared=True the ring lives in shared memory so vision worker
+    processes can read the frames in place (see utils/visionPool.py).
+
+    Usage:
+        camera = CameraService()
+        camera.start()
+        img = camera.read()
+        camera.stop()
+    """
+
+    def __init__(self, camera_index=CAMERA_INDEX, width=FRAME_WIDTH, height=FRAME_HEIGHT,
+                 fps=FRAME_FPS, buffer_size=BUFFER_SIZE, reconnect_delay=RECONNECT_DELAY, shared=False):
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.reconnect_delay = reconnect_delay
+
+        self.ring = FrameRing(buffer_size, (height, width, 3), shared=shared)
+        self._running = False
+        self._thread = None
+        self._cap = None
+        self.reconnects = 0
+        self.dropped = 0
+
+    # --- Device handling ---
+    def _open(self):
+        cap = cv2.VideoCapture(self.camera_index)
+        if not cap.isOpened():
+            print(f"Error: Could not open webcam {self.camera_index}.")
+            cap.release()
+            return None
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        cap.set(cv2.CAP_PROP_FPS, self.fps)
+        # Keep the driver queue short so grabbed frames are always recent
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        print(f"Camera {self.camera_index} opened ({self.width}x{self.height} @ {self.fps} FPS).")
+        return cap
+
+    def _release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def _grab_loop(self):
+        failed_reads = 0
+        while self._running:
+            if self._cap is None:
+                self._cap = self._open()
+                if self._cap is None:
+                    time.sleep(self.reconnect_delay)
+                    continue
+
+            try:
+                index = self.ring.begin_write(SLOT_WAIT)
+            except RuntimeError:
+                # Every slot is pinned by a reader: discard this frame and keep grabbing
+                if self.dropped == 0:
+                    print("Warning: Frame ring full, dropping frames until a slot is released.")
+                self.dropped += 1
+                self._cap.grab()
+                continue
+            slot = self.ring.images[index]
+            ret, image = self._cap.read(slot)
+            if not ret:
+                failed_reads += 1
+                if failed_reads >= MAX_FAILED_READS:
+                    print("Camera stopped delivering frames, reconnecting...")
+                    self._release()
+                    self.reconnects += 1
+                    failed_reads = 0
+                    time.sleep(self.reconnect_delay)
+                continue
+
+            failed_reads = 0
+            if image is not slot:
+                # The driver ignored the requested size and returned its own buffer
+                cv2.resize(image, (self.width, self.height), dst=slot)
+            self.ring.commit(index)
+
+        self._release()
+
+    # --- Public API ---
+    def start(self):
+        """Starts the background grab thread (no-op if already running)."""
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, name="CameraService", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the grab thread and releases the camera."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.ring.close()
+
+    def latest(self):
+        """
+        Returns the freshest buffered frame without blocking.
+
+        Returns:
+            tuple or None: (frame_id, timestamp, image), or None if nothing was grabbed yet.
+        """
+        entry = self.ring.latest()
+        return (entry[0], entry[1], self.ring.images[entry[2]]) if entry is not None else None
+
+    def read(self, newer_than=None, timeout=2.0):
+        """
+        Returns the freshest image.
+
+        Args:
+            newer_than (float, optional): Only accept a frame grabbed after this
+                time.time() value (e.g. the moment the conveyor stopped).
+            timeout (float): Maximum seconds to wait when no suitable frame is buffered yet.
+
+        Returns:
+            numpy.ndarray or None: The BGR image, or None on timeout.
+        """
+        entry = self.read_entry(newer_than, timeout)
+        return entry[2] if entry is not None else None
+
+    def read_entry(self, newer_than=None, timeout=2.0):
+        """Like read(), but returns the full (frame_id, timestamp, image) entry."""
+        entry = self.ring.read(newer_than, timeout)
+        if entry is None:
+            print("Timed out waiting for a camera frame.")
+            return None
+        return entry[0], entry[1], self.ring.images[entry[2]]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    with CameraService() as camera:
+        start = time.time()
+        img = camera.read(timeout=5.0)
+        if img is not None:
+            print(f"First frame {img.shape} after {time.time() - start:.2f} seconds.")
+            start = time.time()
+            for _ in range(30):
+                camera.read()
+            print(f"30 reads in {time.time() - start:.4f} seconds.")
@@ -1,17 +1,62 @@
 import cv2
 import os
+import time
 import numpy as np
-
-def capture_snapshot(output_path='pra.png'):
-    cap = cv2.VideoCapture(2)
+from dataclasses import dataclass, field
+
+# Crop parameters (adjust as needed)
+CROP_X = 215
+CROP_Y = 80
+CROP_WIDTH = 120
+CROP_HEIGHT = 180
+
+# Multi-lane inspection: one (x, y, width, height) box per biscuit position.
+# The default is the single classic window.
+CROP_BOXES = [(CROP_X, CROP_Y, CROP_WIDTH, CROP_HEIGHT)]
+
+# Automatic segmentation (used instead of CROP_BOXES when requested)
+SEGMENT_REGION = (120, 0, 310, 480)   # (x, y, width, height) of the belt area to search
+SEGMENT_MIN_AREA = 3000               # Ignore bright blobs smaller than this (px)
+SEGMENT_MAX_AREA = 40000              # ... or larger than this (px)
+SEGMENT_PAD = 10                      # Margin added around each biscuit's bounding box
+
+@dataclass
+class Frame:
+    """
+    One captured snapshot together with the views every check needs.
+
+    Attributes:
+        image (numpy.ndarray): Full BGR snapshot from the camera.
+        cropped (numpy.ndarray): BGR crop of the inspection window.
+        gray (numpy.ndarray): Grayscale version of the crop.
+        binary (numpy.ndarray): Otsu binary mask of the grayscale crop (0/255).
+        timestamp (float): time.time() when the frame was captured.
+        roi (tuple): (x, y, width, height) of the crop inside the full image.
+    """
+    image: np.ndarray
+    cropped: np.ndarray
+    gray: np.ndarray
+    binary: np.ndarray
+    timestamp: float = field(default_factory=time.time)
+    roi: tuple = (CROP_X, CROP_Y, CROP_WIDTH, CROP_HEIGHT)
+
+def capture_frame(camera_index=2):
+    """Grabs a single frame from the webcam and returns it (or None on failure)."""
+    cap = cv2.VideoCapture(camera_index)
     if not cap.isOpened():
         print("Error: Could not open webcam.")
-        return False
+        return None
 
     ret, frame = cap.read()
     cap.release()
     if not ret:
         print("Failed to capture image from webcam.")
+        return None
+    return frame
+
+def capture_snapshot(output_path='pra.png'):
+    frame = capture_frame()
+    if frame is None:
         return False
 
     cv2.imwrite(output_path, frame)
@@ -29,56 +74,170 @@ def crop_image_with_limits(image, x, y, w, h):
     cropped = image[y:y_end, x:x_end]
     return cropped
 
-def processImagesAndSave():
-    save_folder = "./images/"
-    image_path = os.path.join(save_folder, "pra.png")
-
-    # Capture snapshot first
-    if not capture_snapshot(output_path=image_path):
-        return
-
-    # Load the saved image
-    img = cv2.imread(image_path)
-    if img is None:
-        print(f"Failed to load image from {image_path}")
-        return
-
-    # Crop parameters (adjust as needed)
-    crop_x = 215
-    crop_y = 80
-    crop_width = 120
-    crop_height = 180
-
+def preprocess_frame(img, timestamp=None, roi=None, gray=None, binary=None):
+    """
+    Builds a Frame from a full BGR snapshot: crop, grayscale and Otsu binary.
+
+    The crop is a view into img. The grayscale and binary images are written
+    into `gray`/`binary` when preallocated planes of the crop's size are given
+    (e.g. FrameRing.planes()), so no image is allocated per frame.
+
+    Args:
+        img (numpy.ndarray): Full BGR snapshot.
+        timestamp (float, optional): Capture time; defaults to now.
+        roi (tuple, optional): (x, y, width, height) crop box; defaults to the classic window.
+        gray (numpy.ndarray, optional): Output plane for the grayscale crop.
+        binary (numpy.ndarray, optional): Output plane for the binary mask.
+
+    Returns:
+        Frame or None: The processed frame, or None if the crop is invalid.
+    """
+    if roi is None:
+        roi = (CROP_X, CROP_Y, CROP_WIDTH, CROP_HEIGHT)
     try:
-        cropped_img = crop_image_with_limits(img, crop_x, crop_y, crop_width, crop_height)
+        cropped_img = crop_image_with_limits(img, *roi)
     except ValueError as e:
         print("Error:", e)
-        return
+        return None
+
+    # Preallocated planes only fit crops of their size (e.g. not clipped at the image border)
+    if gray is not None and gray.shape != cropped_img.shape[:2]:
+        gray = binary = None
 
     # Convert to grayscale
-    gray_cropped_img = cv2.cvtColor(cropped_img, cv2.COLOR_BGR2GRAY)
+    gray_cropped_img = cv2.cvtColor(cropped_img, cv2.COLOR_BGR2GRAY, dst=gray)
 
     # Convert grayscale to binary using Otsu's thresholding
-    _, binary_image = cv2.threshold(gray_cropped_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, binary_image = cv2.threshold(gray_cropped_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=binary)
+
+    frame = Frame(img, cropped_img, gray_cropped_img, binary_image, roi=tuple(roi))
+    if timestamp is not None:
+        frame.timestamp = timestamp
+    return frame
+
+def segment_biscuits(img, region=SEGMENT_REGION):
+    """
+    Finds every biscuit in the belt area of a full snapshot.
+
+    Biscuits are much brighter than the belt, so an Otsu threshold of the
+    search region separates them; each sufficiently large blob becomes one box.
+
+    Returns:
+        list: (x, y, width, height) boxes in full-image coordinates, sorted along the belt.
+    """
+    rx, ry, rw, rh = region
+    gray = cv2.cvtColor(img[ry:ry + rh, rx:rx + rw], cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)))
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    height, width = img.shape[:2]
+    boxes = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if not SEGMENT_MIN_AREA <= area <= SEGMENT_MAX_AREA:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        x0 = max(rx + x - SEGMENT_PAD, 0)
+        y0 = max(ry + y - SEGMENT_PAD, 0)
+        x1 = min(rx + x + w + SEGMENT_PAD, width)
+        y1 = min(ry + y + h + SEGMENT_PAD, height)
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
+def preprocess_rois(img, boxes=None, timestamp=None):
+    """
+    Builds one Frame per biscuit position in a full snapshot.
+
+    Args:
+        img (numpy.ndarray): Full BGR snapshot.
+        boxes (list or str, optional): (x, y, width, height) boxes, or "auto" to
+            segment every biscuit with segment_biscuits(). Defaults to CROP_BOXES.
+        timestamp (float, optional): Capture time shared by all frames.
+
+    Returns:
+        list: Frames for every valid box (each carries its roi).
+    """
+    if boxes is None:
+        boxes = CROP_BOXES
+    elif boxes == "auto":
+        boxes = segment_biscuits(img)
+    frames = []
+    for box in boxes:
+        frame = preprocess_frame(img, timestamp, box)
+        if frame is not None:
+            frames.append(frame)
+    return frames
+
+def processImages(camera=None, newer_than=None, timeout=2.0):
+    """
+    Captures a snapshot and preprocesses it entirely in memory.
+
+    Args:
+        camera (CameraService, optional): Running camera service to take the freshest
+            frame from. When omitted the webcam is opened for a single snapshot.
+            The returned Frame holds views into the camera's ring buffer and is
+            valid until the next capture.
+        newer_than (float, optional): Passed to camera.read() to skip frames grabbed
+            before this time (e.g. while the conveyor was still moving).
+        timeout (float): Seconds to wait for such a frame.
+
+    Returns:
+        Frame or None: The processed frame, or None if capture failed.
+    """
+    if camera is not None:
+        entry = camera.read_entry(newer_than=newer_than, timeout=timeout)
+        if entry is None:
+            return None
+        _, timestamp, img = entry
+        ring = getattr(camera, "ring", None)
+        slot = ring.slot_of(img) if ring is not None else None
+        if slot is not None:
+            # Everything stays inside the ring slot the camera grabbed into
+            return preprocess_frame(img, timestamp, gray=ring.gray[slot], binary=ring.binary[slot])
+        return preprocess_frame(img, timestamp)
+
+    img = capture_frame()
+    if img is None:
+        return None
+    return preprocess_frame(img)
 
+def saveFrame(frame, save_folder="./images/"):
+    """
+    Debug sink: writes the four classic PNGs for a frame (use utils.archive
+    to keep every inspected frame).
 
+    Only called when debug output is wanted; the inspection checks never
+    read these files back.
+    """
     # Ensure save folder exists
     if not os.path.exists(save_folder):
         os.makedirs(save_folder)
 
+    image_path = os.path.join(save_folder, "pra.png")
     cropped_color_path = os.path.join(save_folder, "pra_cropped.png")
     cropped_gray_path = os.path.join(save_folder, "pra_cropped_gray.png")
     binary_image_path = os.path.join(save_folder, "pra_binary.png")
 
     # Save images
-    cv2.imwrite(cropped_color_path, cropped_img)
-    cv2.imwrite(cropped_gray_path, gray_cropped_img)
-    cv2.imwrite(binary_image_path, binary_image)
+    cv2.imwrite(image_path, frame.image)
+    cv2.imwrite(cropped_color_path, frame.cropped)
+    cv2.imwrite(cropped_gray_path, frame.gray)
+    cv2.imwrite(binary_image_path, frame.binary)
 
+    print(f"Snapshot saved to: {image_path}")
     print(f"Cropped color image saved at: {cropped_color_path}")
     print(f"Cropped grayscale image saved at: {cropped_gray_path}")
     print(f"Binary image saved at: {binary_image_path}")
 
+def processImagesAndSave():
+    frame = processImages()
+    if frame is None:
+        return None
+    saveFrame(frame)
+    return frame
+
 if __name__ == "__main__":
     processImagesAndSave()
-    print("Image processing and saving completed.")
\ No newline at end of file
+    print("Image processing and saving completed.")
@@ -0,0 +1,210 @@
+"""
+Early-exit inspection cascade.
+
+The checks run as a chain of stages, and each stage either returns a final
+verdict or hands the frame on:
+
+    prefilter  - downsampled background difference; a clearly empty belt stops here
+    presence   - full background detection (morphology + contours)
+    geometry   - area and corner angles
+    color      - burned state
+    defects    - holes, broken edges and cracks
+
+An empty pitch therefore costs one prefilter pass, and a reject stops at the
+first check that fails. With CHEAPEST_FIRST the verdict stages after presence
+run in order of their measured cost; the reject reason is still the one the
+configured order gives (see InspectionCascade.run()).
+
+Each stage gets the frame and a dict of what earlier stages measured on it, so
+geometry and defects share one analyze_geometry() contour pass. That pass is
+charged to the geometry stage whichever stage runs it, so the cost ordering
+sees each stage's own work.
+"""
+import time
+
+from utils import metrics
+
+CASCADE_STAGES = ("prefilter", "presence", "geometry", "color", "defects")
+CHEAPEST_FIRST = True     # Reorder the stages after "presence" by measured cost
+COST_SMOOTHING = 0.05     # Weight of each new sample in a stage's running mean cost
+
+# Stage -> metrics timer name (kept from the single-chain loop)
+STAGE_METRICS = {"prefilter": "prefilter", "presence": "detection", "color": "color", "geometry": "geometry",
+                 "defects": "defects"}
+
+def _prefilter(frame, measured):
+    from utils.checkObject import get_detector
+
+    detector = get_detector()
+    if detector.might_contain_object(frame.gray):
+        return None
+    # Empty frames keep feeding the adaptive background, as in idObjectPresent()
+    if detector.model_path is not None:
+        detector.update(frame.gray)
+    print("STATUS: No Object Detected (prefilter).")
+    return False, "empty"
+
+def _presence(frame, measured):
+    from utils.checkObject import idObjectPresent
+
+    if not idObjectPresent(frame):
+        return False, "empty"
+    return None
+
+def _color(frame, measured):
+    import cv2
+    from utils.getBurnedState import check_burned_state
+
+    rgb = measured["rgb"] = cv2.mean(frame.cropped)[2::-1]
+    if not check_burned_state(frame=frame, rgb=rgb):
+        return True, "burned state"
+    return None
+
+def _measure_geometry(frame, measured):
+    from utils.checkAreaAndAngle import analyze_geometry
+
+    geometry = measured.get("geometry")
+    if geometry is None:
+        start = time.perf_counter()
+        geometry = measured["geometry"] = analyze_geometry(frame.binary)
+        # Owned by the geometry stage, even when defects gets here first
+        measured.setdefault("shared_seconds", {})["geometry"] = time.perf_counter() - start
+    return geometry
+
+def _geometry(frame, measured):
+    from utils.checkAreaAndAngle import isAreaAndAngleGood
+
+    reasons = []
+    if not isAreaAndAngleGood(frame, reasons, _measure_geometry(frame, measured)):
+        return True, "/".join(reasons) or "area/angle"
+    return None
+
+def _defects(frame, measured):
+    from utils.checkDefects import isDefectFree
+
+    reasons = []
+    if not isDefectFree(frame, reasons, _measure_geometry(frame, measured)):
+        return True, "/".join(reasons)
+    return None
+
+STAGE_FUNCTIONS = {"prefilter": _prefilter, "presence": _presence, "color": _color, "geometry": _geometry,
+                   "defects": _defects}
+
+def reject_reason(failed, stages=None):
+    """
+    The reject reason the cascade gives, for callers that run every check
+    (utils.batchInspect, utils.regrade): the reasons of the first stage in the
+    configured order that rejected, so reasons and reject_reason metrics match
+    the in-process loop.
+
+    Args:
+        failed (dict): Stage name -> its reject reasons, e.g. {"geometry": ["area"], "color": []}.
+        stages (list, optional): Configured stage order; defaults to CASCADE_STAGES.
+
+    Returns:
+        str or None: "/"-joined reasons, or None if no stage rejected.
+    """
+    for stage in stages or CASCADE_STAGES:
+        if failed.get(stage):
+            return "/".join(failed[stage])
+    return None
+
+class InspectionCascade:
+    """
+    Runs the inspection stages in order and stops at the first certain verdict.
+
+    Keeps per-stage statistics: how many frames entered each stage, how many
+    got their verdict there ("exits"), and the time spent in it.
+
+    Usage:
+        cascade = InspectionCascade()
+        bad, reason = cascade.run(frame)
+        print(cascade.report())
+    """
+
+    def __init__(self, stages=CASCADE_STAGES, cheapest_first=CHEAPEST_FIRST):
+        unknown = [stage for stage in stages if stage not in STAGE_FUNCTIONS]
+        if unknown:
+            raise ValueError(f"Unknown cascade stage(s) {unknown}; expected {list(STAGE_FUNCTIONS)}.")
+        self.stages = list(stages)
+        self.cheapest_first = cheapest_first
+        self.entered = dict.fromkeys(self.stages, 0)
+        self.exits = dict.fromkeys(self.stages, 0)
+        self.seconds = dict.fromkeys(self.stages, 0.0)
+        self.cost = dict.fromkeys(self.stages)   # Running mean seconds, None until measured
+        self.passed = 0
+        # What the stages measured on the last frame ("geometry": GeometryResult, "rgb",
+        # "shared_seconds": {owning stage: seconds of shared work})
+        self.measured = {}
+
+    def order(self):
+        """The stages in the order the next frame will run them."""
+        if not self.cheapest_first or "presence" not in self.stages:
+            return self.stages
+        split = self.stages.index("presence") + 1
+        # Unmeasured stages go first so every stage gets a cost estimate
+        verdict_stages = sorted(self.stages[split:], key=lambda stage: self.cost[stage] or 0.0)
+        return self.stages[:split] + verdict_stages
+
+    def _run_stage(self, stage, frame, measured):
+        self.entered[stage] += 1
+        shared = measured.setdefault("shared_seconds", {})
+        shared_before = dict(shared)
+        start = time.perf_counter()
+        verdict = STAGE_FUNCTIONS[stage](frame, measured)
+        elapsed = time.perf_counter() - start
+
+        # Shared work is charged to the stage that owns it, not to whichever stage computed it
+        for owner, seconds in shared.items():
+            if owner != stage and owner not in shared_before:
+                elapsed -= seconds
+            elif owner == stage and owner in shared_before:
+                elapsed += seconds
+
+        self.seconds[stage] += elapsed
+        previous = self.cost[stage]
+        self.cost[stage] = elapsed if previous is None else previous + COST_SMOOTHING * (elapsed - previous)
+        metrics.observe(STAGE_METRICS[stage], elapsed)
+        return verdict
+
+    def run(self, frame):
+        """
+        Inspects one frame.
+
+        When a reordered stage rejects, the stages it overtook (those before it in
+        the configured order) run as well, and the first of them that rejects gives
+        the reason. The reason is therefore the same with or without CHEAPEST_FIRST.
+
+        Returns:
+            tuple: (bool) True if the biscuit must be rejected,
+                   (str) Short reason for the verdict ("empty", "good", "burned state", ...).
+        """
+        self.measured = measured = {}
+        done = set()
+        for stage in self.order():
+            verdict = self._run_stage(stage, frame, measured)
+            done.add(stage)
+            if verdict is None:
+                continue
+            for earlier in self.stages[:self.stages.index(stage)]:
+                if earlier not in done:
+                    earlier_verdict = self._run_stage(earlier, frame, measured)
+                    if earlier_verdict is not None:
+                        stage, verdict = earlier, earlier_verdict
+                        break
+            self.exits[stage] += 1
+            metrics.increment("cascade_exit", stage)
+            return verdict
+        self.passed += 1
+        metrics.increment("cascade_exit", "passed")
+        return False, "good"
+
+    def report(self):
+        """Returns a table of frames entering / exiting each stage and its mean cost."""
+        lines = [f"{'stage':<12}{'entered':>9}{'exits':>9}{'mean ms':>10}"]
+        for stage in self.order():
+            entered = self.entered[stage]
+            mean_ms = 1000.0 * self.seconds[stage] / entered if entered else 0.0
+            lines.append(f"{stage:<12}{entered:>9}{self.exits[stage]:>9}{mean_ms:>10.3f}")
+        lines.append(f"{'passed':<12}{'':>9}{self.passed:>9}")
+        return "\n".join(lines)
@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import math
+from dataclasses import dataclass, field
 
 # --- Helper function to calculate the angle ---
 def calculate_angle(p1, p2, p3):
@@ -21,110 +22,185 @@ def calculate_angle(p1, p2, p3):
     angle_rad = math.acos(cosine_angle)
     return math.degrees(angle_rad)
 
-# --- Main script ---
-
+# --- Define Evaluation Ranges ---
+MIN_AREA = 10200
+MAX_AREA = 12000
+MIN_ANGLE = 86.0
+MAX_ANGLE = 94.0
+
+@dataclass
+class GeometryResult:
+    """Shape measurements of the biscuit in a binary mask."""
+    area: int = 0                      # White pixels in the mask
+    centroid: tuple = None             # (x, y) from the mask moments
+    corners: np.ndarray = None         # (N, 2) polygon approximation of the main contour
+    angles: list = field(default_factory=list)  # Interior angle (degrees) at each corner
+    orientation: float = 0.0           # minAreaRect rotation (degrees)
+    aspect_ratio: float = 0.0          # Long side / short side of the minAreaRect
+    max_defect_depth: float = 0.0      # Deepest convexity defect (px)
+    reasons: list = field(default_factory=list)  # "area", "corner count", "angle range"
+    # Kept from the contour pass for utils.checkDefects
+    contour: np.ndarray = field(default=None, repr=False)         # Main (largest outer) contour
+    hull: np.ndarray = field(default=None, repr=False)            # Its convex hull, as contour indices
+    defect_depths: np.ndarray = field(default=None, repr=False)   # Depth (px) of every convexity defect
+    hole_areas: np.ndarray = field(default=None, repr=False)      # Areas of the holes inside the main contour
+
+    @property
+    def good(self):
+        return not self.reasons
+
+def polygon_angles(points):
+    """
+    Interior angle (degrees) at every vertex of a closed polygon, in one vectorized pass.
 
-def isAreaAndAngleGood() -> bool:
+    Args:
+        points (numpy.ndarray): Array of shape (N, 2) with the polygon vertices in order.
     """
-    Checks if the area and angles of a binary image are within specified ranges.
-    Returns:
-        bool: True if both area and angles are within the specified ranges, False otherwise.
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3:
+        return np.empty(0)
+    vec1 = np.roll(points, 1, axis=0) - points
+    vec2 = np.roll(points, -1, axis=0) - points
+    mags = np.linalg.norm(vec1, axis=1) * np.linalg.norm(vec2, axis=1)
+    dots = np.einsum("ij,ij->i", vec1, vec2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosines = np.clip(dots / mags, -1.0, 1.0)
+    return np.where(mags > 0, np.degrees(np.arccos(cosines)), 0.0)
+
+def analyze_geometry(binary_image):
     """
+    Measures area, corners, orientation and convexity of the biscuit in one pass.
 
-    # --- Define Evaluation Ranges ---
-    MIN_AREA = 10200
-    MAX_AREA = 12000
-    MIN_ANGLE = 86.0
-    MAX_ANGLE = 94.0
-
-    # Path to your binary image
-    image_path = "./images/pra_binary.png"
+    The mask is scanned once for moments (area and centroid) and once for contours;
+    every other measurement reuses the largest contour. RETR_CCOMP returns the holes
+    inside each outline with it, for the defect check.
 
-    # Load the binary image (ensure it's loaded as grayscale)
-    binary_image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if binary_image is None:
-        raise FileNotFoundError(f"Image '{image_path}' not found or could not be opened.")
+    Args:
+        binary_image (numpy.ndarray): 0/255 mask, e.g. Frame.binary.
 
-    # Ensure the image is truly binary (values 0 and 255 only)
-    _, binary_image = cv2.threshold(binary_image, 127, 255, cv2.THRESH_BINARY)
+    Returns:
+        GeometryResult: Measurements plus reject reasons (empty when the shape is good).
+    """
+    moments = cv2.moments(binary_image, binaryImage=True)
+    result = GeometryResult(area=int(moments["m00"]))
+    if moments["m00"] > 0:
+        result.centroid = (moments["m10"] / moments["m00"], moments["m01"] / moments["m00"])
+
+    contours, hierarchy = cv2.findContours(binary_image, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if contours:
+        # The biscuit is the largest outer contour; its children are the holes in it
+        hierarchy = hierarchy.reshape(-1, 4)
+        areas = np.array([cv2.contourArea(contour) for contour in contours])
+        outer = np.flatnonzero(hierarchy[:, 3] == -1)
+        main = outer[np.argmax(areas[outer])]
+        main_contour = result.contour = contours[main]
+        result.hole_areas = areas[hierarchy[:, 3] == main]
 
-    # ===============================================================
-    # === 1. Area Calculation ===
-    # ===============================================================
+        perimeter = cv2.arcLength(main_contour, True)
+        result.corners = cv2.approxPolyDP(main_contour, 0.02 * perimeter, True).reshape(-1, 2)
+        result.angles = polygon_angles(result.corners).tolist()
+
+        (_, _), (width, height), result.orientation = cv2.minAreaRect(main_contour)
+        if min(width, height) > 0:
+            result.aspect_ratio = max(width, height) / min(width, height)
+
+        result.hull = cv2.convexHull(main_contour, returnPoints=False)
+        if len(main_contour) > 3:
+            try:
+                defects = cv2.convexityDefects(main_contour, result.hull)
+            except cv2.error:
+                # Self-intersecting contours have a non-monotonic hull
+                defects = None
+            if defects is not None:
+                result.defect_depths = defects.reshape(-1, 4)[:, 3] / 256.0
+                result.max_defect_depth = float(result.defect_depths.max())
+
+    if not MIN_AREA <= result.area <= MAX_AREA:
+        result.reasons.append("area")
+    angle_problem = angle_reason(result.angles)
+    if angle_problem:
+        result.reasons.append(angle_problem)
+    return result
+
+def find_corner_angles(binary_image):
+    """
+    Approximates the largest contour of a binary mask with a polygon and
+    returns the interior angle (degrees) at each of its corners.
+    """
+    contours, _ = cv2.findContours(binary_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    # Calculate area: count of white pixels (pixel value 255)
-    area = np.sum(binary_image == 255)
-    # print(f"--- Calculated Area ---")
-    print(f"Area (number of white pixels): {area}\n")
+    if not contours:
+        print("No contours were found in the image.")
+        return []
+    main_contour = max(contours, key=cv2.contourArea)
+    perimeter = cv2.arcLength(main_contour, True)
+    approx_corners = cv2.approxPolyDP(main_contour, 0.02 * perimeter, True)
+    if len(approx_corners) < 3:
+        print("Shape has too few vertices to calculate angles.")
+        return []
+    return polygon_angles(approx_corners).tolist()
+
+def angle_reason(calculated_angles):
+    """Returns the reject reason for a list of corner angles, or "" if they are good."""
+    if len(calculated_angles) != 4:
+        return "corner count"
+    if not all(MIN_ANGLE <= angle <= MAX_ANGLE for angle in calculated_angles):
+        return "angle range"
+    return ""
 
+# --- Main script ---
 
-    # ===============================================================
-    # === 2. Find and Output Angles ===
-    # ===============================================================
-    # print("--- Calculated Angles ---")
 
-    contours, _ = cv2.findContours(binary_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    calculated_angles = []
+def isAreaAndAngleGood(frame=None, reasons=None, geometry=None) -> bool:
+    """
+    Checks if the area and angles of a binary image are within specified ranges.
+    Args:
+        frame (Frame, optional): In-memory frame from processImages(). When omitted the
+            binary image is read from ./images/pra_binary.png instead.
+        reasons (list, optional): If given, short reject reasons ("area", "corner count",
+            "angle range") are appended to it.
+        geometry (GeometryResult, optional): analyze_geometry() result for the frame's
+            mask, if it was already measured.
+    Returns:
+        bool: True if both area and angles are within the specified ranges, False otherwise.
+    """
 
-    if not contours:
-        print("No contours were found in the image.")
+    if geometry is not None:
+        binary_image = None
+    elif frame is not None:
+        # The in-memory Otsu mask is already strictly 0/255
+        binary_image = frame.binary
     else:
-        main_contour = max(contours, key=cv2.contourArea)
-        perimeter = cv2.arcLength(main_contour, True)
-        approx_corners = cv2.approxPolyDP(main_contour, 0.02 * perimeter, True)
-        points = [tuple(p[0]) for p in approx_corners]
-        num_corners = len(points)
-
-        if num_corners < 3:
-            print("Shape has too few vertices to calculate angles.")
-        else:
-            for i in range(num_corners):
-                p1 = points[i - 1]
-                p2 = points[i]
-                p3 = points[(i + 1) % num_corners]
-                angle = calculate_angle(p1, p2, p3)
-                calculated_angles.append(angle)
-
-    if not calculated_angles:
-        print("No angles were calculated.")
-    # else:
-    #     for i, angle in enumerate(calculated_angles):
-    #         print(f"Angle {i+1}: {angle:.2f} degrees")
+        # Path to your binary image
+        image_path = "./images/pra_binary.png"
 
+        # Load the binary image (ensure it's loaded as grayscale)
+        binary_image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if binary_image is None:
+            raise FileNotFoundError(f"Image '{image_path}' not found or could not be opened.")
+
+        # Ensure the image is truly binary (values 0 and 255 only)
+        _, binary_image = cv2.threshold(binary_image, 127, 255, cv2.THRESH_BINARY)
+
+    result = geometry if geometry is not None else analyze_geometry(binary_image)
+    print(f"Area (number of white pixels): {result.area}\n")
+    if not result.angles:
+        print("No angles were calculated.")
 
     # ===============================================================
-    # === 3. Evaluation Section ===
+    # === Evaluation Section ===
     # ===============================================================
     print("\n--- Evaluation Result ---")
 
-    # Evaluate Area
-    is_area_good = MIN_AREA <= area <= MAX_AREA
-    area_status = "Good" if is_area_good else "Bad"
+    area_status = "Bad" if "area" in result.reasons else "Good"
     print(f"Area Status: {area_status} (Range: {MIN_AREA}-{MAX_AREA})")
 
-    # Evaluate Angles
     # Condition: Must be a 4-corner shape AND all angles must be in range.
-    is_angle_count_correct = (len(calculated_angles) == 4)
-    all_angles_in_range = all(MIN_ANGLE <= angle <= MAX_ANGLE for angle in calculated_angles)
-
-    is_angles_good = is_angle_count_correct and all_angles_in_range
-    angle_status = "Good" if is_angles_good else "Bad"
-
-    # Provide detailed reason for bad angle status
-    if not is_angle_count_correct:
-        reason = f"Expected 4 corners, but found {len(calculated_angles)}."
-    elif not all_angles_in_range:
-        reason = "One or more angles were outside the range."
-    else:
-        reason = "" # No reason needed if good
-
+    angle_status = "Bad" if angle_reason(result.angles) else "Good"
     print(f"Angle Status: {angle_status} (Range for all 4 angles: {MIN_ANGLE}-{MAX_ANGLE})")
-    # if not is_angles_good:
-    #     print(f"  - Reason: {reason}")
+    print(f"Orientation: {result.orientation:.1f} deg, aspect ratio: {result.aspect_ratio:.2f}, "
+          f"deepest convexity defect: {result.max_defect_depth:.1f} px")
 
-
-    # --- Final Verdict ---
-    if is_area_good and is_angles_good:
-        return True
-    else:
-        return False
+    if reasons is not None:
+        reasons.extend(result.reasons)
+    return result.good
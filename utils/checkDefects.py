@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+from dataclasses import dataclass, field
+
+from utils.checkAreaAndAngle import analyze_geometry
+
+# --- Define Evaluation Limits ---
+# Holes: child contours of the biscuit outline (RETR_CCOMP) larger than this
+# count as holes; smaller ones are surface texture or noise
+MIN_HOLE_AREA = 20
+MAX_HOLES = 0
+# Bites and broken edges: convexity defects of the outline deeper than this (px).
+# A clean biscuit outline stays below about 2 px.
+MAX_DEFECT_DEPTH = 6.0
+# Cracks: share of the biscuit's inner area whose Sobel gradient exceeds
+# CRACK_GRADIENT. The outline's own edge is excluded by shrinking the area by
+# CRACK_EDGE_MARGIN px.
+CRACK_GRADIENT = 200.0
+CRACK_EDGE_MARGIN = 5
+MAX_CRACK_SCORE = 0.005
+
+@dataclass
+class DefectResult:
+    """Surface and outline defects of the biscuit in a binary mask."""
+    holes: int = 0                     # Holes larger than MIN_HOLE_AREA
+    hole_area: float = 0.0             # Their total area (px)
+    max_defect_depth: float = 0.0      # Deepest convexity defect of the outline (px)
+    broken_edges: int = 0              # Convexity defects deeper than MAX_DEFECT_DEPTH
+    crack_score: float = 0.0           # Share of inner pixels on strong gradient edges
+    reasons: list = field(default_factory=list)  # "holes", "broken edge", "cracks"
+
+    @property
+    def good(self):
+        return not self.reasons
+
+_kernels = {}
+
+def _margin_kernel(margin):
+    kernel = _kernels.get(margin)
+    if kernel is None:
+        kernel = _kernels[margin] = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * margin + 1, 2 * margin + 1))
+    return kernel
+
+def analyze_defects(binary_image, gray_image, geometry=None):
+    """
+    Looks for holes, bites/broken edges and cracks, reusing the geometry contour pass.
+
+    analyze_geometry() finds the outline with RETR_CCOMP, which returns the holes
+    inside it too, and measures the outline's convexity defects; both are read
+    from its GeometryResult here instead of scanning the mask again. Cracks are
+    scored with one Sobel pass over the gray crop, counted inside the biscuit's
+    convex hull (so a crack that opens to the edge is still inside it).
+
+    Args:
+        binary_image (numpy.ndarray): 0/255 mask, e.g. Frame.binary.
+        gray_image (numpy.ndarray): Grayscale crop of the same size, e.g. Frame.gray.
+        geometry (GeometryResult, optional): analyze_geometry() result for the same mask;
+            measured here when omitted.
+
+    Returns:
+        DefectResult: Measurements plus reject reasons (empty when no defect was found).
+    """
+    if geometry is None:
+        geometry = analyze_geometry(binary_image)
+    result = DefectResult()
+    if geometry.contour is None:
+        return result
+
+    hole_areas = geometry.hole_areas[geometry.hole_areas >= MIN_HOLE_AREA]
+    result.holes = int(hole_areas.size)
+    result.hole_area = float(hole_areas.sum())
+
+    if geometry.defect_depths is not None:
+        result.max_defect_depth = geometry.max_defect_depth
+        result.broken_edges = int(np.count_nonzero(geometry.defect_depths > MAX_DEFECT_DEPTH))
+
+    inner = np.zeros_like(binary_image)
+    cv2.fillConvexPoly(inner, geometry.contour[geometry.hull.ravel()], 255)
+    cv2.erode(inner, _margin_kernel(CRACK_EDGE_MARGIN), dst=inner)
+    inner_area = cv2.countNonZero(inner)
+    if inner_area:
+        gradient = cv2.magnitude(cv2.Sobel(gray_image, cv2.CV_32F, 1, 0), cv2.Sobel(gray_image, cv2.CV_32F, 0, 1))
+        result.crack_score = np.count_nonzero((gradient > CRACK_GRADIENT) & (inner > 0)) / inner_area
+
+    if result.holes > MAX_HOLES:
+        result.reasons.append("holes")
+    if result.broken_edges:
+        result.reasons.append("broken edge")
+    if result.crack_score > MAX_CRACK_SCORE:
+        result.reasons.append("cracks")
+    return result
+
+def isDefectFree(frame=None, reasons=None, geometry=None) -> bool:
+    """
+    Checks the biscuit for holes, bites/broken edges and cracks.
+    Args:
+        frame (Frame, optional): In-memory frame from processImages(). When omitted the
+            binary and grayscale crops are read from ./images/ instead.
+        reasons (list, optional): If given, short reject reasons ("holes", "broken edge",
+            "cracks") are appended to it.
+        geometry (GeometryResult, optional): analyze_geometry() result for the frame's
+            mask, if it was already measured.
+    Returns:
+        bool: True if no defect was found, False otherwise.
+    """
+    if frame is not None:
+        binary_image, gray_image = frame.binary, frame.gray
+    else:
+        binary_image = cv2.imread("./images/pra_binary.png", cv2.IMREAD_GRAYSCALE)
+        gray_image = cv2.imread("./images/pra_cropped_gray.png", cv2.IMREAD_GRAYSCALE)
+        if binary_image is None or gray_image is None:
+            raise FileNotFoundError("./images/pra_binary.png or ./images/pra_cropped_gray.png could not be opened.")
+        _, binary_image = cv2.threshold(binary_image, 127, 255, cv2.THRESH_BINARY)
+
+    result = analyze_defects(binary_image, gray_image, geometry)
+    print("\n--- Defect Result ---")
+    print(f"Holes: {result.holes} ({result.hole_area:.0f} px), deepest edge defect: "
+          f"{result.max_defect_depth:.1f} px (limit {MAX_DEFECT_DEPTH}), crack score: "
+          f"{result.crack_score:.4f} (limit {MAX_CRACK_SCORE})")
+    print(f"Defect Status: {'Bad (' + ', '.join(result.reasons) + ')' if result.reasons else 'Good'}")
+
+    if reasons is not None:
+        reasons.extend(result.reasons)
+    return result.good
+
+if __name__ == "__main__":
+    isDefectFree()
@@ -1,12 +1,24 @@
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 
 BACKGROUND_IMAGE_PATH = "./images/no_object.png" # This should be the image of the empty area
 CURRENT_IMAGE_PATH = "./images/pra_cropped_gray.png"
 CHANGE_THRESHOLD = 30
 MIN_OBJECT_AREA = 500 # Example: A small biscuit might be 500-1000 pixels or more
+# Adaptive background: empty frames are blended into a running average so the
+# reference follows slow lighting and belt changes. Only the live line should
+# learn it; benchmark.py and main.py --sim switch it off before the first
+# detection so they never overwrite the line's saved model.
+ADAPTIVE_BACKGROUND = True
+BACKGROUND_LEARNING_RATE = 0.05 # Weight of each new empty frame (0-1)
+BACKGROUND_MODEL_PATH = "./images/background_model.npy" # Persisted running average
+PERSIST_EVERY = 50 # Save the model every N updates
+# Prefilter: a background difference on images downsampled by PREFILTER_SCALE.
+# A frame counts as empty without the full detection when its changed area is
+# below PREFILTER_MARGIN * MIN_OBJECT_AREA (far too small to hold an object)
+PREFILTER_SCALE = 4
+PREFILTER_MARGIN = 0.25
 # --- Helper Function to Load Image Safely ---
 def load_image_safely(path, name="Image"):
     """Loads an image and checks if it was loaded successfully."""
@@ -15,102 +27,265 @@ def load_image_safely(path, name="Image"):
         raise FileNotFoundError(f"{name} not found at '{path}'. Please check the path.")
     return img
 
-# --- Main Detection Logic ---
-def detect_object_presence(background_img_path, current_img_path):
+def to_gray(img):
+    """Returns a grayscale view of a BGR or already-grayscale image."""
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def ensure_background(path=BACKGROUND_IMAGE_PATH):
+    """Writes a plain gray dummy background if none has been recorded yet."""
+    if not os.path.exists(path):
+        print(f"Creating a dummy background image at {path}")
+        dummy_bg = np.zeros((400, 600, 3), dtype=np.uint8)
+        dummy_bg.fill(150) # Fill with a medium gray color
+        cv2.putText(dummy_bg, "BACKGROUND (No Object)", (100, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        cv2.imwrite(path, dummy_bg)
+
+# --- Stateful Detector ---
+class ObjectDetector:
     """
-    Detects if an object is present in the current image by comparing it to a background.
+    Background-difference object detector that keeps all its state between frames.
 
-    Args:
-        background_img_path (str): Path to the image of the empty background.
-        current_img_path (str): Path to the current image (with or without object).
+    The background is loaded and converted to grayscale once, the structuring
+    element is built once, and the difference/threshold/morphology outputs are
+    written into preallocated buffers, so detect() allocates no images per frame.
+
+    With a model_path the detector also keeps an exponential running average of
+    the empty belt: update() blends a frame classified as empty into the model
+    (one vectorized O(pixels) pass) and the model is saved periodically so it
+    survives restarts.
+
+    Note: the mask returned by detect() is an internal buffer that is overwritten
+    by the next call; copy it if it has to be kept.
+    """
+
+    def __init__(self, background_path=BACKGROUND_IMAGE_PATH,
+                 change_threshold=CHANGE_THRESHOLD, min_object_area=MIN_OBJECT_AREA,
+                 model_path=None, learning_rate=BACKGROUND_LEARNING_RATE):
+        self.background_path = background_path
+        self.change_threshold = change_threshold
+        self.min_object_area = min_object_area
+        self.model_path = model_path
+        self.learning_rate = learning_rate
+        self.updates = 0
+
+        ensure_background(background_path)
+        print(f"Loading background image from: {background_path}")
+        self.background = to_gray(load_image_safely(background_path, "Background Image")).copy()
+
+        # Running average of the empty belt (float32 so small updates are not lost to rounding)
+        self._model = self.background.astype(np.float32)
+        if model_path is not None and os.path.exists(model_path):
+            saved = np.load(model_path)
+            if saved.shape == self._model.shape:
+                print(f"Loading background model from: {model_path}")
+                self._model[...] = saved
+                np.copyto(self.background, np.clip(np.rint(saved), 0, 255).astype(np.uint8))
+            else:
+                print(f"Warning: Ignoring background model with shape {saved.shape} (expected {self._model.shape}).")
+
+        # Opening removes small white speckles, closing fills small holes
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)) # Adjust kernel size if needed
+
+        shape = self.background.shape
+        self._diff = np.empty(shape, dtype=np.uint8)
+        self._thresh = np.empty(shape, dtype=np.uint8)
+        self._opened = np.empty(shape, dtype=np.uint8)
+        self._mask = np.empty(shape, dtype=np.uint8)
+
+        small = (max(1, shape[0] // PREFILTER_SCALE), max(1, shape[1] // PREFILTER_SCALE))
+        self._small_background = np.empty(small, dtype=np.uint8)
+        self._small_current = np.empty(small, dtype=np.uint8)
+        self._small_diff = np.empty(small, dtype=np.uint8)
+        self._small_stale = True
+        # Full-resolution pixels represented by one downsampled pixel
+        self._small_weight = (shape[0] * shape[1]) / float(small[0] * small[1])
+
+    def might_contain_object(self, gray_current):
+        """
+        Cheap prefilter ahead of detect(): compares downsampled copies of the
+        frame and the background and returns False only when the changed area
+        is far too small to hold an object. True means "run detect()".
+
+        Args:
+            gray_current (numpy.ndarray): Grayscale image of the inspection window.
+        """
+        if gray_current.shape != self.background.shape:
+            return True
+        height, width = self._small_current.shape
+        if self._small_stale:
+            cv2.resize(self.background, (width, height), dst=self._small_background, interpolation=cv2.INTER_AREA)
+            self._small_stale = False
+        cv2.resize(gray_current, (width, height), dst=self._small_current, interpolation=cv2.INTER_AREA)
+        cv2.absdiff(self._small_background, self._small_current, dst=self._small_diff)
+        cv2.threshold(self._small_diff, self.change_threshold, 255, cv2.THRESH_BINARY, dst=self._small_diff)
+        changed_area = cv2.countNonZero(self._small_diff) * self._small_weight
+        return changed_area >= PREFILTER_MARGIN * self.min_object_area
+
+    def detect(self, gray_current):
+        """
+        Compares a grayscale image with the background.
+
+        Args:
+            gray_current (numpy.ndarray): Grayscale image of the inspection window.
+
+        Returns:
+            tuple: (bool) True if an object is detected,
+                   (list) areas (px) of the significant contours,
+                   (numpy.ndarray) cleaned change mask (internal buffer).
+        """
+        if gray_current.shape != self.background.shape:
+            print("Warning: Background and current images have different dimensions. Resizing current image.")
+            gray_current = cv2.resize(gray_current, (self.background.shape[1], self.background.shape[0]))
+
+        # Pixels with difference > change_threshold become white (255), others black (0)
+        cv2.absdiff(self.background, gray_current, dst=self._diff)
+        cv2.threshold(self._diff, self.change_threshold, 255, cv2.THRESH_BINARY, dst=self._thresh)
+        cv2.morphologyEx(self._thresh, cv2.MORPH_OPEN, self.kernel, dst=self._opened, iterations=2)
+        cv2.morphologyEx(self._opened, cv2.MORPH_CLOSE, self.kernel, dst=self._mask, iterations=2)
+
+        contours, _ = cv2.findContours(self._mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        areas = []
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area > self.min_object_area:
+                areas.append(area)
+        return bool(areas), areas, self._mask
+
+    def update(self, gray_current):
+        """
+        Blends a frame classified as empty into the background model.
+
+        Args:
+            gray_current (numpy.ndarray): Grayscale image with no object in it.
+        """
+        if gray_current.shape != self.background.shape:
+            return
+        cv2.accumulateWeighted(gray_current, self._model, self.learning_rate)
+        cv2.convertScaleAbs(self._model, dst=self.background)
+        self._small_stale = True
+        self.updates += 1
+        if self.model_path is not None and self.updates % PERSIST_EVERY == 0:
+            self.save()
+
+    def save(self):
+        """Atomically writes the running-average model to model_path."""
+        if self.model_path is None:
+            return
+        tmp_path = self.model_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self._model)
+        os.replace(tmp_path, self.model_path)
+
+    @property
+    def diff(self):
+        """Absolute difference image from the last detect() call."""
+        return self._diff
+
+_detectors = {}
+
+def get_detector(background_path=BACKGROUND_IMAGE_PATH):
+    """Returns the shared ObjectDetector for a background image, creating it on first use."""
+    detector = _detectors.get(background_path)
+    if detector is None:
+        model_path = BACKGROUND_MODEL_PATH if ADAPTIVE_BACKGROUND and background_path == BACKGROUND_IMAGE_PATH else None
+        detector = _detectors[background_path] = ObjectDetector(background_path, model_path=model_path)
+    return detector
+
+def save_background_models():
+    """Saves the running-average model of every shared detector that learns one (call on shutdown)."""
+    for detector in _detectors.values():
+        if detector.model_path is not None and detector.updates:
+            detector.save()
+            print(f"Background model saved to: {detector.model_path}")
+
+# --- Debug Annotation (opt-in, never on the hot path) ---
+def annotate_detection(image, mask, min_object_area=MIN_OBJECT_AREA):
+    """
+    Draws a box and label around every significant change in `mask` on a copy of `image`.
 
     Returns:
-        tuple: (bool) True if an object is detected, False otherwise.
-               (numpy.ndarray) The image with detected changes highlighted.
+        numpy.ndarray: The annotated copy (BGR).
     """
-    print(f"Loading background image from: {background_img_path}")
-    background_img = load_image_safely(background_img_path, "Background Image")
-
-    print(f"Loading current image from: {current_img_path}")
-    current_img = load_image_safely(current_img_path, "Current Image")
-
-    # Ensure images are of the same size
-    if background_img.shape != current_img.shape:
-        print("Warning: Background and current images have different dimensions. Resizing current image.")
-        current_img = cv2.resize(current_img, (background_img.shape[1], background_img.shape[0]))
-
-    # Convert both images to grayscale for comparison
-    gray_background = cv2.cvtColor(background_img, cv2.COLOR_BGR2GRAY)
-    gray_current = cv2.cvtColor(current_img, cv2.COLOR_BGR2GRAY)
-
-    # Compute the absolute difference between the two grayscale images
-    # This highlights areas where changes have occurred
-    diff_img = cv2.absdiff(gray_background, gray_current)
-    print("Computed absolute difference between images.")
-
-    # Apply a threshold to the difference image to get a binary mask of changes
-    # Pixels with difference > CHANGE_THRESHOLD become white (255), others black (0)
-    _, thresh_img = cv2.threshold(diff_img, CHANGE_THRESHOLD, 255, cv2.THRESH_BINARY)
-    print(f"Applied thresholding to difference image with threshold: {CHANGE_THRESHOLD}")
-
-    # Perform morphological operations to clean up noise and fill small gaps
-    # Opening (erosion followed by dilation) removes small white noise (speckles)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)) # Adjust kernel size if needed
-    thresh_img_clean = cv2.morphologyEx(thresh_img, cv2.MORPH_OPEN, kernel, iterations=2)
-    # Closing (dilation followed by erosion) fills small black holes in white regions
-    thresh_img_clean = cv2.morphologyEx(thresh_img_clean, cv2.MORPH_CLOSE, kernel, iterations=2)
-    print("Performed morphological operations to clean the mask.")
-
-    # Find contours in the cleaned thresholded image
-    # Contours represent continuous boundaries of objects
-    contours, _ = cv2.findContours(thresh_img_clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    print(f"Found {len(contours)} contours.")
-
-    object_detected = False
-    output_display_img = current_img.copy() # Create a copy to draw on
-
-    # Iterate through detected contours and check their area
+    output_display_img = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image.copy()
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     for contour in contours:
         area = cv2.contourArea(contour)
-        if area > MIN_OBJECT_AREA:
-            object_detected = True
+        if area > min_object_area:
             # Draw a bounding box around the detected object
             x, y, w, h = cv2.boundingRect(contour)
             cv2.rectangle(output_display_img, (x, y), (x + w, y + h), (0, 255, 0), 2) # Green rectangle
             cv2.putText(output_display_img, f"Object ({int(area)}px)", (x, y - 10),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            print(f"  - Significant object detected with area: {area} pixels.")
-        else:
-            print(f"  - Small change (area: {area} pixels) ignored as noise.")
+    return output_display_img
 
-    return object_detected, output_display_img, diff_img, thresh_img_clean
+# --- Main Detection Logic ---
+def detect_object_presence(background_img_path, current_img_path, annotate=False):
+    """
+    Detects if an object is present in the current image by comparing it to a background.
+
+    Args:
+        background_img_path (str): Path to the image of the empty background.
+        current_img_path (str or numpy.ndarray): Path to the current image (with or without object),
+            or the image itself (BGR or grayscale) when it is already in memory.
+        annotate (bool): Also return an annotated copy plus copies of the difference and
+            mask images. Off by default so detection allocates no images.
+
+    Returns:
+        tuple: (bool) True if an object is detected, False otherwise.
+               (numpy.ndarray or None) The image with detected changes highlighted.
+               (numpy.ndarray or None) Absolute difference image.
+               (numpy.ndarray or None) Cleaned change mask.
+    """
+    detector = get_detector(background_img_path)
+
+    if isinstance(current_img_path, np.ndarray):
+        current_img = current_img_path
+    else:
+        print(f"Loading current image from: {current_img_path}")
+        current_img = load_image_safely(current_img_path, "Current Image")
+
+    object_detected, areas, thresh_img_clean = detector.detect(to_gray(current_img))
+    for area in areas:
+        print(f"  - Significant object detected with area: {area} pixels.")
+
+    if not annotate:
+        return object_detected, None, None, None
+    output_display_img = annotate_detection(current_img, thresh_img_clean, detector.min_object_area)
+    return object_detected, output_display_img, detector.diff.copy(), thresh_img_clean.copy()
 
 # --- Main Execution ---
-def idObjectPresent() -> bool:
+def idObjectPresent(frame=None) -> bool:
     """
     Checks if an object is present in the current image by comparing it to a background image.
+    Args:
+        frame (Frame, optional): In-memory frame from processImages(). When omitted the
+            grayscale crop is read from CURRENT_IMAGE_PATH instead.
     Returns:
         bool: True if an object is detected, False otherwise.
     """
-    if not os.path.exists(BACKGROUND_IMAGE_PATH):
-        print(f"Creating a dummy background image at {BACKGROUND_IMAGE_PATH}")
-        dummy_bg = np.zeros((400, 600, 3), dtype=np.uint8)
-        dummy_bg.fill(150) # Fill with a medium gray color
-        cv2.putText(dummy_bg, "BACKGROUND (No Object)", (100, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        cv2.imwrite(BACKGROUND_IMAGE_PATH, dummy_bg)
+    detector = get_detector()
 
     # Perform detection
-    is_object_present, result_img, diff_img, clean_mask = \
-        detect_object_presence(BACKGROUND_IMAGE_PATH, CURRENT_IMAGE_PATH)
+    if frame is not None:
+        gray_current = frame.gray
+    else:
+        print(f"Loading current image from: {CURRENT_IMAGE_PATH}")
+        gray_current = to_gray(load_image_safely(CURRENT_IMAGE_PATH, "Current Image"))
+    is_object_present, areas, _ = detector.detect(gray_current)
 
+    # Let the background follow lighting/belt drift using frames that are empty
+    if not is_object_present and detector.model_path is not None:
+        detector.update(gray_current)
 
     print("\n--- Detection Result ---")
     if is_object_present:
-        print("STATUS: Object Detected!")
+        print(f"STATUS: Object Detected! (area: {int(max(areas))} pixels)")
         return True
     else:
         print("STATUS: No Object Detected.")
         return False
 
 if __name__ == "__main__":
-    idObjectPresent()
\ No newline at end of file
+    idObjectPresent()
@@ -0,0 +1,147 @@
+import json
+import cv2
+import numpy as np
+
+RGB_MAP_PATH = "./rgbMap.json"
+CONFIG_PATH = RGB_MAP_PATH   # File get_classifier() reads by default; set by inspectionConfig.apply()
+LUT_BITS = 6                 # Levels per channel = 2**LUT_BITS (64 -> 262144-entry table)
+UNKNOWN = 255                # LUT value for colors that match no class
+
+def load_classifications(path=RGB_MAP_PATH):
+    """
+    Reads the class definitions from rgbMap.json.
+
+    Returns:
+        dict: {class name: definition} with channel_1..3 min/max thresholds,
+              quality_status, action and optional reference_rgb.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    system = data["biscuit_quality_control_system"]
+    if system.get("rgb_conversion", {}).get("input_format", "RGB") != "RGB":
+        raise ValueError("Only RGB channel order is supported in rgbMap.json.")
+    classifications = system["classifications"]
+    for name, definition in classifications.items():
+        for channel in ("channel_1", "channel_2", "channel_3"):
+            limits = definition.get(channel)
+            if limits is None or limits["min_threshold"] > limits["max_threshold"]:
+                raise ValueError(f"Invalid {channel} thresholds for class '{name}' in {path}.")
+    return classifications
+
+def _box(definition):
+    lo = np.array([definition[c]["min_threshold"] for c in ("channel_1", "channel_2", "channel_3")])
+    hi = np.array([definition[c]["max_threshold"] for c in ("channel_1", "channel_2", "channel_3")])
+    return lo, hi
+
+class ColorClassifier:
+    """
+    Color classifier compiled into a 3D RGB lookup table.
+
+    Every quantised RGB cell is assigned a class once at compile time, so
+    classifying a color, a whole crop or every pixel of a crop is a single
+    NumPy indexing pass. Classes come from rgbMap.json, so new classes only
+    need a new entry there.
+
+    Each cell gets the class of the nearest reference color under
+    reference_key (or the center of the class's channel box when none is
+    given). A class may list several references, e.g. light and charred shades.
+    """
+
+    def __init__(self, classifications, bits=LUT_BITS, reference_key="reference_rgb"):
+        self.names = list(classifications)
+        self.classifications = classifications
+        self.reference_key = reference_key
+        self.bits = bits
+        self.shift = 8 - bits
+        self.good = np.array([classifications[n].get("quality_status") == "acceptable" for n in self.names] + [False])
+        self.lut = self._compile()
+
+    @classmethod
+    def from_rgb_map(cls, path=RGB_MAP_PATH, **kwargs):
+        return cls(load_classifications(path), **kwargs)
+
+    def _centroids(self):
+        """Returns (centroid colors, owning class index per centroid)."""
+        centroids = []
+        owners = []
+        for index, name in enumerate(self.names):
+            definition = self.classifications[name]
+            reference = definition.get(self.reference_key)
+            if reference is None:
+                lo, hi = _box(definition)
+                reference = [(lo + hi) / 2.0]
+            elif np.ndim(reference) == 1:
+                reference = [reference]
+            for color in reference:
+                centroids.append(color)
+                owners.append(index)
+        return np.asarray(centroids, dtype=np.float64), np.asarray(owners, dtype=np.uint8)
+
+    def _compile(self):
+        levels = 1 << self.bits
+        step = 1 << self.shift
+        centers = np.arange(levels) * step + (step - 1) / 2.0
+        r, g, b = np.meshgrid(centers, centers, centers, indexing="ij")
+        colors = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+
+        # Nearest centroid for every cell
+        centroids, owners = self._centroids()
+        lut = np.empty(len(colors), dtype=np.uint8)
+        for start in range(0, len(colors), 65536):
+            chunk = colors[start:start + 65536]
+            d = ((chunk[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+            lut[start:start + 65536] = owners[d.argmin(axis=1)]
+        return lut
+
+    def _index(self, r, g, b):
+        s = self.shift
+        return ((r.astype(np.int32) >> s) << (2 * self.bits)) | ((g.astype(np.int32) >> s) << self.bits) | (b.astype(np.int32) >> s)
+
+    def name(self, class_index):
+        return self.names[class_index] if class_index != UNKNOWN else "unknown"
+
+    def classify_colors(self, rgb):
+        """Classifies an (N, 3) array of RGB colors; returns class indices."""
+        rgb = np.clip(np.rint(np.asarray(rgb, dtype=np.float64).reshape(-1, 3)), 0, 255).astype(np.uint8)
+        return self.lut[self._index(rgb[:, 0], rgb[:, 1], rgb[:, 2])]
+
+    def classify_pixels(self, bgr_image):
+        """Returns a per-pixel class index map for a BGR image."""
+        b, g, r = cv2.split(bgr_image)
+        return self.lut[self._index(r, g, b)]
+
+    def histogram(self, bgr_image, mask=None):
+        """
+        Fraction of pixels in each class (last entry: unknown), optionally only where mask != 0.
+
+        Returns:
+            numpy.ndarray: Fractions per class in self.names order, plus unknown.
+        """
+        if mask is not None:
+            pixels = bgr_image[mask != 0]
+        else:
+            pixels = bgr_image.reshape(-1, 3)
+        classes = self.lut[self._index(pixels[:, 2], pixels[:, 1], pixels[:, 0])]
+        counts = np.bincount(np.where(classes == UNKNOWN, len(self.names), classes), minlength=len(self.names) + 1)
+        total = counts.sum()
+        return counts / total if total else counts.astype(np.float64)
+
+    def classify_crop(self, bgr_image):
+        """Classifies the mean color of a BGR crop; returns (class name, is acceptable)."""
+        mean_rgb = np.array(cv2.mean(bgr_image)[:3])[::-1]
+        index = int(self.classify_colors(mean_rgb)[0])
+        return self.name(index), bool(self.good[index if index != UNKNOWN else -1])
+
+_classifiers = {}
+
+def get_classifier(path=None, reference_key="reference_rgb"):
+    """
+    Returns the compiled classifier for an rgbMap file, compiling it on first use.
+
+    Without a path it uses the active inspection config (CONFIG_PATH), so the
+    classes come from the same file as the thresholds.
+    """
+    key = (path or CONFIG_PATH, reference_key)
+    if key not in _classifiers:
+        _classifiers[key] = ColorClassifier.from_rgb_map(key[0], reference_key=reference_key)
+    return _classifiers[key]
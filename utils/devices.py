@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+
+SERIAL_PORT = "/dev/ttyUSB0"
+BAUD_RATE = 115200
+# RS485 address of the conveyor's controller. -1 drives it as the arm controller's
+# 7th axis, which finishes each belt move before the next arm move starts.
+# Continuous-belt mode (utils/tracking.py) needs the conveyor on its own
+# controller so the belt keeps running while the arm picks (main.py --conveyor-address).
+CONVEYOR_ADDRESS = -1
+
+@dataclass
+class Devices:
+    """
+    The hardware one station needs: the controller serial port and the
+    SerialLink that owns it, the arm, the conveyor axis and the camera.
+
+    All backends expose the same objects, so the rest of the pipeline does
+    not know whether it talks to the real line or the simulator.
+    """
+    serial_port: object
+    mirobot: object
+    conveyor: object
+    camera: object
+    backend: str = "hardware"
+    time_scale: float = 1.0   # < 1 when the simulator runs faster than real time
+    link: object = None
+
+    def close(self):
+        self.camera.stop()
+        if self.link is not None:
+            self.link.close()
+        self.serial_port.close()
+        print("Serial connection closed.")
+
+def connectControllers(serial_port, conveyor_address=CONVEYOR_ADDRESS, time_scale=1.0):
+    """
+    Starts the SerialLink for an open port and returns (link, mirobot, conveyor).
+
+    The arm and the conveyor share the controller's UART, so both command
+    builders queue onto the same link instead of writing to the port themselves.
+    time_scale < 1 (simulator) shortens the status polling along with the
+    simulated moves, so a scaled cycle keeps the proportions of a real one.
+    """
+    from utils.motion import POLL_INTERVAL
+    from utils.serialLink import SerialLink, QueuedMirobot
+
+    link = SerialLink(serial_port).start()
+    poll_interval = POLL_INTERVAL * time_scale
+    # Address -1 is used for direct connection; adjust if using a multi-function controller
+    mirobot = QueuedMirobot(link, -1, poll_interval)
+    conveyor = QueuedMirobot(link, conveyor_address, poll_interval)
+    return link, mirobot, conveyor
+
+def openHardware(port=SERIAL_PORT, camera=None, conveyor_address=CONVEYOR_ADDRESS):
+    """Opens the real serial port (once), Mirobot/conveyor controllers and webcam."""
+    import serial
+    from utils.cameraService import CameraService
+
+    serial_port = serial.Serial(port, BAUD_RATE, timeout=1)
+    link, mirobot, conveyor = connectControllers(serial_port, conveyor_address)
+
+    if camera is None:
+        camera = CameraService()
+    return Devices(serial_port, mirobot, conveyor, camera.start(), "hardware", link=link)
+
+def openSimulator(image_dir="./images/", time_scale=1.0, shared_frames=False, belt=False,
+                  conveyor_address=CONVEYOR_ADDRESS):
+    """
+    Opens the simulated backend: a replayed image directory for the camera and
+    a fake controller that models realistic G-code and writeangle latencies.
+    shared_frames puts the camera's frame ring in shared memory (for utils.visionPool).
+    belt films the images moving along with the simulated conveyor (SimBeltCamera)
+    instead of replaying one image per capture. A conveyor_address other than
+    -1 simulates the belt on its own controller, moving independently of the arm.
+    """
+    from utils.simulator import SimSerial, ReplayCamera, SimBeltCamera
+
+    serial_port = SimSerial(time_scale)
+    link, mirobot, conveyor = connectControllers(serial_port, conveyor_address, time_scale)
+    if belt:
+        camera = SimBeltCamera(serial_port, image_dir, time_scale, shared=shared_frames)
+    else:
+        camera = ReplayCamera(image_dir, shared=shared_frames)
+    return Devices(serial_port, mirobot, conveyor, camera.start(), "sim", time_scale, link)
+
+def openDevices(backend="hardware", **kwargs):
+    """
+    Opens the devices for the given backend ("hardware" or "sim").
+
+    Extra keyword arguments are passed to openHardware() / openSimulator().
+    """
+    if backend == "hardware":
+        return openHardware(**kwargs)
+    if backend == "sim":
+        return openSimulator(**kwargs)
+    raise ValueError(f"Unknown device backend '{backend}'.")
@@ -0,0 +1,198 @@
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.captureImages import CROP_WIDTH, CROP_HEIGHT
+
+FRAME_SHAPE = (480, 640, 3)              # Full camera snapshot (height, width, channels)
+PLANE_SHAPE = (CROP_HEIGHT, CROP_WIDTH)  # Grayscale / binary planes of the inspection window
+RING_SLOTS = 4
+
+class FrameRing:
+    """
+    Fixed ring of preallocated frames shared by capture and analysis.
+
+    Every slot holds a full BGR snapshot plus grayscale and binary planes for
+    the inspection window, all allocated once up front. The camera writes each
+    grab into the next free slot and the checks work on views of it, so no
+    image is allocated or copied per frame.
+
+    A reader keeps the slot it last read: read() pins the returned slot and
+    releases the one it returned before, and the writer skips pinned slots.
+    A consumer can therefore use a frame until it asks for the next one.
+    pin()/unpin() hold a slot longer, e.g. while a worker process reads it.
+
+    With shared=True the buffers live in one multiprocessing.shared_memory
+    block, so worker processes can attach() to the same ring and read slots
+    by index without copying.
+    """
+
+    def __init__(self, slots=RING_SLOTS, shape=FRAME_SHAPE, plane_shape=PLANE_SHAPE, shared=False):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.plane_shape = tuple(plane_shape)
+        self.shared = shared
+        self.shm = None
+        self._owner = True
+
+        image_size = slots * int(np.prod(self.shape))
+        plane_size = slots * int(np.prod(self.plane_shape))
+        if shared:
+            self.shm = shared_memory.SharedMemory(create=True, size=image_size + 2 * plane_size)
+            buffer = self.shm.buf
+        else:
+            buffer = bytearray(image_size + 2 * plane_size)
+        self._map(buffer)
+
+        self._ids = np.zeros(slots, dtype=np.int64)          # 0 = never written
+        self._timestamps = np.zeros(slots, dtype=np.float64)
+        self._pins = np.zeros(slots, dtype=np.int32)
+        self._reader_slot = -1
+        self._last = -1
+        self._next = 0
+        self._frame_id = 0
+        self._cond = threading.Condition()
+
+    def _map(self, buffer):
+        image_size = self.slots * int(np.prod(self.shape))
+        plane_size = self.slots * int(np.prod(self.plane_shape))
+        self.images = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=buffer)
+        self.gray = np.ndarray((self.slots,) + self.plane_shape, dtype=np.uint8, buffer=buffer, offset=image_size)
+        self.binary = np.ndarray((self.slots,) + self.plane_shape, dtype=np.uint8, buffer=buffer,
+                                 offset=image_size + plane_size)
+
+    @classmethod
+    def attach(cls, name, slots, shape=FRAME_SHAPE, plane_shape=PLANE_SHAPE):
+        """Maps an existing shared ring in another process (read side only; the owner unlinks it)."""
+        ring = cls.__new__(cls)
+        ring.slots = slots
+        ring.shape = tuple(shape)
+        ring.plane_shape = tuple(plane_shape)
+        ring.shared = True
+        ring._owner = False
+        ring.shm = shared_memory.SharedMemory(name=name, track=False)
+        ring._map(ring.shm.buf)
+        return ring
+
+    @property
+    def name(self):
+        return self.shm.name if self.shm is not None else None
+
+    # --- Writer side ---
+    def begin_write(self, timeout=0.0):
+        """
+        Returns the index of the slot the next frame should be written into.
+
+        Skips the slot with the newest frame and any slot a reader still holds.
+        When every slot is held, waits up to `timeout` seconds for one to be released.
+
+        Raises:
+            RuntimeError: If no slot became free in time.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                for _ in range(self.slots):
+                    index = self._next
+                    self._next = (self._next + 1) % self.slots
+                    if index != self._last and self._pins[index] == 0:
+                        return index
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise RuntimeError("Every frame ring slot is in use; increase the number of slots.")
+                self._cond.wait(remaining)
+
+    def commit(self, index, timestamp=None):
+        """Publishes a written slot as the newest frame; returns its frame ID."""
+        with self._cond:
+            self._frame_id += 1
+            self._ids[index] = self._frame_id
+            self._timestamps[index] = time.time() if timestamp is None else timestamp
+            self._last = index
+            self._cond.notify_all()
+            return self._frame_id
+
+    def write(self, img, timestamp=None):
+        """Copies an image into the next free slot and publishes it (for sources that cannot write in place)."""
+        index = self.begin_write()
+        np.copyto(self.images[index], img)
+        return self.commit(index, timestamp), index
+
+    # --- Reader side ---
+    def latest(self):
+        """
+        Returns (frame_id, timestamp, slot) of the newest frame without blocking or pinning, or None.
+        """
+        with self._cond:
+            if self._last < 0:
+                return None
+            return int(self._ids[self._last]), float(self._timestamps[self._last]), self._last
+
+    def read(self, newer_than=None, timeout=2.0):
+        """
+        Waits for the newest frame (optionally grabbed after `newer_than`) and pins its slot.
+
+        Returns:
+            tuple or None: (frame_id, timestamp, slot), or None on timeout.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                if self._last >= 0 and (newer_than is None or self._timestamps[self._last] > newer_than):
+                    index = self._last
+                    self._release_reader()
+                    self._pins[index] += 1
+                    self._reader_slot = index
+                    return int(self._ids[index]), float(self._timestamps[index]), index
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def _release_reader(self):
+        if self._reader_slot >= 0:
+            self._pins[self._reader_slot] -= 1
+            self._reader_slot = -1
+            # A writer may be waiting in begin_write() for this slot
+            self._cond.notify_all()
+
+    def release(self):
+        """Unpins the slot held by the reader."""
+        with self._cond:
+            self._release_reader()
+
+    def pin(self, index):
+        """Keeps the writer off a slot until the matching unpin()."""
+        with self._cond:
+            self._pins[index] += 1
+
+    def unpin(self, index):
+        with self._cond:
+            self._pins[index] -= 1
+            self._cond.notify_all()
+
+    def planes(self, index):
+        """Returns the (gray, binary) planes of a slot."""
+        return self.gray[index], self.binary[index]
+
+    def slot_of(self, image):
+        """Returns the slot index an image view belongs to, or None if it is not part of this ring."""
+        offset = image.__array_interface__["data"][0] - self.images.__array_interface__["data"][0]
+        slot_size = int(np.prod(self.shape))
+        if 0 <= offset < self.slots * slot_size:
+            return offset // slot_size
+        return None
+
+    def close(self):
+        if self.shm is not None:
+            self.images = self.gray = self.binary = None
+            try:
+                self.shm.close()
+            except BufferError:
+                # Frames handed out earlier still reference the block; it is unmapped when they go
+                pass
+            if self._owner:
+                self.shm.unlink()
+            self.shm = None
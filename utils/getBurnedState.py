@@ -2,88 +2,224 @@ import cv2
 import numpy as np
 import os
 
-def check_burned_state(image_path="images/pra_cropped.png") -> bool:
+# Which classifier check_burned_state() uses:
+#   "rules" - the hand-tuned rule ladder below
+#   "lut"   - lookup table compiled from rgbMap.json (see utils/colorClassifier.py)
+#   "histogram" - per-pixel burn-level fractions over the biscuit mask only
+CLASSIFIER = "rules"
+
+# Burned states in index order used by classify_mean_colors()
+STATES = ["unBurned", "underBurned", "good", "overBurned"]
+
+# Reference colors from actual analysis (RGB), used when no rule matches
+REFERENCE_COLORS = {
+    "overBurned": [135.0, 112.0, 87.1],
+    "good": [169.8, 128.2, 86.4],
+    "unBurned": [171.5, 173.7, 170.0],
+    "underBurned": [169.7, 165.1, 89.7]
+}
+_REFERENCE_ARRAY = np.array([REFERENCE_COLORS[state] for state in STATES])
+
+CLASSIFICATION_MESSAGES = {
+    "unBurned": "Light grayish colors detected (unBurned)",
+    "underBurned": "Yellow tones detected (underBurned)",
+    "good": "Orange/brown tones detected (good biscuit)",
+    "overBurned": "Dark brown colors detected (overBurned)",
+}
+
+def classify_mean_colors(colors):
+    """
+    Classifies one or more average colors in a single vectorized pass.
+
+    Args:
+        colors (numpy.ndarray): Array of shape (N, 3) with average RGB colors.
+
+    Returns:
+        tuple: (numpy.ndarray) index into STATES for each color,
+               (numpy.ndarray) True where the closest-reference fallback was used,
+               (numpy.ndarray) distance to the closest reference color.
+    """
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    r, g, b = colors[:, 0], colors[:, 1], colors[:, 2]
+
+    # Classification based on actual image analysis data (checked in this order)
+    rules = [
+        # unBurned: High RGB values, very close to each other (grayish)
+        # Expected: ~[172, 174, 170]
+        (r > 165) & (g > 165) & (b > 160) & (np.abs(r - g) < 15) & (np.abs(g - b) < 15),
+        # underBurned: High R and G, much lower B (yellowish)
+        # Expected: ~[170, 165, 90]
+        (r > 160) & (g > 155) & (b < 110) & ((r + g - 2 * b) > 150),
+        # good: Orange/brown tones with R > G > B pattern
+        # Expected: ~[170, 128, 86]
+        (r > 160) & (g > 120) & (g < 140) & (b < 100) & (r > g) & (g > b) & ((r - b) > 70),
+        # overBurned: Lower overall values, more brownish
+        # Expected: ~[135, 112, 87]
+        (r < 150) & (g < 125) & (b < 100) & (r > g) & (g > b),
+    ]
+    state_index = np.select(rules, range(len(STATES)), default=-1)
+
+    # Fallback: closest color matching using actual reference values
+    distances = np.linalg.norm(colors[:, None, :] - _REFERENCE_ARRAY[None, :, :], axis=2)
+    nearest = distances.argmin(axis=1)
+    fallback = state_index == -1
+    state_index = np.where(fallback, nearest, state_index)
+    return state_index, fallback, distances[np.arange(len(colors)), nearest]
+
+def check_burned_state_lut(image):
+    """
+    Classifies the mean color of a BGR crop with the rgbMap.json lookup table.
+
+    Returns:
+        bool: True if the class's quality_status is "acceptable".
+    """
+    from utils.colorClassifier import get_classifier
+
+    predicted_state, good = get_classifier().classify_crop(image)
+    print(f"Lookup-table class: {predicted_state}")
+    if good:
+        print("✓ Result: GOOD")
+    else:
+        print(f"✗ State: {predicted_state}")
+    return good
+
+def biscuit_mask(binary_image):
+    """
+    Fills the convex hull of the largest blob in the Otsu binary mask.
+
+    Dark (charred) areas fall below the Otsu threshold, so the raw mask would
+    leave them out; the filled hull keeps every pixel inside the biscuit outline
+    while still excluding the belt around it.
+    """
+    contours, _ = cv2.findContours(binary_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    mask = np.zeros_like(binary_image)
+    if contours:
+        hull = cv2.convexHull(max(contours, key=cv2.contourArea))
+        cv2.fillConvexPoly(mask, hull, 255)
+    return mask
+
+def grade_burn_histogram(image, binary_image):
+    """
+    Grades a biscuit by the fraction of its pixels in each burn class.
+
+    Only pixels inside the biscuit mask are counted. Pixel classes come from the
+    pixel_reference_rgb entries of rgbMap.json (compiled into a lookup table);
+    a biscuit passes when the acceptable classes reach their min_pixel_fraction
+    and no other class exceeds its max_pixel_fraction.
+
+    Returns:
+        tuple: (bool) True if the biscuit is good,
+               (dict) fraction of biscuit pixels per class.
+    """
+    from utils.colorClassifier import get_classifier
+
+    classifier = get_classifier(reference_key="pixel_reference_rgb")
+    fractions = classifier.histogram(image, biscuit_mask(binary_image))
+    result = dict(zip(classifier.names + ["unknown"], fractions.tolist()))
+
+    good = True
+    for name in classifier.names:
+        definition = classifier.classifications[name]
+        if result[name] < definition.get("min_pixel_fraction", 0.0):
+            good = False
+        if result[name] > definition.get("max_pixel_fraction", 1.0):
+            good = False
+    return good, result
+
+def check_burned_state_histogram(image, binary_image):
+    good, fractions = grade_burn_histogram(image, binary_image)
+    print("Burn-level fractions: " + ", ".join(f"{name} {100.0 * f:.1f}%" for name, f in fractions.items() if f > 0))
+    if good:
+        print("✓ Result: GOOD")
+    else:
+        print(f"✗ State: {max(fractions, key=fractions.get)}")
+    return good
+
+def state_of_class(name):
+    """Maps an rgbMap.json class name ("underburned_biscuit") to its STATES entry ("underBurned")."""
+    stem = name.lower().removesuffix("_biscuit")
+    # Classes without a burned state (e.g. "unknown") keep their own name
+    return next((state for state in STATES if state.lower() == stem), name)
+
+def predict_state(image, binary_image, method=None, rgb=None):
+    """
+    Burned state of a BGR crop with the given classifier, without printing.
+
+    Args:
+        image (numpy.ndarray): BGR crop.
+        binary_image (numpy.ndarray): Its Otsu mask (used by "histogram").
+        method (str, optional): "rules", "lut" or "histogram"; defaults to CLASSIFIER.
+        rgb (numpy.ndarray, optional): Mean RGB of the crop, if already measured.
+
+    Returns:
+        tuple: (str) STATES name (or the class name if it has none),
+               (bool) True if the burned state is acceptable.
+    """
+    method = method or CLASSIFIER
+    if method == "lut":
+        from utils.colorClassifier import get_classifier
+        name, good = get_classifier().classify_crop(image)
+        return state_of_class(name), good
+    if method == "histogram":
+        good, fractions = grade_burn_histogram(image, binary_image)
+        return state_of_class(max(fractions, key=fractions.get)), good
+    if rgb is None:
+        rgb = np.array(cv2.mean(image)[2::-1])
+    state = STATES[classify_mean_colors(rgb)[0][0]]
+    return state, state == "good"
+
+def check_burned_state(image_path="images/pra_cropped.png", frame=None, method=None, rgb=None) -> bool:
     """
     Check if the burned state is good
-    
+
     Args:
         image_path: Path to the image file
-    
+        frame: Optional in-memory Frame from processImages(); its BGR crop is used
+               instead of loading image_path
+        method: "rules", "lut" or "histogram"; defaults to CLASSIFIER
+        rgb: Optional mean RGB of the crop, if it was already measured
+
     Returns:
         bool: True if state is 'good', False otherwise (also prints the state)
     """
     # Load image
     try:
-        image = cv2.imread(image_path)
+        image = frame.cropped if frame is not None else cv2.imread(image_path)
         if image is None:
             print(f"Error: Could not load image '{image_path}'")
             return False
-        
-        # Convert BGR to RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        
-        # Calculate average color
-        avg_color = np.mean(image_rgb, axis=(0, 1))
+
+        # Calculate average color (BGR order from OpenCV, reversed to RGB); cv2.mean
+        # works on the crop view in place, without a float copy of the image
+        avg_color = np.array(cv2.mean(image)[2::-1]) if rgb is None else np.asarray(rgb)
         r, g, b = avg_color
-        
+
         print(f"Average image color (RGB): [{r:.1f}, {g:.1f}, {b:.1f}]")
-        
+
     except Exception as e:
         print(f"Error loading image: {e}")
         return False
-    
-    # Classification based on actual image analysis data
-    predicted_state = None
-    
-    # unBurned: High RGB values, very close to each other (grayish)
-    # Expected: ~[172, 174, 170]
-    if r > 165 and g > 165 and b > 160 and abs(r - g) < 15 and abs(g - b) < 15:
-        predicted_state = "unBurned"
-        print("Classification: Light grayish colors detected (unBurned)")
-    
-    # underBurned: High R and G, much lower B (yellowish)
-    # Expected: ~[170, 165, 90]
-    elif r > 160 and g > 155 and b < 110 and (r + g - 2*b) > 150:
-        predicted_state = "underBurned"
-        print("Classification: Yellow tones detected (underBurned)")
-    
-    # good: Orange/brown tones with R > G > B pattern
-    # Expected: ~[170, 128, 86]
-    elif r > 160 and g > 120 and g < 140 and b < 100 and r > g > b and (r - b) > 70:
-        predicted_state = "good"
-        print("Classification: Orange/brown tones detected (good biscuit)")
-    
-    # overBurned: Lower overall values, more brownish
-    # Expected: ~[135, 112, 87]
-    elif r < 150 and g < 125 and b < 100 and r > g > b:
-        predicted_state = "overBurned"
-        print("Classification: Dark brown colors detected (overBurned)")
-    
-    # Fallback: closest color matching using actual reference values
-    if predicted_state is None:
+
+    method = method or CLASSIFIER
+    if method == "lut":
+        return check_burned_state_lut(image)
+    if method == "histogram":
+        if frame is not None:
+            binary_image = frame.binary
+        else:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            _, binary_image = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return check_burned_state_histogram(image, binary_image)
+
+    state_index, fallback, distance = classify_mean_colors(avg_color)
+    predicted_state = STATES[state_index[0]]
+
+    if fallback[0]:
         print("Using fallback: closest color matching")
-        
-        # Reference colors from actual analysis
-        reference_colors = {
-            "overBurned": [135.0, 112.0, 87.1],
-            "good": [169.8, 128.2, 86.4],
-            "unBurned": [171.5, 173.7, 170.0],
-            "underBurned": [169.7, 165.1, 89.7]
-        }
-        
-        min_distance = float('inf')
-        closest_state = None
-        
-        for state, ref_color in reference_colors.items():
-            # Calculate Euclidean distance
-            distance = np.sqrt(sum((avg_color[i] - ref_color[i])**2 for i in range(3)))
-            if distance < min_distance:
-                min_distance = distance
-                closest_state = state
-        
-        predicted_state = closest_state
-        print(f"Closest match: {predicted_state} (distance: {min_distance:.2f})")
-    
+        print(f"Closest match: {predicted_state} (distance: {distance[0]:.2f})")
+    else:
+        print(f"Classification: {CLASSIFICATION_MESSAGES[predicted_state]}")
+
     # Return result
     if predicted_state == 'good':
         print("✓ Result: GOOD")
@@ -94,7 +230,7 @@ def check_burned_state(image_path="images/pra_cropped.png") -> bool:
 
 if __name__ == "__main__":
     print("=== Burned State Detection ===\n")
-    
+
     # Test with your specific image
     target_image = "images/pra_cropped.png"
     print(f"Testing target image: {target_image}")
@@ -0,0 +1,332 @@
+"""
+Hot-reloadable inspection configuration, kept in the "inspection" section of rgbMap.json.
+
+The file is validated and compiled once per change (colour lookup tables,
+reference arrays) on a watcher thread. The line swaps the compiled result in
+between iterations, so the checks keep reading plain module constants and
+nothing is parsed per frame.
+
+    "inspection": {
+      "detection": {"change_threshold": 30, "min_object_area": 500},
+      "geometry": {"min_area": 10200, "max_area": 12000, "min_angle": 86.0, "max_angle": 94.0},
+      "defects": {"min_hole_area": 20, "max_defect_depth": 6.0, "max_crack_score": 0.005},
+      "crop": {"x": 215, "y": 80, "width": 120, "height": 180},
+      "color": {"classifier": "rules", "reference_rgb": {"good": [169.8, 128.2, 86.4], ...}}
+    }
+
+Missing keys keep the values in the code. The crop box has to fit the camera
+frame (cameraService.FRAME_WIDTH x FRAME_HEIGHT unless the caller passes the
+actual size) and is fixed while running: its size by the frame buffers, and its
+position by the background image, which is a picture of that window of the
+empty belt.
+
+Usage:
+    python -m utils.inspectionConfig            # validate rgbMap.json and print the compiled values
+    python -m utils.inspectionConfig my.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from utils import captureImages, checkAreaAndAngle, checkDefects, checkObject, colorClassifier, getBurnedState
+from utils.cameraService import FRAME_HEIGHT, FRAME_WIDTH
+from utils.colorClassifier import RGB_MAP_PATH, ColorClassifier, load_classifications
+
+WATCH_INTERVAL = 1.0      # Seconds between checks of the file's modification time
+CLASSIFIERS = ("rules", "lut", "histogram")
+
+@dataclass(frozen=True)
+class InspectionConfig:
+    """Validated inspection settings plus the structures compiled from them."""
+    change_threshold: int
+    min_object_area: float
+    min_area: int
+    max_area: int
+    min_angle: float
+    max_angle: float
+    min_hole_area: float
+    max_defect_depth: float
+    max_crack_score: float
+    crop: tuple                        # (x, y, width, height)
+    classifier: str
+    reference_rgb: dict                # {state: [r, g, b]}
+    reference_array: np.ndarray = field(repr=False, compare=False)
+    classifiers: dict = field(repr=False, compare=False)   # get_classifier() cache entries
+    path: str = RGB_MAP_PATH
+
+def _defaults():
+    """The values in the code, used for anything the file leaves out."""
+    return {
+        "detection": {"change_threshold": checkObject.CHANGE_THRESHOLD,
+                      "min_object_area": checkObject.MIN_OBJECT_AREA},
+        "geometry": {"min_area": checkAreaAndAngle.MIN_AREA, "max_area": checkAreaAndAngle.MAX_AREA,
+                     "min_angle": checkAreaAndAngle.MIN_ANGLE, "max_angle": checkAreaAndAngle.MAX_ANGLE},
+        "defects": {"min_hole_area": checkDefects.MIN_HOLE_AREA, "max_defect_depth": checkDefects.MAX_DEFECT_DEPTH,
+                    "max_crack_score": checkDefects.MAX_CRACK_SCORE},
+        "crop": {"x": captureImages.CROP_X, "y": captureImages.CROP_Y,
+                 "width": captureImages.CROP_WIDTH, "height": captureImages.CROP_HEIGHT},
+        "color": {"classifier": getBurnedState.CLASSIFIER,
+                  "reference_rgb": {k: list(v) for k, v in getBurnedState.REFERENCE_COLORS.items()}},
+    }
+
+# Snapshot before anything is applied, so a key removed from the file falls back to the code value
+DEFAULTS = _defaults()
+
+def _number(section, key, problems, integer=False, low=None, high=None):
+    value = section[key]
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or (integer and not float(value).is_integer()):
+        problems.append(f"{key} must be {'an integer' if integer else 'a number'}, got {value!r}")
+        return value
+    if (low is not None and value < low) or (high is not None and value > high):
+        problems.append(f"{key}={value} is outside {low}..{high}")
+    return int(value) if integer else float(value)
+
+def load_config(path=RGB_MAP_PATH, frame_size=None):
+    """
+    Reads, validates and compiles the inspection configuration.
+
+    Args:
+        path (str): Config file (rgbMap.json).
+        frame_size (tuple, optional): (width, height) of the camera frames the crop
+            must fit; defaults to the camera config (cameraService.FRAME_WIDTH/HEIGHT).
+
+    Raises:
+        ValueError: With every problem found, if the file is not a valid configuration.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    inspection = data["biscuit_quality_control_system"].get("inspection", {})
+    malformed = [name for name in DEFAULTS if not isinstance(inspection.get(name, {}), dict)]
+    if not isinstance(inspection, dict) or malformed:
+        raise ValueError(f"Invalid inspection config in {path}: sections {malformed or ['inspection']} must be objects")
+    sections = {name: {**defaults, **inspection.get(name, {})} for name, defaults in DEFAULTS.items()}
+    detection, geometry, defects, crop, color = (sections[n] for n in ("detection", "geometry", "defects",
+                                                                       "crop", "color"))
+
+    problems = []
+    change_threshold = _number(detection, "change_threshold", problems, integer=True, low=0, high=255)
+    min_object_area = _number(detection, "min_object_area", problems, low=0)
+    min_area = _number(geometry, "min_area", problems, integer=True, low=0)
+    max_area = _number(geometry, "max_area", problems, integer=True, low=0)
+    min_angle = _number(geometry, "min_angle", problems, low=0, high=180)
+    max_angle = _number(geometry, "max_angle", problems, low=0, high=180)
+    if not problems and min_area > max_area:
+        problems.append(f"min_area {min_area} is larger than max_area {max_area}")
+    if not problems and min_angle > max_angle:
+        problems.append(f"min_angle {min_angle} is larger than max_angle {max_angle}")
+    min_hole_area = _number(defects, "min_hole_area", problems, low=0)
+    max_defect_depth = _number(defects, "max_defect_depth", problems, low=0)
+    max_crack_score = _number(defects, "max_crack_score", problems, low=0, high=1)
+
+    width, height = frame_size or (FRAME_WIDTH, FRAME_HEIGHT)
+    box = tuple(_number(crop, key, problems, integer=True, low=0) for key in ("x", "y", "width", "height"))
+    if not problems and (box[2] == 0 or box[3] == 0 or box[0] + box[2] > width or box[1] + box[3] > height):
+        problems.append(f"crop {box} does not fit a {width}x{height} frame")
+
+    if color["classifier"] not in CLASSIFIERS:
+        problems.append(f"classifier must be one of {CLASSIFIERS}, got {color['classifier']!r}")
+    references = color["reference_rgb"]
+    if not isinstance(references, dict) or set(references) != set(getBurnedState.STATES):
+        problems.append(f"reference_rgb needs exactly the states {getBurnedState.STATES}")
+    else:
+        for state, rgb in references.items():
+            # Types first, so a malformed entry is reported instead of raising TypeError
+            if (not isinstance(rgb, (list, tuple)) or len(rgb) != 3
+                    or not all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in rgb)):
+                problems.append(f"reference_rgb {state} must be three numbers, got {rgb!r}")
+            elif not all(0 <= c <= 255 for c in rgb):
+                problems.append(f"reference_rgb {state} values must be in 0..255, got {rgb!r}")
+
+    try:
+        classifications = load_classifications(path)
+    except (KeyError, ValueError) as e:
+        problems.append(str(e))
+    if problems:
+        raise ValueError(f"Invalid inspection config in {path}: " + "; ".join(problems))
+
+    # Compile the lookup tables the active classifier uses now, on the caller's thread,
+    # instead of on the first frame. Keyed like get_classifier() looks them up.
+    reference_key = {"lut": "reference_rgb", "histogram": "pixel_reference_rgb"}.get(color["classifier"])
+    classifiers = {}
+    if reference_key is not None:
+        classifiers[(path, reference_key)] = ColorClassifier(classifications, reference_key=reference_key)
+    return InspectionConfig(
+        change_threshold, min_object_area, min_area, max_area, min_angle, max_angle,
+        min_hole_area, max_defect_depth, max_crack_score, box,
+        color["classifier"], {k: list(v) for k, v in references.items()},
+        np.array([references[state] for state in getBurnedState.STATES], dtype=np.float64),
+        classifiers, path,
+    )
+
+def apply(config):
+    """
+    Installs a compiled configuration into the inspection modules.
+
+    Call it between iterations, on the thread that captures and inspects, so no
+    frame sees a mix of old and new values.
+    """
+    checkObject.CHANGE_THRESHOLD = config.change_threshold
+    checkObject.MIN_OBJECT_AREA = config.min_object_area
+    for detector in list(checkObject._detectors.values()):
+        detector.change_threshold = config.change_threshold
+        detector.min_object_area = config.min_object_area
+
+    checkAreaAndAngle.MIN_AREA = config.min_area
+    checkAreaAndAngle.MAX_AREA = config.max_area
+    checkAreaAndAngle.MIN_ANGLE = config.min_angle
+    checkAreaAndAngle.MAX_ANGLE = config.max_angle
+
+    checkDefects.MIN_HOLE_AREA = config.min_hole_area
+    checkDefects.MAX_DEFECT_DEPTH = config.max_defect_depth
+    checkDefects.MAX_CRACK_SCORE = config.max_crack_score
+
+    old_box = (captureImages.CROP_X, captureImages.CROP_Y, captureImages.CROP_WIDTH, captureImages.CROP_HEIGHT)
+    captureImages.CROP_X, captureImages.CROP_Y, captureImages.CROP_WIDTH, captureImages.CROP_HEIGHT = config.crop
+    if captureImages.CROP_BOXES == [old_box]:
+        # The default single window follows the crop; custom multi-lane boxes stay as they are
+        captureImages.CROP_BOXES = [config.crop]
+
+    getBurnedState.CLASSIFIER = config.classifier
+    getBurnedState.REFERENCE_COLORS = config.reference_rgb
+    getBurnedState._REFERENCE_ARRAY = config.reference_array
+    # Replaced, not merged: tables compiled from an older file must not survive the swap
+    colorClassifier.CONFIG_PATH = config.path
+    colorClassifier._classifiers = dict(config.classifiers)
+
+class ConfigWatcher:
+    """
+    Watches the config file and hands over a freshly compiled configuration.
+
+    check() reloads the file when its modification time changes (at most once
+    per `interval`); start() runs it on a background thread. apply() swaps a
+    pending configuration in and is cheap enough to call before every frame.
+    A file that fails validation is reported and ignored; the line keeps the
+    last good configuration.
+    """
+
+    def __init__(self, path=RGB_MAP_PATH, interval=WATCH_INTERVAL, frame_size=None):
+        self.path = path
+        self.interval = interval
+        self.frame_size = frame_size
+        self.current = load_config(path, frame_size)
+        self._stamp = self._file_stamp()
+        self._pending = None
+        self._checked_at = time.time()
+        self._thread = None
+        self._stop = threading.Event()
+        apply(self.current)
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Reloads the file if it changed; returns True if a new configuration is waiting."""
+        now = time.time()
+        if now - self._checked_at < self.interval:
+            return self._pending is not None
+        self._checked_at = now
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return self._pending is not None
+        self._stamp = stamp
+        try:
+            config = load_config(self.path, self.frame_size)
+        except Exception as e:
+            # Whatever is wrong with the file, the watcher keeps running on the last good settings
+            print(f"Config: keeping the current settings, {self.path} was rejected: {e}")
+            return self._pending is not None
+        if config.crop != self.current.crop:
+            # The frame buffers are sized for the crop and the background shows that window of the belt
+            print(f"Config: ignoring {self.path}; moving or resizing the crop {self.current.crop} "
+                  f"-> {config.crop} needs a restart (and a background image of the new window).")
+            return self._pending is not None
+        self._pending = config
+        return True
+
+    def apply(self):
+        """
+        Swaps in the configuration compiled by check(), if any.
+
+        Returns:
+            InspectionConfig or None: The newly applied configuration.
+        """
+        config, self._pending = self._pending, None
+        if config is None:
+            return None
+        apply(config)
+        self.current = config
+        print(f"Config: reloaded {self.path}")
+        return config
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ConfigWatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+_watcher = None
+
+def watch(path=RGB_MAP_PATH, interval=WATCH_INTERVAL, background=True, frame_size=None):
+    """
+    Loads and applies the configuration, then keeps watching it.
+
+    Args:
+        path (str): Config file (rgbMap.json).
+        interval (float): Seconds between file checks.
+        background (bool): Check on a watcher thread. Without it, refresh() checks
+            (rate-limited) on the caller's thread, e.g. in worker processes.
+        frame_size (tuple, optional): (width, height) of the camera frames; see load_config().
+
+    Returns:
+        ConfigWatcher: Call its apply() between iterations.
+    """
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+    _watcher = ConfigWatcher(path, interval, frame_size)
+    if background:
+        _watcher.start()
+    return _watcher
+
+def refresh():
+    """Checks for and applies a changed configuration (for processes without a watcher thread)."""
+    if _watcher is not None:
+        _watcher.check()
+        _watcher.apply()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate an inspection config and show the compiled values.")
+    parser.add_argument("path", nargs="?", default=RGB_MAP_PATH, help="Config file (default rgbMap.json).")
+    parser.add_argument("--frame-size", nargs=2, type=int, metavar=("WIDTH", "HEIGHT"),
+                        help="Camera resolution the crop must fit (default cameraService.FRAME_WIDTH/HEIGHT).")
+    args = parser.parse_args()
+
+    config = load_config(args.path, args.frame_size)
+    print(f"{args.path} is valid:")
+    print(f"  detection: change_threshold={config.change_threshold}, min_object_area={config.min_object_area}")
+    print(f"  geometry:  area {config.min_area}-{config.max_area}, angles {config.min_angle}-{config.max_angle}")
+    print(f"  defects:   holes >= {config.min_hole_area} px, edge depth <= {config.max_defect_depth}, "
+          f"crack score <= {config.max_crack_score}")
+    print(f"  crop:      {config.crop}")
+    print(f"  color:     {config.classifier}, "
+          f"{len(config.classifiers)} lookup tables compiled")
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+# Instrumentation is off until enable() is called; timers are then no-ops
+ENABLED = False
+WINDOW = 200                 # Samples per stage kept for the rolling summary
+TEXTFILE_INTERVAL = 1.0      # Minimum seconds between metrics file rewrites
+METRIC_PREFIX = "biscuit"
+
+_lock = threading.Lock()
+_durations = {}      # stage -> deque of recent durations (seconds)
+_totals = {}         # stage -> [count, total seconds]
+_counters = {}       # (name, label) -> count
+_textfile_path = None
+_last_textfile_write = 0.0
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _NoopTimer()
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+def enable(textfile=None, port=None):
+    """
+    Turns instrumentation on.
+
+    Args:
+        textfile (str, optional): Prometheus text file to keep up to date
+            (e.g. for the node_exporter textfile collector).
+        port (int, optional): Serve the metrics at http://localhost:<port>/metrics.
+    """
+    global ENABLED, _textfile_path
+    ENABLED = True
+    _textfile_path = textfile
+    if port is not None:
+        start_http_server(port)
+
+def timer(name):
+    """
+    Context manager that records how long the block took under `name`.
+
+    Example:
+        with metrics.timer("detection"):
+            idObjectPresent(frame)
+    """
+    if not ENABLED:
+        return _NOOP
+    return _Timer(name)
+
+def timed(name):
+    """Decorator version of timer()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def observe(name, seconds):
+    """Records one duration sample for a stage."""
+    if not ENABLED:
+        return
+    with _lock:
+        samples = _durations.get(name)
+        if samples is None:
+            samples = _durations[name] = deque(maxlen=WINDOW)
+            _totals[name] = [0, 0.0]
+        samples.append(seconds)
+        totals = _totals[name]
+        totals[0] += 1
+        totals[1] += seconds
+
+def increment(name, label=None, amount=1):
+    """Increments a counter, e.g. increment("items", "bad") or increment("reject_reason", "area")."""
+    if not ENABLED:
+        return
+    with _lock:
+        key = (name, label)
+        _counters[key] = _counters.get(key, 0) + amount
+
+def reset():
+    with _lock:
+        _durations.clear()
+        _totals.clear()
+        _counters.clear()
+
+def summary():
+    """Returns a human-readable rolling summary of stage timings and counters."""
+    with _lock:
+        lines = [f"{'stage':<14}{'n':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"]
+        for name, samples in _durations.items():
+            ms = np.asarray(samples) * 1000.0
+            lines.append(f"{name:<14}{_totals[name][0]:>8}{ms.mean():>10.2f}"
+                         f"{np.percentile(ms, 50):>10.2f}{np.percentile(ms, 95):>10.2f}")
+        for (name, label), count in sorted(_counters.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+            lines.append(f"{name}{'[' + label + ']' if label else ''}: {count}")
+    return "\n".join(lines)
+
+def render_prometheus():
+    """Returns all metrics in the Prometheus text exposition format."""
+    out = []
+    with _lock:
+        if _totals:
+            out.append(f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per pipeline stage.")
+            out.append(f"# TYPE {METRIC_PREFIX}_stage_seconds summary")
+            for name, samples in _durations.items():
+                arr = np.asarray(samples)
+                for q in (0.5, 0.95, 0.99):
+                    out.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{name}",quantile="{q}"}} '
+                               f'{np.quantile(arr, q):.6f}')
+                count, total = _totals[name]
+                out.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+                out.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {count}')
+
+        names = sorted({name for name, _ in _counters})
+        for name in names:
+            out.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            for (n, label), count in _counters.items():
+                if n != name:
+                    continue
+                labels = f'{{label="{label}"}}' if label is not None else ""
+                out.append(f"{METRIC_PREFIX}_{name}_total{labels} {count}")
+    return "\n".join(out) + "\n"
+
+def write_textfile(path=None, force=False):
+    """
+    Atomically rewrites the Prometheus text file (at most every TEXTFILE_INTERVAL seconds).
+    """
+    global _last_textfile_write
+    path = path or _textfile_path
+    if not ENABLED or path is None:
+        return
+    now = time.time()
+    if not force and now - _last_textfile_write < TEXTFILE_INTERVAL:
+        return
+    _last_textfile_write = now
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serves the metrics on a local HTTP endpoint from a daemon thread."""
+    server = HTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True)
+    thread.start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return server
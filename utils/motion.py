@@ -0,0 +1,100 @@
+import re
+import time
+
+# Polling parameters (adjust as needed)
+POLL_INTERVAL = 0.05     # Seconds between status queries
+START_GRACE = 0.2        # Seconds a move may take to leave Idle after the command is sent
+IDLE_CONFIRMATIONS = 2   # Consecutive Idle replies required before a move counts as done
+STATUS_TIMEOUT = 0.3     # Seconds to wait for a single status reply
+DEFAULT_TIMEOUT = 10.0   # Per-move timeout when none is given
+
+# Status replies look like "<Idle,Angle(ABCDXYZ):...>" or "<Run,...>"
+STATUS_PATTERN = re.compile(r"<(\w+),")
+
+# Measured durations per move name, e.g. {"conveyor": [1.21, 1.19, ...]}
+move_durations = {}
+
+def queryState(robot):
+    """
+    Asks the controller for its status and returns the state word ("Idle", "Run", ...).
+
+    Uses the robot's existing serial link directly instead of getStatus(), which
+    sleeps 0.5 s per call.
+
+    Args:
+        robot: An initialised wlkatapython.Mirobot_UART (or compatible) object.
+
+    Returns:
+        str or None: The controller state, or None if no valid reply arrived.
+    """
+    port = robot.pSerial
+    port.reset_input_buffer()
+    prefix = "" if robot.address == -1 else f"@{robot.address}"
+    port.write(f"{prefix}?\r\n".encode("utf-8"))
+
+    deadline = time.time() + STATUS_TIMEOUT
+    while time.time() < deadline:
+        line = port.readline().decode("utf-8", errors="ignore").strip()
+        match = STATUS_PATTERN.match(line)
+        if match:
+            return match.group(1)
+    return None
+
+def waitForIdle(robot, name="move", timeout=DEFAULT_TIMEOUT, started=None):
+    """
+    Polls the controller until the current move has finished.
+
+    Args:
+        robot: The Mirobot_UART object the move was sent through. A `poll_interval`
+            attribute (QueuedMirobot) overrides POLL_INTERVAL.
+        name (str): Label used in the log and in move_durations.
+        timeout (float): Maximum seconds to wait before raising TimeoutError.
+        started (float, optional): time.time() when the command was sent.
+
+    Returns:
+        float: Measured move duration in seconds.
+    """
+    if started is None:
+        started = time.time()
+    deadline = started + timeout
+    seen_motion = False
+    idle_count = 0
+    interval = getattr(robot, "poll_interval", POLL_INTERVAL)
+
+    while True:
+        state = queryState(robot)
+        now = time.time()
+        if state is not None and state != "Idle":
+            seen_motion = True
+            idle_count = 0
+        elif state == "Idle" and (seen_motion or now - started >= START_GRACE):
+            idle_count += 1
+            if idle_count >= IDLE_CONFIRMATIONS:
+                break
+
+        if now > deadline:
+            raise TimeoutError(f"Move '{name}' did not finish within {timeout:.1f} seconds (last state: {state}).")
+        time.sleep(interval)
+
+    elapsed = time.time() - started
+    move_durations.setdefault(name, []).append(elapsed)
+    print(f"Move '{name}' completed in {elapsed:.2f} seconds.")
+    return elapsed
+
+def moveAndWait(robot, name, command, *args, timeout=DEFAULT_TIMEOUT):
+    """
+    Sends a motion command and returns as soon as the controller reports Idle.
+
+    Example:
+        moveAndWait(mirobot, "approach", mirobot.writeangle, 0, 23.4, 49.2, -24.1, 0, -26.8, -18.5)
+
+    Returns:
+        float: Measured move duration in seconds.
+    """
+    started = time.time()
+    command(*args)
+    return waitForIdle(robot, name, timeout, started)
+
+def summary():
+    """Returns {move name: (count, mean seconds, max seconds)} for all measured moves."""
+    return {name: (len(d), sum(d) / len(d), max(d)) for name, d in move_durations.items() if d}
@@ -23,15 +23,16 @@ def analyze_image_colors(image_path):
     print(f"  Gray Range: {min_gray:.1f} - {max_gray:.1f}")
     print(f"  Gray Std: {std_gray:.1f}")
 
-# Analyze key images
-images_to_check = [
-    # "images/no_object.png",
-    "images/burnedStates/overBurned.png",
-    "images/burnedStates/good.png",
-    "images/burnedStates/unBurned.png",
-    "images/burnedStates/underBurned.png"
-]
+if __name__ == "__main__":
+    # Analyze key images
+    images_to_check = [
+        # "images/no_object.png",
+        "images/burnedStates/overBurned.png",
+        "images/burnedStates/good.png",
+        "images/burnedStates/unBurned.png",
+        "images/burnedStates/underBurned.png"
+    ]
 
-print("=== Image Analysis for Object Detection ===")
-for img_path in images_to_check:
-    analyze_image_colors(img_path)
+    print("=== Image Analysis for Object Detection ===")
+    for img_path in images_to_check:
+        analyze_image_colors(img_path)
@@ -1,30 +1,78 @@
-import wlkatapython
-import serial
-import time
+from utils import trajectory
+
+# Per-move timeouts in seconds; moves finish as soon as the controller reports Idle
+CONVEYOR_TIMEOUT = 6.0
+ARM_MOVE_TIMEOUT = 8.0
+ZERO_TIMEOUT = 10.0
+# Reject cycle from utils.trajectory: "planned" (hover above the belt, no returns to
+# zero) or "baseline" (the original six poses with zero between pick and place).
+# Suction cup dwells are trajectory.PUMP_ON_DWELL / PUMP_OFF_DWELL.
+REJECT_CYCLE = "planned"
 
 # from part_1_integration import savepath_GetArea
 
-# Configure the serial connection
-# Replace "COM4" with your port (e.g., "/dev/ttyUSB0" on Linux)
-# serial_port = serial.Serial("COM4", 115200, timeout=1)
-serial_port = serial.Serial("/dev/ttyUSB0", 115200, timeout=1)
-# Create a Mirobot object
-mirobot = wlkatapython.Mirobot_UART()
-# Create a conveyor control object (assuming a similar structure to Mirobot)
-conveyor = wlkatapython.Mirobot_UART()  # May need adjustment based on exact class
-# Initialize the Mirobot with the serial connection
-# Address -1 is used for direct connection; adjust if using a multi-function controller
-mirobot.init(serial_port, -1)
-conveyor.init(serial_port, -1)  # Address 1; adjust if needed
-# Home the robotic arm (move to initial zero position)
-print("Homing the robotic arm...")
-#mirobot.homing() # Robotic arm homing
+# Arm and conveyor command builders, set by connectDevices() from utils.devices.
+# Both queue onto the station's SerialLink, the only writer on the shared UART.
+mirobot = None
+conveyor = None
+time_scale = 1.0
+
+# Pose each arm's last queued cycle ends at; an arm missing here is in an unknown
+# pose (e.g. zero after connecting), not hovering where the planned cycle starts
+_arm_poses = {}
+
+def connectDevices(devices):
+    """
+    Uses the arm and conveyor from a utils.devices.Devices bundle.
+    Args:
+        devices (Devices): Result of openDevices("hardware") or openDevices("sim").
+    """
+    global mirobot, conveyor, time_scale
+    mirobot = devices.mirobot
+    conveyor = devices.conveyor
+    time_scale = devices.time_scale
+    # Home the robotic arm (move to initial zero position)
+    print("Homing the robotic arm...")
+    #mirobot.homing() # Robotic arm homing
 
 # i = 0
 
 # bad_found = False
 # tryNO=10
 # while i<tryNO:
+def moveConveyor(wait=True, devices=None):
+    """
+    Advances the conveyor by one pitch (15 mm) and waits for it to stop.
+    Args:
+        wait (bool): If False, only queue the move and return its Future.
+        devices (Devices, optional): Station to drive; defaults to the one given to connectDevices().
+    """
+    belt = devices.conveyor if devices is not None else conveyor
+    future = belt.link.submit("conveyor", [belt.conveyor(15, 500, timeout=CONVEYOR_TIMEOUT)])
+    return future.result() if wait else future
+
+def pickAndPlace(wait=True, devices=None):
+    """
+    Picks the item at the pick position and drops it in the reject area.
+    Args:
+        wait (bool): If False, only queue the cycle on the serial link and return its
+            Future; a later conveyor move is queued behind it and cannot overtake it.
+        devices (Devices, optional): Station to drive; defaults to the one given to connectDevices().
+    """
+    arm = devices.mirobot if devices is not None else mirobot
+    scale = devices.time_scale if devices is not None else time_scale
+    cycle = trajectory.get_cycle(REJECT_CYCLE)
+    commands = trajectory.to_commands(cycle, arm, scale, ARM_MOVE_TIMEOUT, {"zero": ZERO_TIMEOUT})
+    if _arm_poses.get(arm) != cycle.start:
+        # First reject: rapid move to the cycle's start pose before its descent onto the biscuit
+        commands.insert(0, arm.writeangle(0, *cycle.start, name="setup", timeout=ARM_MOVE_TIMEOUT))
+    _arm_poses[arm] = cycle.end
+    future = arm.link.submit("arm_cycle", commands)
+    return future.result() if wait else future
+    # time.sleep(2)
+    # conveyor.sendMsg("G90 G01 D0 F500")
+    # time.sleep(3)
+
 def pickBadAndPlace(bad_found: bool) -> bool:
     """
     Picks up a bad item and places it in the designated area.
@@ -34,36 +82,9 @@ def pickBadAndPlace(bad_found: bool) -> bool:
         bool: True if a bad item was found and processed, False otherwise.
     """
     
-    if not bad_found:
-        conveyor.sendMsg("G91 G01 D15 F500")
-        time.sleep(2)  # Wait for homing to complete
-
-    else:
-        conveyor.sendMsg("G91 G01 D15 F500")
-        time.sleep(2)
-        # Define joint angles (in degrees) for each axis (J1 to J6)
-        #joint_angles = [0, 20, -15, 0, 10, 0]  # Example: J1=0°, J2=30°, J3=-15°, J4=0°, J5=45°, J6=0°
-        # Set joint angles
-        #print(f"Moving to joint angles: {joint_angles}")
-        mirobot.speed(1)
-        mirobot.writeangle(0,23.4,49.2,-24.1,-0.0,-26.8,-18.5)
-        time.sleep(2)
-        mirobot.writeangle(0,23.7,52.6,-24.2,-0.0,-30,-19)
-        time.sleep(2)
-        mirobot.pump(1)
-        time.sleep(3)
-        mirobot.zero()
-        time.sleep(3)
-        mirobot.writeangle(0,-56.1,16.1,15.4,0,-31.6,56.1)
-        time.sleep(2)
-        mirobot.writeangle(0,-56.1,18.5,16.3,0,-34.9,56.1)
-        time.sleep(2)
-        mirobot.pump(0)
-        time.sleep(2)
-        mirobot.zero()
-        # time.sleep(2)
-        # conveyor.sendMsg("G90 G01 D0 F500")
-        # time.sleep(3)
+    moveConveyor()
+    if bad_found:
+        pickAndPlace()
         # Close the serial connection
         # serial_port.close()
         # print("Serial connection closed.")
@@ -73,5 +94,3 @@ def pickBadAndPlace(bad_found: bool) -> bool:
     # serial_port.close()
     # print("Serial connection closed.")   
     return bad_found
-
- 
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""
+Offline re-grading of stored biscuit images with the current thresholds.
+
+Walks image directories (and inspection archive shift folders) lazily, grades
+every image across a process pool and streams one row per image into a
+columnar results table, then prints confusion matrices against the labels.
+
+Labels come from the parent directory name (default), the file name, or a CSV
+of path,label rows; archived frames are labelled with their recorded verdict.
+
+Usage:
+    python -m utils.regrade images/ --output regrade.csv
+    python -m utils.regrade /data/biscuits --workers 8 --set checkAreaAndAngle.MIN_AREA=9800 --output tuned.csv
+    python -m utils.regrade archive/20261018_1 --method histogram --output shift1.npz
+"""
+import argparse
+import ast
+import csv
+import importlib
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from utils import getBurnedState
+from utils.captureImages import CROP_WIDTH, CROP_HEIGHT, preprocess_frame
+from utils.cascade import reject_reason
+from utils.checkAreaAndAngle import analyze_geometry
+from utils.checkDefects import analyze_defects
+from utils.checkObject import BACKGROUND_IMAGE_PATH, ObjectDetector
+from utils.getBurnedState import CLASSIFIER, STATES, predict_state
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+TASK_SIZE = 32             # Images per pool task (amortizes the inter-process round trip)
+EMPTY_LABELS = ("empty", "no_object", "background")
+VERDICTS = ["good", "bad", "empty"]
+
+COLUMNS = ["path", "label", "present", "area", "corners", "angle_min", "angle_max", "aspect_ratio",
+           "defect_depth", "holes", "crack_score", "r", "g", "b", "state", "color_good", "bad", "reason"]
+TEXT_COLUMNS = ("path", "label", "state", "reason")
+FLAG_COLUMNS = ("present", "color_good", "bad")
+
+# --- Inputs ---
+def iter_images(root):
+    """Yields image paths under root in sorted order, one directory listing at a time."""
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir():
+            yield from iter_images(entry.path)
+        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            yield entry.path
+
+def label_for(path, label_from, labels=None):
+    if labels and path in labels:
+        return labels[path]
+    if label_from == "dir":
+        return os.path.basename(os.path.dirname(path))
+    if label_from == "stem":
+        return os.path.splitext(os.path.basename(path))[0]
+    return ""
+
+def iter_archive(shift_dir):
+    """Yields one task per archive chunk: (key, recorded verdict, (chunk path, member)) items."""
+    index = sqlite3.connect(os.path.join(shift_dir, "index.sqlite"))
+    try:
+        chunks = [row[0] for row in index.execute("SELECT DISTINCT chunk FROM records ORDER BY chunk")]
+        for chunk in chunks:
+            rows = index.execute("SELECT timestamp, offset, bad, reason FROM records WHERE chunk = ? ORDER BY offset",
+                                 (chunk,)).fetchall()
+            chunk_path = os.path.join(shift_dir, chunk)
+            yield [(f"{chunk_path}#f{offset}", "empty" if reason == "empty" else ("bad" if bad else "good"),
+                    (chunk_path, f"f{offset}")) for timestamp, offset, bad, reason in rows]
+    finally:
+        index.close()
+
+def iter_tasks(roots, label_from="dir", labels=None, task_size=TASK_SIZE):
+    """Groups every input image into tasks of (key, label, source) items, lazily."""
+    for root in roots:
+        if os.path.exists(os.path.join(root, "index.sqlite")):
+            yield from iter_archive(root)
+            continue
+        if os.path.isfile(root):
+            paths = iter([root])
+        else:
+            paths = iter_images(root)
+        task = []
+        for path in paths:
+            task.append((path, label_for(path, label_from, labels), path))
+            if len(task) >= task_size:
+                yield task
+                task = []
+        if task:
+            yield task
+
+# --- Worker side ---
+_detector = None
+_method = CLASSIFIER
+
+def _init_worker(background_path=BACKGROUND_IMAGE_PATH, method=None, overrides=(), config_path=None):
+    global _detector, _method
+    # One OpenCV thread per worker: the pool already spreads images over the cores
+    cv2.setNumThreads(1)
+    if config_path is not None:
+        from utils import inspectionConfig
+        inspectionConfig.apply(inspectionConfig.load_config(config_path))
+    apply_overrides(overrides)
+    # A fixed background (no adaptive model), so results do not depend on the live line
+    _detector = ObjectDetector(background_path)
+    _method = method or getBurnedState.CLASSIFIER
+
+def apply_overrides(overrides):
+    """Sets module constants, e.g. [("checkAreaAndAngle", "MIN_AREA", 9800)]."""
+    for module_name, name, value in overrides:
+        setattr(importlib.import_module(f"utils.{module_name}"), name, value)
+
+def grade_image(img, method=CLASSIFIER, detector=None):
+    """
+    Grades one stored image (a full snapshot or an inspection-window crop) without early exit.
+
+    Returns:
+        dict: Every COLUMNS entry except path and label.
+    """
+    if img.shape[:2] == (CROP_HEIGHT, CROP_WIDTH):
+        frame = preprocess_frame(img, roi=(0, 0, CROP_WIDTH, CROP_HEIGHT))
+    else:
+        frame = preprocess_frame(img)
+    detector = detector or _detector
+
+    present = detector.might_contain_object(frame.gray) and detector.detect(frame.gray)[0]
+    geometry = analyze_geometry(frame.binary)
+    defects = analyze_defects(frame.binary, frame.gray, geometry)
+    rgb = np.array(cv2.mean(frame.cropped)[2::-1])
+    state, color_good = predict_state(frame.cropped, frame.binary, method, rgb)
+
+    # Every check runs, but the reason is the cascade's: the first failing stage in the configured order
+    reason = reject_reason({"geometry": geometry.reasons, "color": [] if color_good else ["burned state"],
+                            "defects": defects.reasons})
+    if not present:
+        bad, reason = False, "empty"
+    else:
+        bad, reason = reason is not None, reason or "good"
+    return {
+        "present": bool(present),
+        "area": geometry.area,
+        "corners": len(geometry.angles),
+        "angle_min": round(min(geometry.angles), 2) if geometry.angles else None,
+        "angle_max": round(max(geometry.angles), 2) if geometry.angles else None,
+        "aspect_ratio": round(geometry.aspect_ratio, 3) if geometry.aspect_ratio is not None else None,
+        "defect_depth": round(geometry.max_defect_depth, 2) if geometry.max_defect_depth is not None else None,
+        "holes": defects.holes,
+        "crack_score": round(defects.crack_score, 4),
+        "r": round(rgb[0], 1), "g": round(rgb[1], 1), "b": round(rgb[2], 1),
+        "state": state,
+        "color_good": bool(color_good),
+        "bad": bad,
+        "reason": reason,
+    }
+
+def _grade_task(task):
+    rows = []
+    chunks = {}
+    try:
+        for key, label, source in task:
+            if isinstance(source, str):
+                img = cv2.imread(source)
+            else:
+                chunk_path, member = source
+                if chunk_path not in chunks:
+                    chunks[chunk_path] = np.load(chunk_path)
+                img = chunks[chunk_path][member]
+            if img is None:
+                row = {"reason": "unreadable"}
+            else:
+                row = grade_image(img, _method)
+            row.update(path=key, label=label)
+            rows.append(row)
+    finally:
+        for chunk in chunks.values():
+            chunk.close()
+    return rows
+
+# --- Main process side ---
+def _imap_bounded(executor, fn, tasks, window):
+    """Like executor.map, but keeps only `window` tasks in flight, so the inputs are consumed lazily."""
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def regrade(tasks, workers, background_path=BACKGROUND_IMAGE_PATH, method=None, overrides=(),
+            config_path=None):
+    """
+    Grades every task and yields the result rows in input order.
+
+    Args:
+        tasks (iterable): Lists of (key, label, source) items from iter_tasks().
+        workers (int): Worker processes; 1 grades in this process.
+        background_path (str): Empty-belt image for the presence check.
+        method (str, optional): "rules", "lut" or "histogram"; defaults to the configured classifier.
+        overrides (list): (module, name, value) constants to set before grading.
+        config_path (str, optional): Inspection config (rgbMap.json) to grade with; overrides win.
+    """
+    if workers <= 1:
+        _init_worker(background_path, method, overrides, config_path)
+        for task in tasks:
+            yield from _grade_task(task)
+        return
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(background_path, method, tuple(overrides), config_path)) as executor:
+        for rows in _imap_bounded(executor, _grade_task, tasks, 2 * workers):
+            yield from rows
+
+def expected_verdict(label):
+    """Maps a label to "good", "bad", "empty", or None when it says nothing about the verdict."""
+    label = label.lower()
+    if label in EMPTY_LABELS:
+        return "empty"
+    if label == "good":
+        return "good"
+    if label == "bad" or label in (state.lower() for state in STATES):
+        return "bad"
+    return None
+
+class Confusion:
+    """Counts (label, prediction) pairs over a fixed set of classes."""
+
+    def __init__(self, title, classes):
+        self.title = title
+        self.classes = list(classes)
+        self.counts = np.zeros((len(self.classes), len(self.classes)), dtype=np.int64)
+
+    def add(self, label, predicted):
+        if label in self.classes and predicted in self.classes:
+            self.counts[self.classes.index(label), self.classes.index(predicted)] += 1
+
+    def format(self):
+        width = max(12, max(len(c) for c in self.classes) + 2)
+        total = int(self.counts.sum())
+        correct = int(np.trace(self.counts))
+        accuracy = f"{100.0 * correct / total:.1f}%" if total else "n/a"
+        lines = [f"{self.title} (rows: label, columns: predicted; accuracy {accuracy} of {total})",
+                 f"{'':<{width}}" + "".join(f"{c:>{width}}" for c in self.classes)]
+        for name, row in zip(self.classes, self.counts):
+            lines.append(f"{name:<{width}}" + "".join(f"{int(n):>{width}}" for n in row))
+        return "\n".join(lines)
+
+def column_array(name, values):
+    """Turns one results column into a typed array for .npz output (missing numbers become NaN)."""
+    if name in TEXT_COLUMNS:
+        return np.array(["" if v is None else str(v) for v in values])
+    if name in FLAG_COLUMNS:
+        return np.array([bool(v) for v in values])
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+def parse_override(text):
+    """Parses "module.NAME=value" (value as a Python literal) into (module, name, value)."""
+    try:
+        target, value = text.split("=", 1)
+        module_name, name = target.rsplit(".", 1)
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        raise argparse.ArgumentTypeError(f"Expected module.NAME=value, got '{text}'.")
+    try:
+        module = importlib.import_module(f"utils.{module_name}")
+    except ImportError:
+        raise argparse.ArgumentTypeError(f"Unknown module 'utils.{module_name}'.")
+    if not hasattr(module, name):
+        raise argparse.ArgumentTypeError(f"utils.{module_name} has no constant {name}.")
+    return module_name, name, value
+
+def read_labels(path):
+    with open(path, newline="") as f:
+        return {row["path"]: row["label"] for row in csv.DictReader(f)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-grade stored biscuit images with the current thresholds.")
+    parser.add_argument("inputs", nargs="+", help="Image directories or files, or archive shift folders.")
+    parser.add_argument("--output", default="regrade.csv", help="Results table (.csv, or .npz for column arrays).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes.")
+    parser.add_argument("--method", choices=["rules", "lut", "histogram"],
+                        help="Burned-state classifier (default: the one in the config).")
+    parser.add_argument("--config", default="./rgbMap.json", help="Inspection config to grade with.")
+    parser.add_argument("--background", default=BACKGROUND_IMAGE_PATH, help="Empty-belt image for presence detection.")
+    parser.add_argument("--label-from", choices=["dir", "stem", "none"], default="dir",
+                        help="Take labels from the parent directory name or the file name.")
+    parser.add_argument("--labels", help="CSV with path,label columns (overrides --label-from).")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                        metavar="module.NAME=value", help="Override a threshold, e.g. checkAreaAndAngle.MIN_AREA=9800.")
+    parser.add_argument("--task-size", type=int, default=TASK_SIZE, help="Images per worker task.")
+    args = parser.parse_args()
+
+    labels = read_labels(args.labels) if args.labels else None
+    tasks = iter_tasks(args.inputs, args.label_from, labels, args.task_size)
+
+    verdicts = Confusion("Verdict", VERDICTS)
+    states = Confusion("Burned state", STATES)
+    columns = {name: [] for name in COLUMNS} if args.output.endswith(".npz") else None
+    start = time.time()
+    count = 0
+    with open(os.devnull if columns is not None else args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        for row in regrade(tasks, args.workers, args.background, args.method, args.overrides, args.config):
+            count += 1
+            if columns is not None:
+                for name in COLUMNS:
+                    columns[name].append(row.get(name))
+            else:
+                writer.writerow(row)
+
+            if row["reason"] == "unreadable":
+                continue
+            predicted = row["reason"] if row["reason"] == "empty" else ("bad" if row.get("bad") else "good")
+            verdicts.add(expected_verdict(row["label"]), predicted)
+            label_state = next((s for s in STATES if s.lower() == row["label"].lower()), None)
+            predicted_state = next((s for s in STATES if s.lower() == str(row.get("state")).lower()), None)
+            if row.get("present"):
+                states.add(label_state, predicted_state)
+    elapsed = time.time() - start
+
+    if columns is not None:
+        np.savez_compressed(args.output, **{name: column_array(name, values) for name, values in columns.items()})
+    report = f"{verdicts.format()}\n\n{states.format()}\n"
+    with open(os.path.splitext(args.output)[0] + "_confusion.txt", "w") as f:
+        f.write(report)
+    print(report)
+    print(f"{count} images graded in {elapsed:.2f} seconds ({count / elapsed if elapsed > 0 else 0:.1f} images/s) "
+          f"with {args.workers} worker(s); results in {args.output}")
@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from utils import metrics
+
+# Number of conveyor pitches between the camera window and the arm's pick position.
+# With the current layout the belt advances one pitch before the arm picks.
+PICK_OFFSET_PITCHES = 1
+QUEUE_SIZE = 2
+
+@dataclass
+class CaptureRequest:
+    """
+    Tells the inspection stage that item `item_id` is under the camera and the belt
+    is still, or (belt_stopped_at None) that the belt is moving it there now.
+    """
+    item_id: int
+    belt_stopped_at: float
+    belt_move: object = None    # Future of that belt move (capture_early); running() once it has started
+
+@dataclass
+class Verdict:
+    """Inspection result for one item, keyed by its conveyor position ID."""
+    item_id: int
+    bad: bool
+    reason: str = ""
+    inspected_at: float = 0.0
+
+class InspectionScheduler:
+    """
+    Runs inspection and actuation as two overlapping stages.
+
+    The inspection thread captures and grades the item under the camera while the
+    actuation thread advances the belt and picks earlier items. Items are numbered
+    by the belt step at which they sat under the camera, so a verdict for item N is
+    acted on once the belt has moved it PICK_OFFSET_PITCHES further, to the arm.
+
+    Stages are plain callables so the same scheduler drives the real hardware or
+    a simulator. With capture_early the belt move is only queued and the capture
+    request for the next item goes out together with its Future, for a capture()
+    that waits for the item to settle itself (utils.trigger.FrameTrigger):
+        capture(newer_than) -> frame or None   # capture(None, belt_move) with capture_early
+        inspect(frame) -> (bad, reason)
+        advance() -> None    # move the belt one pitch and wait until it stops
+                             # (advance(wait=False) -> Future with capture_early)
+        pick() -> None       # remove the item at the pick position
+
+    An item for which capture() returns no frame passes as "no frame", or is
+    rejected with reject_missing.
+    """
+
+    def __init__(self, capture, inspect, advance, pick,
+                 pick_offset=PICK_OFFSET_PITCHES, queue_size=QUEUE_SIZE, name="", capture_early=False,
+                 reject_missing=False):
+        self.capture = capture
+        self.capture_early = capture_early
+        self.reject_missing = reject_missing
+        self.inspect = inspect
+        self.advance = advance
+        self.pick = pick
+        self.pick_offset = pick_offset
+        self.prefix = f"[{name}] " if name else ""   # Log prefix when several stations share a host
+
+        # Bounded queues between the stages: at most queue_size items in flight
+        self._capture_queue = queue.Queue(maxsize=queue_size)
+        self._verdict_queue = queue.Queue(maxsize=queue_size)
+        self._errors = []
+
+        self.picked = []
+        self.verdicts = {}
+
+    # --- Inspection stage ---
+    def _inspection_loop(self):
+        while True:
+            request = self._capture_queue.get()
+            if request is None:
+                self._verdict_queue.put(None)
+                return
+
+            try:
+                if self.capture_early:
+                    frame = self.capture(request.belt_stopped_at, request.belt_move)
+                else:
+                    frame = self.capture(request.belt_stopped_at)
+                if frame is None:
+                    # Never inspected: with reject_missing it must not pass as good
+                    bad, reason = self.reject_missing, "no frame"
+                else:
+                    bad, reason = self.inspect(frame)
+            except Exception as e:
+                # Reject rather than let an unchecked item through
+                print(f"{self.prefix}Inspection of item {request.item_id} failed: {e}")
+                bad, reason = True, f"error: {e}"
+
+            self._verdict_queue.put(Verdict(request.item_id, bad, reason, time.time()))
+
+    # --- Actuation stage ---
+    def _actuation_loop(self, num_items):
+        pending = {}
+        step = 0
+        self._capture_queue.put(CaptureRequest(step, time.time()))
+        last_step_at = time.time()
+
+        while True:
+            verdict = self._verdict_queue.get()
+            if verdict is None:
+                return
+            pending[verdict.item_id] = verdict
+            self.verdicts[verdict.item_id] = verdict
+            print(f"{self.prefix}Item {verdict.item_id}: {'BAD' if verdict.bad else 'ok'} {verdict.reason}")
+
+            try:
+                if self.capture_early:
+                    # Start watching for the next item while the belt is still bringing it
+                    move = self.advance(wait=False)
+                    self._capture_queue.put(CaptureRequest(step + 1, None, move) if step + 1 < num_items else None)
+                    move.result()
+                else:
+                    self.advance()
+            except Exception as e:
+                self._errors.append(e)
+                if not self.capture_early:
+                    self._capture_queue.put(None)
+                return
+            step += 1
+
+            # Let the camera see the next item while the arm works on an earlier one
+            if not self.capture_early:
+                self._capture_queue.put(CaptureRequest(step, time.time()) if step < num_items else None)
+
+            at_pick = pending.pop(step - self.pick_offset, None)
+            if at_pick is not None and at_pick.bad:
+                print(f"{self.prefix}Picking item {at_pick.item_id} ({at_pick.reason})")
+                try:
+                    self.pick()
+                except Exception as e:
+                    self._errors.append(e)
+                    return
+                self.picked.append(at_pick.item_id)
+
+            now = time.time()
+            metrics.observe("iteration", now - last_step_at)
+            metrics.write_textfile()
+            last_step_at = now
+
+    def run(self, num_items):
+        """
+        Inspects and sorts `num_items` conveyor positions.
+
+        Returns:
+            list: IDs of the items that were picked as bad.
+        """
+        inspector = threading.Thread(target=self._inspection_loop, name=f"{self.prefix}Inspection".strip(), daemon=True)
+        inspector.start()
+        self._actuation_loop(num_items)
+        inspector.join(timeout=5.0)
+        if self._errors:
+            raise self._errors[0]
+        return self.picked
@@ -0,0 +1,230 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from utils import metrics
+from utils.motion import POLL_INTERVAL, waitForIdle
+
+ACK_TIMEOUT = 0.5          # Seconds to wait for the controller's "ok" after a command
+DEFAULT_MOVE_TIMEOUT = 10.0
+JOB_QUEUE_SIZE = 8         # Jobs waiting for the port; submit() blocks only when this is full
+ACK_WINDOW = 3             # Commands written ahead of their "ok" (1 = wait for every ack); keep
+                           # well inside the controller's receive buffer
+
+# How long the link waits after sending a command before the next one goes out:
+#   "ack"  - until the controller acknowledges it (settings, pump, ...)
+#   "idle" - until the controller reports Idle again (moves)
+WAIT_ACK = "ack"
+WAIT_IDLE = "idle"
+
+@dataclass
+class Command:
+    """One G-code line plus what the link has to wait for before sending the next."""
+    gcode: str
+    controller: object
+    wait: str = WAIT_ACK
+    name: str = ""
+    timeout: float = DEFAULT_MOVE_TIMEOUT
+    dwell: float = 0.0     # Extra seconds to hold after the wait (e.g. suction cup grip)
+
+@dataclass
+class Job:
+    """Commands that run back-to-back on the port without anything interleaved."""
+    name: str
+    commands: list
+    future: Future
+    submitted_at: float
+
+class SerialLink:
+    """
+    Sole owner of the controller serial port.
+
+    The arm and the conveyor axis share one UART, so every command for either
+    goes through this link. A dedicated thread takes jobs from a bounded queue
+    and runs their commands in order. Commands that only need their "ok"
+    (settings, pump) are pipelined: up to `ack_window` of them are written
+    before the oldest acknowledgement is read, and the controller executes
+    them in order. A move, or a command with a dwell, conflicts with whatever
+    follows it, so the link collects every outstanding "ok" there (status
+    polling clears the input buffer) and, for moves, polls the status until
+    the controller is Idle again before the next line goes out.
+
+    submit() returns a Future right away, so the inspection side can queue a
+    reject job without waiting for the arm. The Future reports running() once
+    its first command goes out. If a job fails the link refuses further jobs,
+    so the belt is not advanced after a failed pick.
+    """
+
+    def __init__(self, port, queue_size=JOB_QUEUE_SIZE, ack_timeout=ACK_TIMEOUT, ack_window=ACK_WINDOW):
+        self.port = port
+        self.ack_timeout = ack_timeout
+        self.ack_window = max(1, ack_window)
+        self.error = None
+        self._unacked = collections.deque()   # G-code written but not yet acknowledged, oldest first
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="SerialLink", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=30.0):
+        """Finishes the queued jobs, then stops the link thread (the port itself stays open)."""
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, name, commands):
+        """
+        Queues a job without waiting for it to run.
+
+        Args:
+            name (str): Job label, also used as its metrics stage ("conveyor", "arm_cycle", ...).
+            commands (list): Command objects to run in order.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the job duration in seconds.
+        """
+        if self.error is not None:
+            raise RuntimeError(f"Serial link stopped after an earlier failure: {self.error}")
+        job = Job(name, list(commands), Future(), time.time())
+        self._jobs.put(job)
+        return job.future
+
+    def run(self, name, commands, timeout=None):
+        """Queues a job and waits for it to finish; returns its duration in seconds."""
+        return self.submit(name, commands).result(timeout)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            if self.error is not None:
+                job.future.set_exception(RuntimeError(f"Skipped '{job.name}' after an earlier failure."))
+                continue
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            started = time.time()
+            try:
+                for command in job.commands:
+                    self._execute(command)
+                # The job is done once its last command is acknowledged
+                self._drain_acks()
+            except Exception as e:
+                print(f"Serial job '{job.name}' failed: {e}")
+                self._unacked.clear()
+                self.error = e
+                job.future.set_exception(e)
+                continue
+            elapsed = time.time() - started
+            metrics.observe(job.name, elapsed)
+            job.future.set_result(elapsed)
+
+    def _execute(self, command):
+        controller = command.controller
+        if len(self._unacked) >= self.ack_window:
+            self._wait_ack()
+        started = time.time()
+        self.port.write((controller.prefix + command.gcode + "\r\n").encode("utf-8"))
+        self._unacked.append(command.gcode)
+        if command.wait == WAIT_IDLE or command.dwell > 0:
+            # Nothing may overtake a move or a dwell: collect the acks, then wait it out
+            self._drain_acks()
+            if command.wait == WAIT_IDLE:
+                waitForIdle(controller, command.name or command.gcode, command.timeout, started)
+            if command.dwell > 0:
+                time.sleep(command.dwell)
+
+    def _drain_acks(self):
+        while self._unacked:
+            self._wait_ack()
+
+    def _wait_ack(self):
+        """Reads replies until the controller acknowledges the oldest unacknowledged line."""
+        gcode = self._unacked.popleft()
+        deadline = time.time() + self.ack_timeout
+        while time.time() < deadline:
+            line = self.port.readline().decode("utf-8", errors="ignore").strip()
+            if not line:
+                continue
+            if line.lower().startswith("ok"):
+                return
+            if line.lower().startswith(("error", "alarm")):
+                raise RuntimeError(f"Controller rejected '{gcode}': {line}")
+        print(f"Warning: No acknowledgement for '{gcode}' within {self.ack_timeout:.1f} seconds.")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+class QueuedMirobot:
+    """
+    Mirobot_UART-style command builder bound to a SerialLink.
+
+    writeangle(), zero(), pump(), speed() and conveyor() format the same G-code
+    as wlkatapython but return Command objects instead of writing them, so a
+    whole cycle can be handed to the link as one job:
+
+        link.run("arm_cycle", [mirobot.speed(1), mirobot.writeangle(0, 23.4, ...), mirobot.pump(1)])
+
+    pSerial/address/poll_interval are what utils.motion uses for status
+    polling, which only ever happens on the link thread.
+    """
+
+    def __init__(self, link, address=-1, poll_interval=POLL_INTERVAL):
+        self.link = link
+        self.pSerial = link.port
+        self.address = address
+        self.poll_interval = poll_interval
+        self.prefix = "" if address == -1 else f"@{address}"
+
+    def command(self, gcode, wait=WAIT_ACK, name="", timeout=DEFAULT_MOVE_TIMEOUT, dwell=0.0):
+        return Command(gcode, self, wait, name, timeout, dwell)
+
+    def sendMsg(self, gcode):
+        """Queues a single line fire-and-forget; returns its Future."""
+        return self.link.submit("command", [self.command(gcode)])
+
+    def homing(self, mode=8, timeout=60.0):
+        return self.command(f"o105={mode}", WAIT_IDLE, "homing", timeout)
+
+    def pump(self, num, dwell=0.0):
+        return self.command({1: "M3 S1000", 2: "M3 S500"}.get(num, "M3 S0"), dwell=dwell)
+
+    def speed(self, num):
+        return self.command("F" + str(num))
+
+    def zero(self, timeout=DEFAULT_MOVE_TIMEOUT):
+        return self.command("M21 G90 G00 X0 Y0 Z0 A0 B0 C00", WAIT_IDLE, "zero", timeout)
+
+    def writeangle(self, position, axle1=None, axle2=None, axle3=None, axle4=None, axle5=None, axle6=None,
+                   name="writeangle", timeout=DEFAULT_MOVE_TIMEOUT, feed=None):
+        """Joint move; rapid (G00) by default, or G01 at `feed` degrees/min."""
+        mode = "G91" if position == 1 else "G90"
+        angle = ""
+        for letter, value in zip("XYZABC", (axle1, axle2, axle3, axle4, axle5, axle6)):
+            if value is not None:
+                angle += f"{letter}{value}"
+        if feed is not None:
+            return self.command(f"M21{mode}G01{angle}F{feed}", WAIT_IDLE, name, timeout)
+        return self.command(f"M21{mode}G00{angle}", WAIT_IDLE, name, timeout)
+
+    def conveyor(self, distance, feed=500, relative=True, timeout=DEFAULT_MOVE_TIMEOUT, wait=WAIT_IDLE):
+        """
+        Moves the conveyor (7th axis) by `distance` mm at `feed` mm/min.
+
+        wait=WAIT_ACK only waits for the acknowledgement, for a belt that keeps
+        running while other commands go out (utils.tracking).
+        """
+        mode = "G91" if relative else "G90"
+        return self.command(f"{mode} G01 D{distance} F{feed}", wait, "conveyor", timeout)
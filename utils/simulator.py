@@ -0,0 +1,368 @@
+import collections
+import cv2
+import glob
+import os
+import re
+import threading
+import time
+import numpy as np
+
+from utils.captureImages import CROP_X, CROP_Y, CROP_WIDTH, CROP_HEIGHT
+from utils.frameRing import FrameRing
+# Latency model (seconds, before time_scale is applied), shared with the trajectory cost model
+from utils.trajectory import JOINT_SPEED, MOVE_OVERHEAD, PUMP_LATENCY, COMMAND_LATENCY
+
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+BACKGROUND_GRAY = 150
+
+# --- Moving-belt camera (SimBeltCamera) ---
+SIM_PITCH_MM = 15.0                       # Belt travel between neighbouring biscuits
+SIM_PX_PER_MM = CROP_HEIGHT / SIM_PITCH_MM  # One pitch moves the next biscuit into the crop window
+SIM_FRAME_INTERVAL = 1.0 / 30.0           # Camera frame period (scaled by time_scale)
+SIM_MIN_FRAME_INTERVAL = 0.002            # ... but never faster than this
+SIM_EXPOSURE = 1.0 / 60.0                 # Exposure time that smears moving biscuits
+SIM_BELT_IMAGE = "./images/no_object.png" # Empty belt drawn upstream of the first biscuit
+
+AXIS_PATTERN = re.compile(r"([XYZABCD])(-?\d+(?:\.\d+)?)")
+FEED_PATTERN = re.compile(r"F(\d+(?:\.\d+)?)")
+
+class SimSerial:
+    """
+    Fake serial endpoint for the Mirobot controller and its conveyor axis.
+
+    Parses the same G-code the real controller receives, keeps the joint and
+    conveyor positions, and answers "?" with a status line that reports "Run"
+    until the modelled move latency has elapsed. time_scale shrinks every
+    latency so long runs can be simulated quickly (0.01 = 100x faster).
+    """
+
+    def __init__(self, time_scale=1.0):
+        self.time_scale = time_scale
+        self.angles = {axis: 0.0 for axis in "XYZABC"}
+        self.conveyor_position = 0.0
+        # Recent conveyor moves as (start mm, end mm, start time, end time), for conveyor_at()
+        self.conveyor_moves = collections.deque([(0.0, 0.0, 0.0, 0.0)], maxlen=8)
+        self.pump = 0
+        # Per RS485 address (-1 = no prefix): time the controller becomes Idle, and whether
+        # it has reported Run since its last command. Separately addressed controllers
+        # (e.g. a conveyor on its own driver) move independently of the arm.
+        self._busy_until = {}
+        self._reported_run = {}
+        self._lines = []
+        self._lock = threading.Lock()
+        self.commands = []
+        self.is_open = True
+
+    # --- pyserial-compatible surface used by utils.serialLink and utils.motion ---
+    @property
+    def in_waiting(self):
+        return len(self._lines)
+
+    def write(self, data):
+        for command in data.decode("utf-8").splitlines():
+            command = command.strip()
+            if command:
+                self._handle(command)
+        return len(data)
+
+    def readline(self):
+        with self._lock:
+            return self._lines.pop(0).encode("utf-8") + b"\r\n" if self._lines else b""
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._lines.clear()
+
+    flushInput = reset_input_buffer
+
+    def reset_output_buffer(self):
+        pass
+
+    flushOutput = reset_output_buffer
+
+    def close(self):
+        self.is_open = False
+
+    # --- Controller model ---
+    @property
+    def busy_until(self):
+        """Time the arm controller (no address prefix) becomes Idle."""
+        return self._busy_until.get(-1, 0.0)
+
+    def _busy(self, duration, address=-1):
+        now = time.time()
+        self._busy_until[address] = max(now, self._busy_until.get(address, 0.0)) + duration * self.time_scale
+        # The real controller reports Run at least once after accepting a move
+        self._reported_run[address] = False
+
+    def _state(self, address=-1):
+        if time.time() < self._busy_until.get(address, 0.0) or not self._reported_run.get(address, True):
+            self._reported_run[address] = True
+            return "Run"
+        return "Idle"
+
+    def _status_line(self, address=-1):
+        a = self.angles
+        return (f"<{self._state(address)},Angle(ABCDXYZ):{a['A']:.3f},{a['B']:.3f},{a['C']:.3f},"
+                f"{self.conveyor_position:.3f},{a['X']:.3f},{a['Y']:.3f},{a['Z']:.3f},"
+                f"Cartesian coordinate(XYZ RxRyRz):0.000,0.000,0.000,0.000,0.000,0.000,"
+                f"Pump PWM:{self.pump},Valve PWM:0,Motion_MODE:0>")
+
+    def _reply(self, line):
+        with self._lock:
+            self._lines.append(line)
+
+    def _handle(self, command):
+        self.commands.append(command)
+        # Split off an RS485 address prefix such as "@1"
+        prefix = re.match(r"^@(\d+)", command)
+        address = int(prefix.group(1)) if prefix else -1
+        command = command[prefix.end():] if prefix else command
+
+        if command == "?":
+            self._reply(self._status_line(address))
+            return
+
+        if command.startswith("M3"):
+            self.pump = 0 if "S0" in command else 1
+            self._busy(PUMP_LATENCY, address)
+        elif command.startswith("M21"):
+            # Joint-angle move (writeangle / zero)
+            incremental = "G91" in command
+            targets = AXIS_PATTERN.findall(FEED_PATTERN.sub("", command.replace("M21", "").replace("G90", "").replace("G91", "")
+                                                        .replace("G00", "").replace("G01", "")))
+            largest = 0.0
+            for axis, value in targets:
+                value = float(value)
+                new = self.angles[axis] + value if incremental else value
+                largest = max(largest, abs(new - self.angles[axis]))
+                self.angles[axis] = new
+            # G01 joint moves run at their feed (degrees/min), capped at the rapid speed
+            joint_speed = JOINT_SPEED
+            feed = FEED_PATTERN.search(command)
+            if "G01" in command and feed:
+                joint_speed = min(JOINT_SPEED, float(feed.group(1)) / 60.0)
+            self._busy(MOVE_OVERHEAD + largest / joint_speed, address)
+        elif "D" in command and command.startswith("G9"):
+            # Conveyor (7th axis) move, e.g. "G91 G01 D15 F500" with F in mm/min
+            distance = float(dict(AXIS_PATTERN.findall(command)).get("D", 0.0))
+            feed = FEED_PATTERN.search(command)
+            feed = float(feed.group(1)) if feed else 500.0
+            start = self.conveyor_position
+            if "G91" in command:
+                travel = abs(distance)
+                self.conveyor_position += distance
+            else:
+                travel = abs(distance - self.conveyor_position)
+                self.conveyor_position = distance
+            # The move starts once its controller is free and runs at constant speed
+            started_at = max(time.time(), self._busy_until.get(address, 0.0))
+            self._busy(travel / feed * 60.0, address)
+            self.conveyor_moves.append((start, self.conveyor_position, started_at, self._busy_until[address]))
+        else:
+            self._busy(COMMAND_LATENCY, address)
+        self._reply("ok")
+
+    def conveyor_at(self, t):
+        """
+        Conveyor position (mm) at time t, interpolated along the recent moves.
+
+        Returns:
+            tuple: (position mm, speed mm/s).
+        """
+        for start, end, started_at, ends_at in reversed(self.conveyor_moves):
+            if t < started_at:
+                continue
+            if t >= ends_at or ends_at <= started_at:
+                return end, 0.0
+            speed = (end - start) / (ends_at - started_at)
+            return start + speed * (t - started_at), speed
+        return self.conveyor_moves[0][0], 0.0
+
+def load_replay_images(image_dir):
+    """
+    Loads every image under image_dir (recursively) as a full camera frame.
+
+    Images the size of the inspection crop (e.g. images/burnedStates/*) are
+    pasted onto a plain background at the crop position, so they pass through
+    preprocess_frame() exactly like a real snapshot.
+    """
+    paths = sorted(glob.glob(os.path.join(image_dir, "**", "*.png"), recursive=True) +
+                   glob.glob(os.path.join(image_dir, "**", "*.jpg"), recursive=True))
+    frames = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"Skipping unreadable image: {path}")
+            continue
+        if img.shape[0] <= CROP_HEIGHT and img.shape[1] <= CROP_WIDTH:
+            canvas = np.full((FRAME_HEIGHT, FRAME_WIDTH, 3), BACKGROUND_GRAY, dtype=np.uint8)
+            canvas[CROP_Y:CROP_Y + img.shape[0], CROP_X:CROP_X + img.shape[1]] = img
+            img = canvas
+        elif img.shape[:2] != (FRAME_HEIGHT, FRAME_WIDTH):
+            img = cv2.resize(img, (FRAME_WIDTH, FRAME_HEIGHT))
+        frames.append((path, img))
+    if not frames:
+        raise FileNotFoundError(f"No images found in '{image_dir}'.")
+    return frames
+
+class ReplayCamera:
+    """
+    Camera backend that replays a directory of recorded images.
+
+    Exposes the same start/stop/latest/read/read_entry interface as
+    CameraService, including its FrameRing. Each read advances to the next
+    image (one biscuit per belt pitch) and wraps around at the end of the
+    directory.
+    """
+
+    def __init__(self, image_dir="./images/", loop=True, shared=False):
+        self.frames = load_replay_images(image_dir)
+        self.loop = loop
+        self._index = -1
+        self.ring = FrameRing(shape=(FRAME_HEIGHT, FRAME_WIDTH, 3), shared=shared)
+
+    def start(self):
+        return self
+
+    def stop(self):
+        self.ring.close()
+
+    def latest(self):
+        entry = self.ring.latest()
+        return (entry[0], entry[1], self.ring.images[entry[2]]) if entry is not None else None
+
+    def read_entry(self, newer_than=None, timeout=2.0):
+        self._index += 1
+        if self._index >= len(self.frames):
+            if not self.loop:
+                return None
+            self._index = 0
+        # Replayed like a live grab: copied into the next ring slot, then read (and pinned) from there
+        self.ring.write(self.frames[self._index][1])
+        frame_id, timestamp, index = self.ring.read()
+        return frame_id, timestamp, self.ring.images[index]
+
+    def read(self, newer_than=None, timeout=2.0):
+        entry = self.read_entry(newer_than, timeout)
+        return entry[2] if entry is not None else None
+
+    def current_path(self):
+        """Path of the image returned by the last read (handy for labelling results)."""
+        return self.frames[self._index][0] if self._index >= 0 else None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class SimBeltCamera:
+    """
+    Simulated camera watching the belt of a SimSerial controller.
+
+    Biscuits (the crop windows of the replayed images, in order) sit one pitch
+    apart on the belt. A grab thread renders frames continuously into the
+    FrameRing, with every biscuit placed by the controller's interpolated
+    conveyor position and smeared along the belt while it moves. Frames
+    taken during a move therefore show an off-centre, blurred biscuit, as
+    on the line.
+    """
+
+    def __init__(self, serial_port, image_dir="./images/", time_scale=1.0, shared=False):
+        self.serial = serial_port
+        self.tiles = [img[CROP_Y:CROP_Y + CROP_HEIGHT, CROP_X:CROP_X + CROP_WIDTH].copy()
+                      for _, img in load_replay_images(image_dir)]
+        belt = cv2.imread(SIM_BELT_IMAGE)
+        if belt is None or belt.shape != self.tiles[0].shape:
+            belt = np.full_like(self.tiles[0], BACKGROUND_GRAY)
+        self.belt_tile = belt
+        # Only the biscuit itself is pasted onto the belt, so a biscuit that sits
+        # off-centre in its image does not drag a strip of its neighbour's image along
+        belt_level = int(np.median(cv2.cvtColor(belt, cv2.COLOR_BGR2GRAY)))
+        self.masks = [self._biscuit_mask(tile, belt_level) for tile in self.tiles]
+        self.time_scale = time_scale
+        self.interval = max(SIM_FRAME_INTERVAL * time_scale, SIM_MIN_FRAME_INTERVAL)
+        self.ring = FrameRing(shape=(FRAME_HEIGHT, FRAME_WIDTH, 3), shared=shared)
+        self._running = False
+        self._thread = None
+
+    @staticmethod
+    def _biscuit_mask(tile, belt_level, threshold=30):
+        """Filled outline of the largest blob that stands out from the belt (3-channel, bool)."""
+        gray = cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+        changed = (cv2.absdiff(gray, belt_level) > threshold).astype(np.uint8)
+        contours, _ = cv2.findContours(changed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        mask = np.zeros_like(gray)
+        if contours:
+            cv2.fillConvexPoly(mask, cv2.convexHull(max(contours, key=cv2.contourArea)), 1)
+        return np.repeat(mask[:, :, None].astype(bool), 3, axis=2)
+
+    def render(self, out, t):
+        """Draws the belt as seen at time t into `out` (a full BGR frame)."""
+        position, speed = self.serial.conveyor_at(t)
+        belt_px = position * SIM_PX_PER_MM
+        out[...] = BACKGROUND_GRAY
+        first = int(np.ceil((belt_px - CROP_Y - CROP_HEIGHT) / CROP_HEIGHT))
+        last = int(np.floor((belt_px - CROP_Y + FRAME_HEIGHT) / CROP_HEIGHT))
+        for k in range(first, last + 1):
+            top = int(round(CROP_Y + k * CROP_HEIGHT - belt_px))
+            y0, y1 = max(top, 0), min(top + CROP_HEIGHT, FRAME_HEIGHT)
+            if y1 > y0:
+                window = out[y0:y1, CROP_X:CROP_X + CROP_WIDTH]
+                window[...] = self.belt_tile[y0 - top:y1 - top]
+                if k >= 0:
+                    index = k % len(self.tiles)
+                    np.copyto(window, self.tiles[index][y0 - top:y1 - top], where=self.masks[index][y0 - top:y1 - top])
+        # The exposure shrinks with time_scale like every other simulated duration
+        blur = int(abs(speed) * SIM_PX_PER_MM * SIM_EXPOSURE * self.time_scale)
+        if blur > 1:
+            cv2.blur(out, (1, blur), dst=out)
+
+    def _grab_loop(self):
+        while self._running:
+            try:
+                index = self.ring.begin_write(self.interval)
+            except RuntimeError:
+                # Like CameraService: readers hold every slot, so this frame is dropped
+                continue
+            now = time.time()
+            self.render(self.ring.images[index], now)
+            self.ring.commit(index, now)
+            time.sleep(self.interval)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._grab_loop, name="SimBeltCamera", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.ring.close()
+
+    def latest(self):
+        entry = self.ring.latest()
+        return (entry[0], entry[1], self.ring.images[entry[2]]) if entry is not None else None
+
+    def read_entry(self, newer_than=None, timeout=2.0):
+        entry = self.ring.read(newer_than, timeout)
+        if entry is None:
+            return None
+        frame_id, timestamp, index = entry
+        return frame_id, timestamp, self.ring.images[index]
+
+    def read(self, newer_than=None, timeout=2.0):
+        entry = self.read_entry(newer_than, timeout)
+        return entry[2] if entry is not None else None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
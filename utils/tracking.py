@@ -0,0 +1,453 @@
+"""
+Continuous-belt mode: the belt runs at constant speed while biscuits are
+tracked, inspected and picked on the fly.
+
+    camera frames -> BiscuitTracker -> biscuit crosses the camera line -> inspection thread
+                                                                              | bad
+                                                                              v
+                     PickPredictor: arrival at the arm = crossing time + ARM_OFFSET_MM / belt speed,
+                     pick job submitted one (measured) lead time before the arrival
+
+Nothing waits for an inspection. A verdict only has to arrive before its biscuit
+reaches the arm, so line throughput is set by the belt speed and the reject
+cycle, not by per-item inspection latency.
+
+The belt has to keep running while the arm moves, so the conveyor needs its own
+controller (main.py --conveyor-address, default utils.devices.CONVEYOR_ADDRESS);
+as the arm controller's 7th axis each belt move would block the arm until it ends.
+
+Usage:
+    python main.py --sim --continuous --images images/burnedStates --iterations 8 --time-scale 0.1
+"""
+import heapq
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from utils import captureImages, metrics, trajectory
+from utils.captureImages import preprocess_frame
+from utils.scheduler import Verdict
+from utils.serialLink import WAIT_ACK
+from utils.trigger import CENTRE_TOLERANCE
+
+BELT_FEED = 120           # Belt speed (mm/min); one 15 mm pitch per 7.5 s, longer than a tracking reject cycle
+RUN_SEGMENT_MM = 30.0     # Length of each queued conveyor move; the next one is queued before it ends
+ARM_OFFSET_MM = 15.0      # Belt travel from the camera line (crop centre) to the pick position
+PX_PER_MM = 12.0          # Camera scale along the belt (crop height / pitch)
+TRACK_SCALE = 2           # Downsampling of the belt band for segmentation
+TRACK_MIN_AREA = 2000     # Full-resolution px a blob needs to count as a biscuit
+MATCH_DISTANCE = 40       # Max px between a track's predicted and detected centroid
+MAX_MISSES = 5            # Frames a track may go undetected before it is dropped
+VELOCITY_SMOOTHING = 0.2  # Weight of each new velocity sample
+LEAD_SMOOTHING = 0.3      # Weight of each measured submit-to-contact time in the pick lead
+INSPECTION_QUEUE = 4      # Crossed biscuits waiting for inspection; further ones are rejected unchecked
+FRAME_TIMEOUT = 2.0       # Seconds without a camera frame before the run is aborted
+ISOLATION_MARGIN = 4      # Rows kept around a biscuit when neighbours are blanked out of its crop
+
+@dataclass
+class Track:
+    """One biscuit followed across frames."""
+    track_id: int
+    y: float                  # Centroid row in the full frame
+    seen_at: float            # Timestamp of the last matched frame
+    velocity: float           # Rows per second (negative = moving up the image)
+    extent: tuple = (0, 0)    # (top, bottom) rows of the biscuit in the last matched frame
+    misses: int = 0
+    item_id: int = None       # Crossing order, set when it passes the camera line
+    crossed_at: float = None  # Interpolated time it passed the camera line
+
+class BiscuitTracker:
+    """
+    Lightweight multi-object tracker along the belt.
+
+    Each frame, the belt column under the camera is downsampled, compared with
+    the empty-belt gray level and split into blobs (one connected-components
+    pass). Blobs are matched to the tracks' predicted positions by nearest
+    distance, which is unambiguous while biscuits are further apart than
+    MATCH_DISTANCE. update() reports the tracks that crossed the camera line
+    (the crop centre) in this frame, numbered in crossing order.
+    """
+
+    def __init__(self, belt_level, expected_velocity=0.0, band=None, change_threshold=None):
+        from utils.checkObject import CHANGE_THRESHOLD
+
+        self.band = band or (captureImages.CROP_X, captureImages.CROP_WIDTH)
+        self.belt_level = belt_level
+        self.change_threshold = CHANGE_THRESHOLD if change_threshold is None else change_threshold
+        self.expected_velocity = expected_velocity
+        self.tracks = []
+        self.crossed = 0
+        self.frames = 0
+        self._next_id = 0
+        self._gray = None
+        self._small = None
+        self._mask = None
+
+    @property
+    def line(self):
+        """Row of the camera line: the centre of the current crop window."""
+        return captureImages.CROP_Y + captureImages.CROP_HEIGHT / 2.0
+
+    def detect(self, img):
+        """
+        Finds the biscuits in the belt band of a full BGR frame.
+
+        Returns:
+            list: (centroid row, top row, bottom row) at full resolution for every
+                  biscuit that is fully in view.
+        """
+        x, width = self.band
+        height = img.shape[0]
+        small_shape = (max(1, height // TRACK_SCALE), max(1, width // TRACK_SCALE))
+        if self._small is None or self._small.shape != small_shape:
+            self._gray = np.empty((height, width), dtype=np.uint8)
+            self._small = np.empty(small_shape, dtype=np.uint8)
+            self._mask = np.empty(small_shape, dtype=np.uint8)
+        cv2.cvtColor(img[:, x:x + width], cv2.COLOR_BGR2GRAY, dst=self._gray)
+        cv2.resize(self._gray, small_shape[::-1], dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.absdiff(self._small, self.belt_level, dst=self._mask)
+        cv2.threshold(self._mask, self.change_threshold, 255, cv2.THRESH_BINARY, dst=self._mask)
+
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(self._mask)
+        if count <= 1:
+            return []
+        stats, centroids = stats[1:], centroids[1:]
+        top, bottom = stats[:, cv2.CC_STAT_TOP], stats[:, cv2.CC_STAT_TOP] + stats[:, cv2.CC_STAT_HEIGHT]
+        # Biscuits cut by the edge of the view have a misleading centroid; they are tracked once fully in
+        keep = ((stats[:, cv2.CC_STAT_AREA] * TRACK_SCALE * TRACK_SCALE >= TRACK_MIN_AREA)
+                & (top > 0) & (bottom < small_shape[0]))
+        rows = (centroids[keep, 1] + 0.5) * TRACK_SCALE - 0.5
+        return list(zip(rows, top[keep] * TRACK_SCALE, bottom[keep] * TRACK_SCALE))
+
+    def velocity(self):
+        """Median velocity (rows/s) of the tracks, or the expected one before any are moving."""
+        moving = [track.velocity for track in self.tracks if track.velocity != 0.0]
+        return float(np.median(moving)) if moving else self.expected_velocity
+
+    def update(self, img, timestamp):
+        """
+        Matches this frame's biscuits to the tracks.
+
+        Returns:
+            list: Tracks that crossed the camera line in this frame.
+        """
+        detections = self.detect(img)
+        first_frame = self.frames == 0
+        self.frames += 1
+        line = self.line
+
+        # Greedy nearest matching between predicted track positions and detections
+        pairs = []
+        for t_index, track in enumerate(self.tracks):
+            predicted = track.y + track.velocity * (timestamp - track.seen_at)
+            for d_index, (y, _, _) in enumerate(detections):
+                distance = abs(y - predicted)
+                if distance <= MATCH_DISTANCE:
+                    pairs.append((distance, t_index, d_index))
+        pairs.sort()
+        matched_tracks, matched_detections = set(), set()
+        crossings = []
+        for _, t_index, d_index in pairs:
+            if t_index in matched_tracks or d_index in matched_detections:
+                continue
+            matched_tracks.add(t_index)
+            matched_detections.add(d_index)
+            track = self.tracks[t_index]
+            y, top, bottom = detections[d_index]
+            dt = timestamp - track.seen_at
+            if dt > 0:
+                track.velocity += VELOCITY_SMOOTHING * ((y - track.y) / dt - track.velocity)
+            before, after = track.y - line, y - line
+            if track.item_id is None and before != after and before * after <= 0:
+                # Interpolate the moment the centroid was on the line
+                self._cross(track, track.seen_at + dt * before / (before - after))
+                crossings.append(track)
+            track.y, track.extent, track.seen_at, track.misses = y, (top, bottom), timestamp, 0
+
+        survivors = []
+        for t_index, track in enumerate(self.tracks):
+            if t_index not in matched_tracks:
+                track.misses += 1
+                if track.misses > MAX_MISSES:
+                    continue
+            survivors.append(track)
+        self.tracks = survivors
+
+        for d_index, (y, top, bottom) in enumerate(detections):
+            if d_index in matched_detections:
+                continue
+            track = Track(self._next_id, y, timestamp, self.velocity(), (top, bottom))
+            self._next_id += 1
+            self.tracks.append(track)
+            # A biscuit already under the camera when tracking starts counts as crossing now
+            if first_frame and abs(y - line) <= CENTRE_TOLERANCE:
+                self._cross(track, timestamp)
+                crossings.append(track)
+        return crossings
+
+    def _cross(self, track, crossed_at):
+        track.item_id = self.crossed
+        track.crossed_at = crossed_at
+        self.crossed += 1
+
+class PickPredictor:
+    """
+    Times reject cycles against the predicted arrival of bad biscuits at the arm.
+
+    The tracking reject cycle is split after its "pick" move: the first job
+    (suction on, descent) has to end exactly when the biscuit arrives, so it is
+    submitted `lead` seconds earlier. The lead starts from the trajectory cost
+    model and follows the measured submit-to-contact times. A biscuit is missed
+    (and counted) if its verdict came too late or the arm is still busy with
+    the previous reject.
+    """
+
+    def __init__(self, mirobot, speed_mm_s, time_scale=1.0, cycle=None):
+        self.mirobot = mirobot
+        self.speed_mm_s = speed_mm_s
+        self.time_scale = time_scale
+        self.cycle = cycle or trajectory.get_cycle("tracking")
+        split = [segment.name for segment in self.cycle.segments].index("pick") + 1
+        self._contact_cycle = trajectory.Trajectory("tracking pick", self.cycle.segments[:split], self.cycle.start)
+        self._reject_cycle = trajectory.Trajectory("tracking reject", self.cycle.segments[split:], self.cycle.end)
+        self.lead = sum(self.cycle.estimates[:split]) * time_scale
+        self.picked = []
+        self.missed = []          # (item_id, "late" / "arm busy")
+        self.contact_errors = []  # mm the cup touched down after (+) or before (-) the biscuit's arrival
+        self.error = None
+        self._heap = []
+        self._cond = threading.Condition()
+        self._reject = None
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="PickPredictor", daemon=True)
+            self._thread.start()
+        return self
+
+    def schedule(self, item_id, arrival):
+        """
+        Plans the pick of a bad biscuit arriving at the arm at time `arrival`.
+
+        Returns:
+            bool: False if the arrival is too close to reach the biscuit in time.
+        """
+        slack = arrival - self.lead - time.time()
+        metrics.observe("pick_slack", max(slack, 0.0))
+        if slack < 0:
+            self._miss(item_id, "late")
+            return False
+        with self._cond:
+            heapq.heappush(self._heap, (arrival, item_id))
+            self._cond.notify()
+        return True
+
+    def finish(self, timeout=60.0):
+        """Waits for every planned pick and the last reject cycle, then stops the thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._reject is not None:
+            self._reject.result(timeout)
+
+    def _miss(self, item_id, why):
+        print(f"Missed reject of item {item_id} ({why}).")
+        self.missed.append((item_id, why))
+        metrics.increment("tracking_missed", why)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._heap:
+                        wait = self._heap[0][0] - self.lead - time.time()
+                        if wait <= 0:
+                            arrival, item_id = heapq.heappop(self._heap)
+                            break
+                        self._cond.wait(wait)
+                    elif self._stopping:
+                        return
+                    else:
+                        self._cond.wait()
+            if self._reject is not None and not self._reject.done():
+                self._miss(item_id, "arm busy")
+                continue
+            try:
+                self._pick(item_id, arrival)
+            except Exception as e:
+                print(f"Pick of item {item_id} failed: {e}")
+                self.error = e
+                return
+
+    def _pick(self, item_id, arrival):
+        link = self.mirobot.link
+        submitted = time.time()
+        contact = link.submit("tracking pick", trajectory.to_commands(self._contact_cycle, self.mirobot, self.time_scale))
+        self._reject = link.submit("tracking reject", trajectory.to_commands(self._reject_cycle, self.mirobot, self.time_scale))
+        contact.result()
+        touched = time.time()
+        error_mm = (touched - arrival) * self.speed_mm_s
+        self.contact_errors.append(error_mm)
+        metrics.observe("pick_contact_error_mm", abs(error_mm))
+        self.lead += LEAD_SMOOTHING * ((touched - submitted) - self.lead)
+        self.picked.append(item_id)
+        print(f"Picked item {item_id}, cup touched down {error_mm:+.1f} mm from the predicted position.")
+
+class ContinuousLine:
+    """
+    Runs one station in continuous-belt mode.
+
+    Usage:
+        line = ContinuousLine(devices, inspect=inspectFrame)
+        picked = line.run(num_items)
+        print(line.report())
+    """
+
+    def __init__(self, devices, inspect, belt_feed=BELT_FEED, arm_offset_mm=ARM_OFFSET_MM, name=""):
+        if devices.conveyor.address == devices.mirobot.address:
+            raise ValueError("Continuous mode needs the conveyor on its own controller "
+                             "(--conveyor-address) so the belt can run while the arm moves.")
+        from utils.checkObject import BACKGROUND_IMAGE_PATH, get_detector, load_image_safely
+
+        self.devices = devices
+        self.inspect = inspect
+        self.belt_feed = belt_feed
+        self.arm_offset_mm = arm_offset_mm
+        self.prefix = f"[{name}] " if name else ""
+        # Belt speed in real seconds (the simulator runs 1/time_scale times faster)
+        self.speed_mm_s = belt_feed / 60.0 / devices.time_scale
+        belt_level = int(np.median(get_detector().background))
+        # Empty belt in colour, painted over neighbouring biscuits that reach into a crop
+        self._belt_image = load_image_safely(BACKGROUND_IMAGE_PATH, "Background Image")
+        # Biscuits move up the image (decreasing rows) as the belt advances
+        self.tracker = BiscuitTracker(belt_level, expected_velocity=-self.speed_mm_s * PX_PER_MM)
+        self.predictor = PickPredictor(devices.mirobot, self.speed_mm_s, devices.time_scale)
+        self.verdicts = {}
+        self._inspections = queue.Queue(maxsize=INSPECTION_QUEUE)
+        self._belt_ends_at = 0.0
+        self._segment_seconds = RUN_SEGMENT_MM / self.speed_mm_s
+        # Keep enough belt queued to outlast a reject cycle holding the serial link
+        self._run_ahead = self._segment_seconds + self.predictor.cycle.duration * devices.time_scale
+
+    def _run_belt(self, until):
+        """Queues conveyor moves until the belt is planned to run past `until`."""
+        conveyor = self.devices.conveyor
+        now = time.time()
+        if self._belt_ends_at < now:
+            self._belt_ends_at = now
+        while self._belt_ends_at < until:
+            conveyor.link.submit("belt", [conveyor.conveyor(RUN_SEGMENT_MM, self.belt_feed, wait=WAIT_ACK)])
+            self._belt_ends_at += self._segment_seconds
+
+    def _inspection_loop(self):
+        while True:
+            item = self._inspections.get()
+            if item is None:
+                return
+            track, frame = item
+            try:
+                bad, reason = self.inspect(frame)
+            except Exception as e:
+                # Reject rather than let an unchecked item through
+                print(f"{self.prefix}Inspection of item {track.item_id} failed: {e}")
+                bad, reason = True, f"error: {e}"
+            self._verdict(track, bad, reason)
+
+    def _verdict(self, track, bad, reason):
+        self.verdicts[track.item_id] = Verdict(track.item_id, bad, reason, time.time())
+        print(f"{self.prefix}Item {track.item_id}: {'BAD' if bad else 'ok'} {reason}")
+        if bad:
+            self.predictor.schedule(track.item_id, track.crossed_at + self.arm_offset_mm / self.speed_mm_s)
+
+    def _crop_box(self, track, height):
+        """Crop window centred on the tracked biscuit (it is rarely exactly on the line in a frame)."""
+        top = int(round(track.y - captureImages.CROP_HEIGHT / 2.0))
+        top = min(max(top, 0), height - captureImages.CROP_HEIGHT)
+        return captureImages.CROP_X, top, captureImages.CROP_WIDTH, captureImages.CROP_HEIGHT
+
+    def _isolate(self, frame, track):
+        """
+        Replaces the crop rows outside the tracked biscuit with the empty belt.
+
+        Biscuits on a running belt can sit closer than a crop height, and the
+        checks must only see the one that crossed the line.
+        """
+        x, y, width, height = frame.roi
+        if self._belt_image.shape[:2] != (height, width):
+            return
+        top = max(track.extent[0] - ISOLATION_MARGIN - y, 0)
+        bottom = min(track.extent[1] + ISOLATION_MARGIN - y, height)
+        frame.cropped[:top] = self._belt_image[:top]
+        frame.cropped[bottom:] = self._belt_image[bottom:]
+
+    def run(self, num_items):
+        """
+        Tracks, inspects and sorts the next `num_items` biscuits to pass the camera.
+
+        Returns:
+            list: Item numbers (crossing order) that were picked as bad.
+        """
+        mirobot, camera = self.devices.mirobot, self.devices.camera
+        hover = self.predictor.cycle.start
+        mirobot.link.run("setup", [mirobot.writeangle(0, *hover, name="hover")])
+
+        self.predictor.start()
+        inspector = threading.Thread(target=self._inspection_loop, name=f"{self.prefix}Inspection".strip(), daemon=True)
+        inspector.start()
+        self._run_belt(time.time() + self._run_ahead)
+
+        last_ts = None
+        while self.tracker.crossed < num_items and self.predictor.error is None:
+            entry = camera.read_entry(newer_than=last_ts, timeout=FRAME_TIMEOUT)
+            if entry is None:
+                print(f"{self.prefix}No camera frame for {FRAME_TIMEOUT:.1f} seconds; stopping.")
+                break
+            _, last_ts, img = entry
+            with metrics.timer("tracking"):
+                crossings = self.tracker.update(img, last_ts)
+            for track in crossings:
+                if track.item_id >= num_items:
+                    continue
+                # The ring slot is reused while the inspection runs, so the frame is copied
+                image = img.copy()
+                frame = preprocess_frame(image, last_ts, self._crop_box(track, img.shape[0]))
+                self._isolate(frame, track)
+                # Grayscale and binary again, now without the neighbours
+                frame = preprocess_frame(image, last_ts, frame.roi)
+                try:
+                    self._inspections.put_nowait((track, frame))
+                except queue.Full:
+                    metrics.increment("tracking_missed", "inspection overrun")
+                    self._verdict(track, True, "not inspected")
+            self._run_belt(time.time() + self._run_ahead)
+
+        self._inspections.put(None)
+        inspector.join()
+        # Keep the belt running until the last bad biscuit has reached the arm
+        self._run_belt(time.time() + self.arm_offset_mm / self.speed_mm_s + self.predictor.lead)
+        self.predictor.finish()
+        if self.predictor.error is not None:
+            raise self.predictor.error
+        return self.predictor.picked
+
+    def report(self):
+        """Summary of the tracked items, picks, misses and the prediction error."""
+        predictor = self.predictor
+        velocity = abs(self.tracker.velocity())
+        lines = [f"Belt {self.belt_feed} mm/min; measured {velocity / self.speed_mm_s:.1f} px/mm "
+                 f"(PX_PER_MM {PX_PER_MM}); pick lead {1000.0 * predictor.lead:.0f} ms",
+                 f"{self.tracker.crossed} items inspected, {len(predictor.picked)} picked, "
+                 f"{len(predictor.missed)} missed {predictor.missed}"]
+        if predictor.contact_errors:
+            errors = np.abs(predictor.contact_errors)
+            lines.append(f"Contact error: mean {errors.mean():.1f} mm, max {errors.max():.1f} mm")
+        return "\n".join(lines)
@@ -0,0 +1,235 @@
+"""
+Reject-cycle trajectory planner with a simulated-time cost model.
+
+Usage:
+    python -m utils.trajectory             # estimated cycle times, original vs planned
+    python -m utils.trajectory --measure   # also run both cycles on the simulated controller
+"""
+import argparse
+from dataclasses import dataclass, field
+
+from utils.motion import POLL_INTERVAL, IDLE_CONFIRMATIONS
+
+# --- Controller latency model (seconds), roughly matched to the moves observed on the line ---
+# The cost model below plans with it, and utils.simulator replays it.
+JOINT_SPEED = 40.0        # Degrees per second for the slowest joint of a writeangle move
+MOVE_OVERHEAD = 0.15      # Acceleration/settling added to every arm move
+PUMP_LATENCY = 0.05
+COMMAND_LATENCY = 0.01    # Anything that does not move (speed, status, ...)
+
+# Joint angles (J1..J6, degrees) of the taught poses
+POSES = {
+    "zero": (0.0, 0.0, 0.0, 0.0, 0.0, 0.0),
+    "pick approach": (23.4, 49.2, -24.1, -0.0, -26.8, -18.5),
+    "pick": (23.7, 52.6, -24.2, -0.0, -30.0, -19.0),
+    "place approach": (-56.1, 16.1, 15.4, 0.0, -31.6, 56.1),
+    "place": (-56.1, 18.5, 16.3, 0.0, -34.9, 56.1),
+}
+# Where the arm waits between rejects: just above the pick position, so the
+# next cycle starts with a short descent instead of a move out from zero
+HOVER_POSE = "pick approach"
+# Optional safe pose between pick and place (e.g. "zero"); None moves directly
+TRANSIT_VIA = None
+# Feed (degrees/min) for the short moves onto/off the biscuit and into the reject
+# bin, so the suction cup touches down gently; None runs them as rapid G00 moves.
+# Transits between the approach poses always run at rapid speed.
+APPROACH_FEED = 1200
+
+PUMP_ON_DWELL = 1.0
+PUMP_OFF_DWELL = 0.5
+
+@dataclass
+class Segment:
+    """One step of a trajectory: a joint move, a pump switch or a speed setting."""
+    name: str
+    target: tuple = None       # Joint angles for a move
+    feed: float = None         # G01 feed (degrees/min); None = rapid G00
+    pump: int = None           # 1 / 0 for a pump switch
+    speed: int = None          # Legacy speed() setting
+    dwell: float = 0.0         # Seconds to hold after the step
+
+@dataclass
+class Trajectory:
+    """A precomputed sequence of segments plus the pose it is planned from."""
+    name: str
+    segments: list
+    start: tuple = POSES["zero"]
+    estimates: list = field(default_factory=list)   # Seconds per segment (cost model)
+
+    @property
+    def duration(self):
+        return sum(self.estimates)
+
+    @property
+    def end(self):
+        pose = self.start
+        for segment in self.segments:
+            if segment.target is not None:
+                pose = segment.target
+        return pose
+
+def estimate_segment(pose, segment):
+    """
+    Estimated seconds for one segment starting at `pose`, using the controller
+    latency model plus the status polling needed to see the move finish.
+    """
+    if segment.target is not None:
+        joint_speed = JOINT_SPEED if segment.feed is None else min(JOINT_SPEED, segment.feed / 60.0)
+        largest = max(abs(a - b) for a, b in zip(pose, segment.target))
+        # The first Idle reply usually arrives right as the move ends; each further confirmation costs a poll
+        seconds = MOVE_OVERHEAD + largest / joint_speed + (IDLE_CONFIRMATIONS - 1) * POLL_INTERVAL
+    elif segment.pump is not None:
+        seconds = PUMP_LATENCY
+    else:
+        seconds = COMMAND_LATENCY
+    return seconds + segment.dwell
+
+def estimate(trajectory):
+    """Fills trajectory.estimates from the cost model and returns the total seconds."""
+    pose = trajectory.start
+    trajectory.estimates = []
+    for segment in trajectory.segments:
+        trajectory.estimates.append(estimate_segment(pose, segment))
+        if segment.target is not None:
+            pose = segment.target
+    return trajectory.duration
+
+def baseline_cycle():
+    """The original reject sequence: six poses with a full return to zero after pick and place."""
+    return _planned(Trajectory("baseline", [
+        Segment("speed", speed=1),
+        Segment("pick approach", POSES["pick approach"]),
+        Segment("pick", POSES["pick"]),
+        Segment("pump on", pump=1, dwell=PUMP_ON_DWELL),
+        Segment("zero", POSES["zero"]),
+        Segment("place approach", POSES["place approach"]),
+        Segment("place", POSES["place"]),
+        Segment("pump off", pump=0, dwell=PUMP_OFF_DWELL),
+        Segment("zero", POSES["zero"]),
+    ], POSES["zero"]))
+
+def reject_cycle(via=TRANSIT_VIA, hover=HOVER_POSE, feed=APPROACH_FEED):
+    """
+    Planned reject sequence starting and ending at the hover pose.
+
+    Skips the returns to zero (unless `via` names a safe pose for the transit),
+    lifts back to the approach pose after gripping and waits at `hover` for the
+    next reject. The arm must already be at `hover`; pickAndPlace() moves it
+    there before the first cycle.
+    """
+    segments = [
+        Segment("pick approach", POSES["pick approach"]),
+        Segment("pick", POSES["pick"], feed=feed),
+        Segment("pump on", pump=1, dwell=PUMP_ON_DWELL),
+        Segment("pick lift", POSES["pick approach"], feed=feed),
+    ]
+    if via is not None:
+        segments.append(Segment(via, POSES[via]))
+    segments += [
+        Segment("place approach", POSES["place approach"]),
+        Segment("place", POSES["place"], feed=feed),
+        Segment("pump off", pump=0, dwell=PUMP_OFF_DWELL),
+        Segment("hover", POSES[hover]),
+    ]
+    # Drop moves to where the arm already is (e.g. the approach when hovering there)
+    pose = POSES[hover]
+    kept = []
+    for segment in segments:
+        if segment.target is not None:
+            if segment.target == pose:
+                continue
+            pose = segment.target
+        kept.append(segment)
+    return _planned(Trajectory("planned", kept, POSES[hover]))
+
+def tracking_cycle(hover=HOVER_POSE, feed=APPROACH_FEED):
+    """
+    Reject sequence for a belt that keeps running (utils.tracking).
+
+    The suction is switched on before the descent, so the cup grips the moving
+    biscuit on contact instead of dwelling on it; the "pick" move is the one
+    timed against the biscuit's arrival.
+    """
+    return _planned(Trajectory("tracking", [
+        Segment("pump on", pump=1),
+        Segment("pick", POSES["pick"], feed=feed),
+        Segment("pick lift", POSES["pick approach"], feed=feed),
+        Segment("place approach", POSES["place approach"]),
+        Segment("place", POSES["place"], feed=feed),
+        Segment("pump off", pump=0, dwell=PUMP_OFF_DWELL),
+        Segment("hover", POSES[hover]),
+    ], POSES[hover]))
+
+def _planned(trajectory):
+    estimate(trajectory)
+    return trajectory
+
+_cycles = {}
+
+def get_cycle(name="planned"):
+    """Returns the precomputed "planned", "baseline" or "tracking" trajectory, building it on first use."""
+    if name not in _cycles:
+        builders = {"planned": reject_cycle, "baseline": baseline_cycle, "tracking": tracking_cycle}
+        _cycles[name] = builders[name]()
+    return _cycles[name]
+
+def to_commands(trajectory, mirobot, time_scale=1.0, timeout=10.0, timeouts=None):
+    """
+    Turns a trajectory into QueuedMirobot commands for one SerialLink job.
+
+    Args:
+        trajectory (Trajectory): From get_cycle(), reject_cycle() or baseline_cycle().
+        mirobot (QueuedMirobot): Command builder of the arm.
+        time_scale (float): Dwell multiplier (< 1 for accelerated simulation).
+        timeout (float): Per-move timeout in seconds.
+        timeouts (dict, optional): Per-segment-name timeouts overriding `timeout`.
+    """
+    timeouts = timeouts or {}
+    commands = []
+    for segment in trajectory.segments:
+        if segment.target is not None:
+            commands.append(mirobot.writeangle(0, *segment.target, name=segment.name,
+                                               timeout=timeouts.get(segment.name, timeout), feed=segment.feed))
+        elif segment.pump is not None:
+            commands.append(mirobot.pump(segment.pump, dwell=segment.dwell * time_scale))
+        elif segment.speed is not None:
+            commands.append(mirobot.speed(segment.speed))
+    return commands
+
+def measure(trajectory, time_scale=1.0):
+    """
+    Runs a trajectory on the simulated controller; returns seconds at real-time scale.
+
+    Status polling is scaled along with the moves, but serial round trips are
+    not, so a very small time_scale still overstates the overhead a little.
+    """
+    from utils.devices import connectControllers
+    from utils.simulator import SimSerial
+
+    port = SimSerial(time_scale)
+    link, mirobot, _ = connectControllers(port, time_scale=time_scale)
+    if trajectory.start != POSES["zero"]:
+        link.run("setup", [mirobot.writeangle(0, *trajectory.start, name="setup")])
+    elapsed = link.run(trajectory.name, to_commands(trajectory, mirobot, time_scale))
+    link.close()
+    return elapsed / time_scale
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the original and planned reject cycles.")
+    parser.add_argument("--measure", action="store_true", help="Also run both cycles on the simulated controller.")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Simulator latency multiplier for --measure.")
+    args = parser.parse_args()
+
+    cycles = [get_cycle("baseline"), get_cycle("planned")]
+    for cycle in cycles:
+        print(f"\n{cycle.name} cycle:")
+        for segment, seconds in zip(cycle.segments, cycle.estimates):
+            print(f"  {segment.name:<16} {seconds:6.2f} s")
+        print(f"  {'total':<16} {cycle.duration:6.2f} s")
+
+    baseline, planned = cycles
+    saved = baseline.duration - planned.duration
+    print(f"\nEstimated saving: {saved:.2f} s per reject ({100.0 * saved / baseline.duration:.0f}%)")
+    if args.measure:
+        for cycle in cycles:
+            print(f"Simulated {cycle.name}: {measure(cycle, args.time_scale):.2f} s")
@@ -0,0 +1,181 @@
+"""
+Frame trigger: capture continuously and keep the frame where the biscuit has settled.
+
+Instead of sleeping a fixed time after the conveyor move and taking whatever
+frame comes next, the trigger reads every frame the camera grabs and measures
+two cheap things on each one:
+
+    motion   - mean absolute change of the downsampled crop since the previous frame;
+               a moving (and therefore blurred) biscuit changes it by several gray levels
+    centring - offset of the biscuit mask's centroid from the crop centre along the
+               belt, from the moments of the Otsu binary the preprocessing already made
+
+It fires on the first frame that has been still for STABLE_FRAMES frames and
+shows the biscuit centred (or an empty belt). Each check costs well under a
+millisecond, so the inspection thread can start watching while the belt is
+still moving and the fixed waits go away.
+
+Usage:
+    trigger = FrameTrigger(camera)
+    frame = trigger.capture(expect_motion=True)   # belt move just queued
+    print(trigger.report())
+"""
+import time
+
+import cv2
+import numpy as np
+
+from utils import metrics
+from utils.captureImages import processImages
+
+TRIGGER_SCALE = 4           # Downsampling of the crop for the motion measure
+MOTION_THRESHOLD = 2.0      # Mean gray-level change per pixel below which a frame counts as still
+STABLE_FRAMES = 2           # Consecutive still frames before the belt counts as stopped
+CENTRE_TOLERANCE = 20       # Max offset (px) of the biscuit centroid from the crop centre, along the belt
+SETTLE_FRAMES = 6           # Still frames after which an off-centre biscuit is taken anyway
+TRIGGER_TIMEOUT = 3.0       # Seconds to wait for a settled frame before giving up
+MOVE_START_TIMEOUT = 30.0   # Longest wait for a queued belt move to start (it may sit behind a reject cycle)
+MOVE_POLL = 0.01            # Seconds between checks whether the queued belt move has started
+BELT_AXIS = 0               # Image axis the belt moves along (0 = rows, 1 = columns)
+
+OUTCOMES = ("centred", "empty", "off-centre", "timeout")
+
+class FrameTrigger:
+    """
+    Picks the frame to inspect from the camera's continuous stream.
+
+    Usage:
+        trigger = FrameTrigger(camera)
+        frame = trigger.capture(expect_motion=True)
+    """
+
+    def __init__(self, camera, detector=None, motion_threshold=MOTION_THRESHOLD,
+                 stable_frames=STABLE_FRAMES, centre_tolerance=CENTRE_TOLERANCE):
+        self.camera = camera
+        self._detector = detector
+        self.motion_threshold = motion_threshold
+        self.stable_frames = stable_frames
+        self.centre_tolerance = centre_tolerance
+        self._small = None       # [previous, current] downsampled crops, allocated on the first frame
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+        self.frames_read = 0
+        self.waited = 0.0
+
+    @property
+    def detector(self):
+        if self._detector is None:
+            from utils.checkObject import get_detector
+            self._detector = get_detector()
+        return self._detector
+
+    def motion(self, gray):
+        """
+        Mean absolute gray-level change of the downsampled crop since the previous call.
+
+        Returns:
+            float or None: None for the first frame (or after the crop size changed).
+        """
+        height, width = max(1, gray.shape[0] // TRIGGER_SCALE), max(1, gray.shape[1] // TRIGGER_SCALE)
+        if self._small is None or self._small[0].shape != (height, width):
+            self._small = [np.empty((height, width), dtype=np.uint8) for _ in range(2)]
+            cv2.resize(gray, (width, height), dst=self._small[1], interpolation=cv2.INTER_AREA)
+            return None
+        self._small.reverse()
+        cv2.resize(gray, (width, height), dst=self._small[1], interpolation=cv2.INTER_AREA)
+        return cv2.norm(self._small[0], self._small[1], cv2.NORM_L1) / (height * width)
+
+    def centre_offset(self, frame):
+        """
+        Along-belt distance (px) of the biscuit mask's centroid from the crop centre.
+
+        Returns:
+            float or None: None if the belt under the camera is empty.
+        """
+        if not self.detector.might_contain_object(frame.gray):
+            return None
+        moments = cv2.moments(frame.binary, binaryImage=True)
+        if moments["m00"] == 0:
+            return None
+        centroid = moments["m01"] / moments["m00"] if BELT_AXIS == 0 else moments["m10"] / moments["m00"]
+        return abs(centroid - frame.binary.shape[BELT_AXIS] / 2.0)
+
+    def capture(self, newer_than=None, expect_motion=False, timeout=TRIGGER_TIMEOUT, belt_move=None):
+        """
+        Reads frames until the biscuit under the camera is still and centred.
+
+        Args:
+            newer_than (float, optional): Ignore frames grabbed before this time.
+            expect_motion (bool): A belt move has been queued but may not have started;
+                the frame showing the previous biscuit must not trigger. The trigger
+                arms once it sees motion or the view changes.
+            timeout (float): Seconds to wait for a settled frame.
+            belt_move (Future, optional): The queued belt move (SerialLink.submit()). The
+                timeout only starts once it is running, not while it waits behind a pick.
+
+        Returns:
+            Frame or None: The chosen frame (valid until the next capture), or None on timeout.
+        """
+        if belt_move is not None:
+            queued_until = time.time() + MOVE_START_TIMEOUT
+            while not (belt_move.running() or belt_move.done()) and time.time() < queued_until:
+                time.sleep(MOVE_POLL)
+        start = time.time()
+        deadline = start + timeout
+        armed = not expect_motion
+        reference = None
+        still = 0
+        self._small = None
+        last_ts = newer_than
+
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            frame = processImages(self.camera, newer_than=last_ts, timeout=remaining)
+            if frame is None:
+                break
+            last_ts = frame.timestamp
+            self.frames_read += 1
+
+            change = self.motion(frame.gray)
+            if not armed:
+                if reference is None:
+                    reference = self._small[1].copy()
+                elif cv2.norm(reference, self._small[1], cv2.NORM_L1) / reference.size > self.motion_threshold:
+                    armed = True
+            if change is None or change > self.motion_threshold:
+                if change is not None:
+                    armed = True
+                still = 0
+                continue
+            still += 1
+            if not armed or still < self.stable_frames:
+                continue
+
+            offset = self.centre_offset(frame)
+            if offset is None:
+                return self._fired("empty", frame, start)
+            if offset <= self.centre_tolerance:
+                return self._fired("centred", frame, start)
+            if still >= SETTLE_FRAMES:
+                print(f"Trigger: biscuit settled {offset:.0f} px off-centre; inspecting it anyway.")
+                return self._fired("off-centre", frame, start)
+
+        print(f"Trigger: no settled frame within {timeout:.1f} seconds.")
+        self._fired("timeout", None, start)
+        return None
+
+    def _fired(self, outcome, frame, start):
+        waited = time.time() - start
+        self.counts[outcome] += 1
+        self.waited += waited
+        metrics.increment("trigger", outcome)
+        metrics.observe("trigger_wait", waited)
+        return frame
+
+    def report(self):
+        """One line with the trigger outcomes, frames examined and mean wait."""
+        fired = sum(self.counts.values())
+        mean_ms = 1000.0 * self.waited / fired if fired else 0.0
+        outcomes = ", ".join(f"{outcome} {count}" for outcome, count in self.counts.items())
+        return f"{fired} triggers ({outcomes}); {self.frames_read} frames examined, mean wait {mean_ms:.1f} ms"
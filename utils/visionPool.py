@@ -0,0 +1,258 @@
+"""
+Process-pool vision workers for several camera/conveyor stations on one host.
+
+Each station's frames live in a shared-memory FrameRing; worker processes
+inspect them in place, so the OpenCV-heavy checks run outside the GIL of the
+process that drives the arms, and no image is pickled. A camera opened with
+shared=True grabs straight into that ring, so frames are never copied at all.
+
+Usage:
+    python -m utils.visionPool --sim --stations 2 --iterations 20 --time-scale 0.05
+    python -m utils.visionPool --station /dev/ttyUSB0:2 --station /dev/ttyUSB1:3:./images/no_object_b.png
+"""
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from utils import metrics
+from utils.frameRing import FrameRing, FRAME_SHAPE
+
+SLOTS_PER_STATION = 4                # Frames a station can have in flight at once
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+@dataclass
+class InspectionTask:
+    """What a worker needs to find and inspect one snapshot."""
+    station: str
+    ring_name: str
+    ring_slots: int
+    shape: tuple
+    slot: int
+    timestamp: float
+    boxes: object = None             # CROP_BOXES by default, a list of boxes or "auto"
+    background_path: str = None
+
+# --- Worker process side ---
+_attached = {}
+
+def _init_worker(config_path=None):
+    import cv2
+    # One OpenCV thread per worker: the pool already spreads frames over the cores
+    cv2.setNumThreads(1)
+    if config_path is not None:
+        from utils.inspectionConfig import watch
+        # No watcher thread here; _inspect_task() checks the file between tasks
+        watch(config_path, background=False)
+
+def _inspect_task(task):
+    from utils.batchInspect import inspectSnapshot
+    from utils.checkObject import BACKGROUND_IMAGE_PATH, get_detector
+    from utils.inspectionConfig import refresh
+
+    refresh()
+    ring = _attached.get(task.ring_name)
+    if ring is None:
+        # The station process owns (and unlinks) the ring; workers only map it
+        ring = _attached[task.ring_name] = FrameRing.attach(task.ring_name, task.ring_slots, task.shape)
+    img = ring.images[task.slot]
+    detector = get_detector(task.background_path or BACKGROUND_IMAGE_PATH)
+    return inspectSnapshot(img, task.boxes, task.timestamp, detector)
+
+# --- Station process side ---
+def summarize(verdicts):
+    """
+    Folds the per-biscuit verdicts of one snapshot into the scheduler's (bad, reason).
+    """
+    present = [v for v in verdicts if v.present]
+    if not present:
+        return False, "empty"
+    reasons = sorted({v.reason for v in present if v.bad})
+    if reasons:
+        return True, "/".join(reasons)
+    return False, "good"
+
+class StationClient:
+    """One station's handle on the pool: its shared frame ring, background and crop boxes."""
+
+    def __init__(self, pool, name, background_path=None, boxes=None, ring=None,
+                 slots=SLOTS_PER_STATION, shape=FRAME_SHAPE):
+        self.pool = pool
+        self.name = name
+        self.background_path = background_path
+        self.boxes = boxes
+        # Use the camera's ring when it is already in shared memory, else keep one to copy into
+        self.camera_ring = ring if ring is not None and ring.shared else None
+        self.ring = FrameRing(slots, shape, shared=True) if self.camera_ring is None else None
+
+    def submit(self, img, timestamp=None):
+        """
+        Queues a snapshot for inspection without waiting for the result.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the list of BiscuitVerdicts.
+        """
+        ring = self.camera_ring
+        slot = ring.slot_of(img) if ring is not None else None
+        if slot is None:
+            ring = self.ring or FrameRing(SLOTS_PER_STATION, img.shape, shared=True)
+            self.ring = ring
+            _, slot = ring.write(img, timestamp)
+        # Keep the writer off the slot until the worker is done with it
+        ring.pin(slot)
+        task = InspectionTask(self.name, ring.name, ring.slots, ring.shape, slot,
+                              timestamp or time.time(), self.boxes, self.background_path)
+        future = self.pool.executor.submit(_inspect_task, task)
+        future.add_done_callback(lambda _: ring.unpin(slot))
+        return future
+
+    def inspect(self, entry):
+        """
+        Inspects a camera entry (frame_id, timestamp, image) and waits for the verdict.
+
+        Matches the InspectionScheduler's inspect() stage.
+
+        Returns:
+            tuple: (bool) True if the item must be rejected, (str) reason.
+        """
+        _, timestamp, img = entry
+        with metrics.timer("vision_pool"):
+            verdicts = self.submit(img, timestamp).result()
+        bad, reason = summarize(verdicts)
+        metrics.increment("items", reason if reason in ("empty", "good") else "bad")
+        if bad:
+            # Same reject_reason counters as main.gradeFrame()
+            for part in reason.split("/"):
+                metrics.increment("reject_reason", part)
+        return bad, reason
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+
+class VisionPool:
+    """
+    Worker processes shared by every station on the host.
+
+    Usage:
+        with VisionPool(workers=3) as pool:
+            station = pool.add_station("line1", background_path="./images/no_object.png")
+            bad, reason = station.inspect(camera.read_entry())
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, config_path=None):
+        # spawn: the station processes run camera and serial threads, which must not be forked
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker, initargs=(config_path,))
+        self.stations = {}
+
+    def add_station(self, name, background_path=None, boxes=None, ring=None,
+                    slots=SLOTS_PER_STATION, shape=FRAME_SHAPE):
+        """
+        Registers a station. Pass the camera's FrameRing as `ring` (opened with shared=True)
+        to have workers read the grabbed frames without any copy.
+        """
+        station = self.stations[name] = StationClient(self, name, background_path, boxes, ring, slots, shape)
+        return station
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        for station in self.stations.values():
+            station.close()
+        self.stations.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+def runStations(stations, iterations, workers=DEFAULT_WORKERS, config_path=None):
+    """
+    Runs one pipelined inspection/actuation loop per station, sharing one vision pool.
+
+    Args:
+        stations (list): (name, Devices, background_path or None) per station.
+        iterations (int): Conveyor pitches to process on every station.
+        workers (int): Vision worker processes.
+        config_path (str, optional): Inspection config the workers load and watch.
+
+    Returns:
+        dict: {station name: IDs of the picked items}.
+    """
+    from utils.pickBadAndPlace import moveConveyor, pickAndPlace
+    from utils.scheduler import InspectionScheduler
+
+    results = {}
+    errors = []
+    with VisionPool(workers, config_path) as pool:
+        def run(name, devices, background_path):
+            client = pool.add_station(name, background_path, ring=getattr(devices.camera, "ring", None))
+            scheduler = InspectionScheduler(
+                capture=lambda newer_than: devices.camera.read_entry(newer_than=newer_than),
+                inspect=client.inspect,
+                advance=lambda: moveConveyor(devices=devices),
+                pick=lambda: pickAndPlace(wait=False, devices=devices),
+                name=name,
+            )
+            try:
+                results[name] = scheduler.run(iterations)
+            except Exception as e:
+                print(f"[{name}] Station stopped: {e}")
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=station, name=station[0]) for station in stations]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+def parseStation(spec):
+    """Parses "port:camera_index[:background_path]" into its parts."""
+    parts = spec.split(":", 2)
+    if len(parts) < 2:
+        raise argparse.ArgumentTypeError(f"Expected port:camera_index[:background], got '{spec}'.")
+    return parts[0], int(parts[1]), parts[2] if len(parts) > 2 else None
+
+if __name__ == "__main__":
+    from utils.devices import openDevices
+
+    parser = argparse.ArgumentParser(description="Run several stations with a shared vision worker pool.")
+    parser.add_argument("--station", action="append", type=parseStation, default=[],
+                        help="Hardware station as port:camera_index[:background]; repeat per station.")
+    parser.add_argument("--sim", action="store_true", help="Use simulated stations instead.")
+    parser.add_argument("--stations", type=int, default=2, help="Number of simulated stations.")
+    parser.add_argument("--images", default="./images/", help="Image directory replayed by simulated cameras.")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Simulated move latency multiplier.")
+    parser.add_argument("--iterations", type=int, default=20, help="Conveyor pitches per station.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Vision worker processes.")
+    parser.add_argument("--config", default="./rgbMap.json", help="Inspection config, reloaded when it changes.")
+    args = parser.parse_args()
+
+    if args.sim:
+        stations = [(f"sim{i}", openDevices("sim", image_dir=args.images, time_scale=args.time_scale,
+                                            shared_frames=True), None)
+                    for i in range(args.stations)]
+    else:
+        from utils.cameraService import CameraService
+        stations = [(f"{port}", openDevices("hardware", port=port, camera=CameraService(camera_index, shared=True)), background)
+                    for port, camera_index, background in args.station]
+    if not stations:
+        parser.error("No stations given (use --sim or --station).")
+
+    start = time.time()
+    try:
+        picked = runStations(stations, args.iterations, args.workers, args.config)
+    finally:
+        for _, devices, _ in stations:
+            devices.close()
+    elapsed = time.time() - start
+    for name, ids in picked.items():
+        print(f"[{name}] {len(ids)} rejected: {ids}")
+    print(f"{len(stations)} stations x {args.iterations} items in {elapsed:.2f} seconds.")